@@ -23,6 +23,25 @@ class Settings(BaseSettings):
     # File upload
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "/tmp/fiber_uploads")
     MAX_UPLOAD_SIZE: int = 500 * 1024 * 1024  # 500MB
+    UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # suggested chunk size for resumable uploads
+    UPLOAD_SESSION_TTL_HOURS: int = 24  # resumable sessions idle this long are discarded
+    PAGE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # on-disk cache of extracted plat pages
+    # Rewrite new uploads with identical objects merged and content streams compressed
+    PDF_COMPACT_ON_INGEST: bool = os.getenv("PDF_COMPACT_ON_INGEST", "false").lower() == "true"
+    
+    # Processes rendering PDF export overlays in parallel; 1 renders in the request process
+    OVERLAY_RENDER_WORKERS: int = int(os.getenv("OVERLAY_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    OVERLAY_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # per-page overlay cache; 0 disables it
+    EXPORT_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # PDF exports larger than this are spooled to UPLOAD_DIR
+    EXPORT_JOB_WORKERS: int = int(os.getenv("EXPORT_JOB_WORKERS", "2"))  # background exports running at once
+    EXPORT_JOB_TTL_HOURS: int = 24  # finished export artifacts are kept this long
+    EXPORT_JOB_STALE_SECONDS: int = 120  # queued or running jobs without a heartbeat this long are queued again
+    EXPORT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # finished exports by project revision; 0 disables it
+    # Processes building the members of a batch export ZIP; 1 builds them in the request
+    EXPORT_BATCH_WORKERS: int = int(os.getenv("EXPORT_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
+    # Polyline point storage: "json" ([{x, y}, ...]) or "packed" (little-endian float64 blob)
+    POLYLINE_POINTS_FORMAT: str = os.getenv("POLYLINE_POINTS_FORMAT", "json")
     
     # CORS - can be a JSON array string or comma-separated string
     CORS_ORIGINS: Union[List[str], str] = "http://localhost:3000,http://localhost:8000,http://localhost:5173,http://piwebhost.local,http://piwebhost.local:3000,http://piwebhost.local:80,http://127.0.0.1:3000,http://127.0.0.1:80,http://piwebhost.narwhal-oratrice.ts.net,http://piwebhost.narwhal-oratrice.ts.net:80"
@@ -0,0 +1,136 @@
+"""
+Lightweight schema migrations for databases created before a column existed.
+
+Tables are created with Base.metadata.create_all, which never alters existing
+tables, so columns added to a model later are added here with ALTER TABLE.
+"""
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db.database import Base, SessionLocal
+
+
+def add_missing_columns(engine: Engine) -> list:
+    """
+    Add nullable model columns that are missing from existing tables.
+
+    Returns:
+        List of "table.column" names that were added
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def pack_polyline_points(db, batch_size: int = 500) -> int:
+    """
+    Convert JSON polyline points to the packed blob format.
+
+    Rows are processed in id order in batches so large tables are never held
+    in memory at once.
+
+    Returns:
+        Number of polylines converted
+    """
+    from app.models.database import Polyline
+    from app.services.geometry import ArcLengthIndex, decode_points_blob, encode_points_blob
+
+    converted = 0
+    last_id = 0
+    while True:
+        batch = db.query(Polyline).filter(
+            Polyline.id > last_id,
+            Polyline.points_packed.is_(None),
+        ).order_by(Polyline.id).limit(batch_size).all()
+        if not batch:
+            break
+        for polyline in batch:
+            points = polyline.points or []
+            polyline.points_packed = encode_points_blob(points)
+            polyline.arc_lengths_packed = ArcLengthIndex(decode_points_blob(polyline.points_packed)).to_blob()
+            polyline.point_count = len(points)
+            polyline.points = None
+            last_id = polyline.id
+        db.commit()
+        converted += len(batch)
+    return converted
+
+
+def adopt_legacy_pdfs(db) -> int:
+    """
+    Move PDFs uploaded before content-addressed storage into it.
+
+    Each legacy UPLOAD_DIR/<pdf_filename> file is hashed, moved (or, if the
+    content is already stored, deleted) and referenced through a PdfBlob row.
+    Projects not adopted here are adopted by the first page extraction.
+
+    Returns:
+        Number of projects adopted
+    """
+    from app.models.database import Project
+    from app.services.pdf_storage import adopt_legacy_pdf
+
+    adopted = 0
+    for project in db.query(Project).filter(Project.pdf_sha256.is_(None)).order_by(Project.id).all():
+        if adopt_legacy_pdf(db, project):
+            adopted += 1
+    return adopted
+
+
+def compact_stored_pdfs(db) -> int:
+    """
+    Write compacted copies for stored PDFs that do not have one yet.
+
+    Originals are left in place as the fallback.
+
+    Returns:
+        Number of PDFs compacted
+    """
+    import os
+
+    from app.models.database import PdfBlob
+    from app.services.pdf_handler import compact_pdf
+    from app.services.pdf_storage import blob_path, compacted_blob_path
+
+    compacted = 0
+    for blob in db.query(PdfBlob).filter(PdfBlob.compacted_size_bytes.is_(None)).order_by(PdfBlob.id).all():
+        path = blob_path(blob.sha256)
+        if not os.path.exists(path):
+            continue
+        result = compact_pdf(path, compacted_blob_path(blob.sha256))
+        if result["compacted"]:
+            blob.compacted_size_bytes = result["compacted_size"]
+            db.commit()
+            compacted += 1
+    return compacted
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.db.migrations [pack-points] [adopt-pdfs] [compact-pdfs]
+    from app.db.database import engine
+
+    print(f"Added columns: {add_missing_columns(engine)}")
+    db = SessionLocal()
+    try:
+        if "pack-points" in sys.argv[1:]:
+            print(f"Packed {pack_polyline_points(db)} polylines")
+        if "adopt-pdfs" in sys.argv[1:]:
+            print(f"Adopted {adopt_legacy_pdfs(db)} project PDFs")
+        if "compact-pdfs" in sys.argv[1:]:
+            print(f"Compacted {compact_stored_pdfs(db)} stored PDFs")
+    finally:
+        db.close()
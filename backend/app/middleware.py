@@ -0,0 +1,53 @@
+"""
+ASGI middleware.
+"""
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from app.config import settings
+
+# Room for multipart boundaries and the other form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies larger than MAX_UPLOAD_SIZE before they are spooled.
+
+    Starlette buffers a multipart body to a temporary file before the route
+    runs, so a limit checked in the route only fires after the whole upload
+    has been received. Here a declared Content-Length over the limit is
+    refused up front, and chunked or under-declared bodies are cut off as soon
+    as the running byte count passes it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+        detail = f"Request body exceeds maximum upload size of {settings.MAX_UPLOAD_SIZE} bytes"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI passes it through as a 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
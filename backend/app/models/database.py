@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.database import Base
@@ -14,6 +14,17 @@ class User(Base):
     
     projects = relationship("Project", back_populates="owner")
 
+class PdfBlob(Base):
+    __tablename__ = "pdf_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True)  # content address of the stored file
+    size_bytes = Column(Integer)
+    compacted_size_bytes = Column(Integer, nullable=True)  # size of the compacted copy; None when not compacted
+    page_count = Column(Integer)
+    ref_count = Column(Integer, default=0)  # projects referencing this file
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
 class Project(Base):
     __tablename__ = "projects"
     
@@ -26,8 +37,10 @@ class Project(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     pdf_filename = Column(String, unique=True)
     pdf_s3_key = Column(String, nullable=True)
+    pdf_sha256 = Column(String(64), ForeignKey("pdf_blobs.sha256"), nullable=True, index=True)  # None for legacy uploads
     total_length_ft = Column(Float, default=0.0)
     page_count = Column(Integer, default=1)
+    revision = Column(Integer, default=0)  # bumped by every content write; keys cached exports
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
@@ -37,6 +50,70 @@ class Project(Base):
     markers = relationship("Marker", back_populates="project", cascade="all, delete-orphan")
     conduits = relationship("Conduit", back_populates="project", cascade="all, delete-orphan")
     cable_configuration = relationship("CableConfiguration", back_populates="project", uselist=False, cascade="all, delete-orphan")
+    pages = relationship("ProjectPage", back_populates="project", cascade="all, delete-orphan", order_by="ProjectPage.page_number")
+    export_jobs = relationship("ExportJob", back_populates="project", cascade="all, delete-orphan")
+
+class ProjectPage(Base):
+    __tablename__ = "project_pages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    page_number = Column(Integer)
+    media_box = Column(JSON)  # [left, bottom, right, top] in PDF units
+    width = Column(Float)
+    height = Column(Float)
+    rotation = Column(Integer, default=0)  # /Rotate in degrees
+    user_unit = Column(Float, default=1.0)
+    
+    __table_args__ = (UniqueConstraint('project_id', 'page_number', name='_project_page_uc'),)
+    
+    project = relationship("Project", back_populates="pages")
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String(36), primary_key=True)  # uuid4 handed to the client
+    name = Column(String)  # project name to create on finalize
+    description = Column(Text, nullable=True)
+    filename = Column(String)
+    total_size = Column(Integer)  # declared size of the whole file in bytes
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
+    
+    chunks = relationship("UploadChunk", back_populates="session", cascade="all, delete-orphan", order_by="UploadChunk.offset")
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), ForeignKey("upload_sessions.id"), index=True)
+    chunk_number = Column(Integer)
+    offset = Column(Integer)  # byte offset of the chunk within the file
+    size = Column(Integer)
+    
+    __table_args__ = (UniqueConstraint('session_id', 'chunk_number', name='_upload_chunk_uc'),)
+    
+    session = relationship("UploadSession", back_populates="chunks")
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    
+    id = Column(String(36), primary_key=True)  # uuid4 handed to the client
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    request_key = Column(String(64), unique=True, index=True)  # hash of format, options and the exported content
+    format = Column(String)  # "csv", "json" or "pdf"
+    options = Column(JSON)  # export options that apply to the format
+    status = Column(String, default="queued")  # queued, running, done or failed
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    error = Column(Text, nullable=True)
+    filename = Column(String)  # download name of the artifact
+    size_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while queued or running; stale means the worker exited
+    expires_at = Column(DateTime, index=True)  # row and artifact are removed after this
+    
+    project = relationship("Project", back_populates="export_jobs")
 
 class ScaleCalibration(Base):
     __tablename__ = "scale_calibrations"
@@ -62,7 +139,10 @@ class Polyline(Base):
     name = Column(String)
     description = Column(Text, nullable=True)
     page_number = Column(Integer)
-    points = Column(JSON)  # [{x: float, y: float}, ...]
+    points = Column(JSON, nullable=True)  # [{x: float, y: float}, ...]; None when stored packed
+    points_packed = Column(LargeBinary, nullable=True)  # little-endian float64 x, y pairs
+    point_count = Column(Integer, nullable=True)
+    arc_lengths_packed = Column(LargeBinary, nullable=True)  # cumulative length at each vertex, float64
     length_ft = Column(Float, default=0.0)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from app.models.cable_schemas import CableConfigurationResponse
+
 # Point schema
 class Point(BaseModel):
     x: float
@@ -22,6 +24,11 @@ class ScaleCalibrationResponse(ScaleCalibration):
     page_number: int
     created_at: datetime
 
+class ScaleCalibrationSaveResponse(ScaleCalibration):
+    routes_remeasured: int = 0  # polylines whose length_ft changed with the new scale
+    page_length_ft: float = 0.0
+    total_length_ft: float = 0.0
+
 # Polyline/Path schemas
 class PolylineCreate(BaseModel):
     name: str
@@ -54,6 +61,9 @@ class MarkerResponse(MarkerCreate):
     created_at: datetime
     updated_at: datetime
 
+class MarkerNearestResponse(MarkerResponse):
+    distance: float  # PDF units from the query point
+
 # Marker Link schemas
 class MarkerLinkCreate(BaseModel):
     marker_id: int
@@ -66,6 +76,19 @@ class MarkerLinkResponse(MarkerLinkCreate):
     created_at: datetime
     updated_at: datetime
 
+# Bulk assignment schemas
+class BulkAssignmentCreate(BaseModel):
+    page_number: int
+    lots: List[Point]  # lot positions to assign, in PDF units
+    marker_types: List[str] = ["terminal", "dropPed"]  # candidate markers
+    max_distance: Optional[float] = None  # leave lots farther than this unassigned
+
+class BulkAssignmentResponse(BaseModel):
+    created: List[MarkerLinkResponse]
+    duplicate_count: int  # lots already linked to their nearest marker
+    unassigned: List[Point]  # lots with no candidate marker in range
+    marker_counts: Dict[int, int]  # marker id -> lots resolved to it
+
 # Conduit schemas
 class ConduitCreate(BaseModel):
     page_number: int
@@ -79,6 +102,15 @@ class ConduitResponse(ConduitCreate):
     created_at: datetime
     updated_at: datetime
 
+# Page metadata schemas
+class ProjectPageResponse(BaseModel):
+    page_number: int
+    media_box: List[float]
+    width: float
+    height: float
+    rotation: int
+    user_unit: float
+
 # Project schemas
 class ProjectCreate(BaseModel):
     name: str
@@ -99,6 +131,8 @@ class ProjectResponse(ProjectCreate):
     pdf_filename: str
     page_count: int
     total_length_ft: float
+    pdf_size_bytes: Optional[int] = None  # uploaded file
+    pdf_compacted_size_bytes: Optional[int] = None  # stored compacted copy, if any
     project_number: Optional[str] = None
     devlog_number: Optional[str] = None
     pon_cable_name: Optional[str] = None
@@ -110,6 +144,37 @@ class ProjectDetail(ProjectResponse):
     scale_calibrations: List[ScaleCalibrationResponse]
     scale_calibrations: List[ScaleCalibrationResponse]
 
+class ProjectSnapshot(BaseModel):
+    """Everything the editor loads when it opens a project."""
+    revision: int
+    project: ProjectResponse
+    pages: List[ProjectPageResponse]
+    scale_calibrations: List[ScaleCalibrationResponse]
+    polylines: List[PolylineResponse]
+    markers: List[MarkerResponse]
+    marker_links: List[MarkerLinkResponse]  # also the lot assignments
+    conduits: List[ConduitResponse]
+    cable_configuration: Optional[CableConfigurationResponse] = None
+
+# Resumable upload schemas
+class UploadSessionCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    filename: str
+    total_size: int  # bytes
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    name: str
+    filename: str
+    total_size: int
+    chunk_size: int  # suggested bytes per chunk
+    received_bytes: int
+    received_ranges: List[List[int]]  # [start, end) byte ranges on disk
+    missing_ranges: List[List[int]]
+    created_at: datetime
+    updated_at: datetime
+
 # Export schemas
 class ExportRequest(BaseModel):
     format: str  # "csv" or "pdf"
@@ -120,6 +185,36 @@ class ExportResponse(BaseModel):
     content_type: str
     size: int
 
+# Export job schemas
+class ExportJobCreate(BaseModel):
+    format: str  # "csv", "json" or "pdf"
+    slack_factor: Optional[float] = None  # csv and json
+    page_number: Optional[int] = None  # pdf options, as the synchronous PDF export takes them
+    page_width: Optional[float] = None
+    page_height: Optional[float] = None
+    rotation: int = 0
+    mode: str = "rewrite"
+
+class ExportJobResponse(BaseModel):
+    id: str
+    project_id: int
+    format: str
+    options: Dict
+    status: str  # queued, running, done or failed
+    progress: float  # 0.0 - 1.0
+    error: Optional[str] = None
+    filename: str
+    size_bytes: Optional[int] = None
+    download_url: Optional[str] = None  # set once the job is done
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    expires_at: datetime
+
+class BatchExportRequest(BaseModel):
+    project_ids: List[int]
+    formats: List[str] = ["csv", "json", "pdf"]
+    slack_factor: Optional[float] = None  # csv and json
+
 # Measurement response
 class MeasurementResponse(BaseModel):
     polyline_id: int
@@ -2,7 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.models.database import Project, Marker, MarkerLink
-from app.models.schemas import MarkerLinkCreate, MarkerLinkResponse
+from app.models.schemas import (
+    MarkerLinkCreate,
+    MarkerLinkResponse,
+    BulkAssignmentCreate,
+    BulkAssignmentResponse,
+)
+from app.services.project_revision import bump_revision
+from app.services.spatial_index import marker_index
 from typing import List
 
 router = APIRouter(prefix="/api/projects", tags=["assignments"])
@@ -45,10 +52,108 @@ def create_assignment(
         to_y=assignment.to_y
     )
     db.add(link)
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(link)
     return link
 
+@router.post("/{project_id}/assignments/bulk", response_model=BulkAssignmentResponse)
+def create_bulk_assignments(
+    project_id: int,
+    request: BulkAssignmentCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Assign many lots at once, each to its nearest terminal or drop pedestal.
+
+    Nearest markers come from the page's spatial index and every new link is
+    inserted in a single transaction. Lots that already have the link are
+    counted as duplicates; lots beyond max_distance, or whose nearest marker
+    was deleted or moved off the page meanwhile, are left unassigned.
+    """
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    nearest = marker_index.nearest_many(
+        db,
+        project_id,
+        request.page_number,
+        [(lot.x, lot.y) for lot in request.lots],
+        k=1,
+        max_distance=request.max_distance,
+        tag=request.marker_types,
+    )
+    
+    # The index may predate a concurrent marker write; only link markers that
+    # still exist on this page, as seen by this transaction
+    chosen = {matches[0][1] for matches in nearest if matches}
+    valid_ids = {
+        marker_id
+        for (marker_id,) in db.query(Marker.id).filter(
+            Marker.id.in_(chosen),
+            Marker.project_id == project_id,
+            Marker.page_number == request.page_number,
+        )
+    } if chosen else set()
+    
+    # Existing links on this page, fetched once for duplicate checks
+    existing = {
+        (marker_id, to_x, to_y)
+        for marker_id, to_x, to_y in db.query(
+            MarkerLink.marker_id, MarkerLink.to_x, MarkerLink.to_y
+        ).join(Marker).filter(
+            Marker.project_id == project_id,
+            MarkerLink.page_number == request.page_number,
+        )
+    }
+    
+    new_links = []
+    unassigned = []
+    marker_counts = {}
+    duplicate_count = 0
+    for lot, matches in zip(request.lots, nearest):
+        if not matches or matches[0][1] not in valid_ids:
+            unassigned.append(lot)
+            continue
+        marker_id = matches[0][1]
+        marker_counts[marker_id] = marker_counts.get(marker_id, 0) + 1
+        key = (marker_id, lot.x, lot.y)
+        if key in existing:
+            duplicate_count += 1
+            continue
+        existing.add(key)
+        new_links.append(MarkerLink(
+            marker_id=marker_id,
+            page_number=request.page_number,
+            to_x=lot.x,
+            to_y=lot.y
+        ))
+    
+    db.add_all(new_links)
+    db.flush()  # Assign ids and timestamps without re-reading each row after commit
+    created = [
+        MarkerLinkResponse(
+            id=link.id,
+            marker_id=link.marker_id,
+            page_number=link.page_number,
+            to_x=link.to_x,
+            to_y=link.to_y,
+            created_at=link.created_at,
+            updated_at=link.updated_at,
+        )
+        for link in new_links
+    ]
+    bump_revision(db, project_id)
+    db.commit()
+    
+    return BulkAssignmentResponse(
+        created=created,
+        duplicate_count=duplicate_count,
+        unassigned=unassigned,
+        marker_counts=marker_counts,
+    )
+
 @router.get("/{project_id}/assignments", response_model=List[MarkerLinkResponse])
 def get_assignments(project_id: int, db: Session = Depends(get_db)):
     """Get all assignments for a project"""
@@ -80,6 +185,7 @@ def delete_assignment(
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     db.delete(link)
+    bump_revision(db, project_id)
     db.commit()
     return {"status": "deleted"}
 
@@ -105,6 +211,7 @@ def update_assignment(
     link.to_x = assignment.to_x
     link.to_y = assignment.to_y
     link.page_number = assignment.page_number
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(link)
     return link
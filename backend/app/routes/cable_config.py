@@ -18,6 +18,7 @@ from app.models.cable_schemas import (
     CableConfigResponse,
     TeatherSplicerResponse
 )
+from app.services.project_revision import bump_revision
 from app.services.cable_service import (
     calculate_terminal_suggestion,
     validate_cable_type_size,
@@ -67,6 +68,7 @@ def create_cable_configuration(
     existing = db.query(CableConfiguration).filter(CableConfiguration.project_id == project_id).first()
     if existing:
         db.delete(existing)
+        bump_revision(db, project_id)
         db.commit()
     
     # Create new configuration
@@ -143,6 +145,7 @@ def create_cable_configuration(
         )
         db.add(db_teather)
     
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_config)
     
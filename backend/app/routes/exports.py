@@ -1,222 +1,340 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from io import BytesIO
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Iterator, Optional
 import os
+import tempfile
 
 from app.db.database import get_db
-from app.models.database import Project, Polyline, ScaleCalibration, Marker, MarkerLink, Conduit
-from app.services.export_service import generate_csv_report, generate_json_report
-from app.services.pdf_overlay import overlay_drawings_on_pdf
+from app.models.database import ExportJob, Project
+from app.models.schemas import BatchExportRequest, ExportJobCreate, ExportJobResponse
+from app.services.batch_export import BATCH_FORMATS, batch_members, stream_batch_zip
+from app.services.export_jobs import (
+    DONE,
+    JOB_FORMATS,
+    artifact_path,
+    collect_expired_jobs,
+    enqueue_export,
+    is_abandoned,
+    prepare_export,
+)
+from app.services.export_cache import (
+    cached_export_response,
+    export_cache_key,
+    export_headers,
+    store_export,
+    stream_into_cache,
+)
+from app.services.export_service import (
+    collect_overlay_data,
+    iter_csv_report,
+    iter_json_report,
+    iter_report_polylines,
+    pdf_export_filename,
+    report_scale_calibrations,
+    safe_filename,
+)
+from app.services.file_delivery import AppendedFileResponse, conditional_file_response, spooled_file_response
+from app.services.pdf_incremental import write_overlay_update
+from app.services.pdf_overlay import write_overlaid_pdf
+from app.services.page_metadata import load_project_pages, page_geometry_map
+from app.services.pdf_storage import project_pdf_path
 from app.config import settings
 
 router = APIRouter(prefix="/api/exports", tags=["exports"])
 
-@router.get("/{project_id}/csv")
-def export_csv(
+@router.post("/batch")
+def export_batch(request: BatchExportRequest, db: Session = Depends(get_db)):
+    """
+    Export several projects in one ZIP, one folder per project.
+
+    Members are generated in parallel and streamed as they finish; members
+    that fail are listed in errors.txt inside the archive.
+    """
+    unknown = [f for f in request.formats if f not in BATCH_FORMATS]
+    if unknown or not request.formats:
+        raise HTTPException(status_code=400, detail=f"formats must be among {', '.join(BATCH_FORMATS)}")
+    project_ids = list(dict.fromkeys(request.project_ids))
+    if not project_ids:
+        raise HTTPException(status_code=400, detail="No projects to export")
+    found = {p.id for p in db.query(Project.id).filter(Project.id.in_(project_ids))}
+    missing = [project_id for project_id in project_ids if project_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Projects not found: {', '.join(map(str, missing))}")
+    
+    # Projects are read while the archive streams, after this request's session is closed
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    members = batch_members(session_factory, project_ids, list(dict.fromkeys(request.formats)), request.slack_factor)
+    return StreamingResponse(
+        stream_batch_zip(members),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=fiber_exports.zip"},
+    )
+
+def _stream_report(db: Session, project: Project, iter_report, slack_factor: Optional[float]) -> Iterator[str]:
+    """
+    Report text as iter_report produces it, with polylines read in batches.
+    
+    The body streams after the request's session is closed, so the rows are
+    read through a session of its own.
+    """
+    project_id = project.id
+    project_name = project.name
+    total_length_ft = project.total_length_ft
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    
+    def chunks():
+        report_db = session_factory()
+        try:
+            yield from iter_report(
+                project_name=project_name,
+                total_length_ft=total_length_ft,
+                polylines=iter_report_polylines(report_db, project_id),
+                scale_calibrations=report_scale_calibrations(report_db, project_id),
+                slack_factor=slack_factor,
+            )
+        finally:
+            report_db.close()
+    
+    return chunks()
+
+def _report_response(
+    request: Request,
+    db: Session,
     project_id: int,
-    slack_factor: float = Query(None, description="Slack factor (e.g., 0.05 for 5%)"),
-    db: Session = Depends(get_db),
+    format: str,
+    iter_report,
+    media_type: str,
+    slack_factor: Optional[float],
 ):
-    """Export project measurements as CSV."""
+    """
+    A report from the export cache, or streamed as the rows are read and
+    cached once complete.
+    """
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    polylines = db.query(Polyline).filter(Polyline.project_id == project_id).all()
-    scale_calibrations = db.query(ScaleCalibration).filter(
-        ScaleCalibration.project_id == project_id
-    ).all()
-    
-    polyline_data = [
-        {
-            "name": p.name,
-            "page_number": p.page_number,
-            "points": p.points,
-            "length_ft": p.length_ft,
-        }
-        for p in polylines
-    ]
-    
-    scale_calib_data = [
-        {
-            "page_number": sc.page_number,
-            "method": sc.method,
-            "scale_factor": sc.scale_factor,
-            "manual_scale_str": sc.manual_scale_str,
-            "known_distance_ft": sc.known_distance_ft,
-        }
-        for sc in scale_calibrations
-    ]
-    
-    csv_content = generate_csv_report(
-        project_name=project.name,
-        total_length_ft=project.total_length_ft,
-        polylines=polyline_data,
-        scale_calibrations=scale_calib_data,
-        slack_factor=slack_factor,
-    )
-    
-    # Sanitize project name for filename
-    safe_project_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in project.name)
-    
+    filename = f"{safe_filename(project.name)}_report.{format}"
+    key = export_cache_key(project, format, {"slack_factor": slack_factor})
+    cached = cached_export_response(request.headers, key, filename, media_type)
+    if cached is not None:
+        return cached
     return StreamingResponse(
-        iter([csv_content]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={safe_project_name}_report.csv"},
+        stream_into_cache(key, _stream_report(db, project, iter_report, slack_factor)),
+        media_type=media_type,
+        headers=export_headers(key, filename),
     )
 
+@router.get("/{project_id}/csv")
+def export_csv(
+    project_id: int,
+    request: Request,
+    slack_factor: float = Query(None, description="Slack factor (e.g., 0.05 for 5%)"),
+    db: Session = Depends(get_db),
+):
+    """Export project measurements as CSV, streamed as the rows are read."""
+    return _report_response(request, db, project_id, "csv", iter_csv_report, "text/csv", slack_factor)
+
 @router.get("/{project_id}/json")
 def export_json(
     project_id: int,
+    request: Request,
     slack_factor: float = Query(None, description="Slack factor (e.g., 0.05 for 5%)"),
     db: Session = Depends(get_db),
 ):
-    """Export project measurements as JSON."""
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    polylines = db.query(Polyline).filter(Polyline.project_id == project_id).all()
-    scale_calibrations = db.query(ScaleCalibration).filter(
-        ScaleCalibration.project_id == project_id
-    ).all()
-    
-    polyline_data = [
-        {
-            "name": p.name,
-            "page_number": p.page_number,
-            "points": p.points,
-            "length_ft": p.length_ft,
-        }
-        for p in polylines
-    ]
-    
-    scale_calib_data = [
-        {
-            "page_number": sc.page_number,
-            "method": sc.method,
-            "scale_factor": sc.scale_factor,
-            "manual_scale_str": sc.manual_scale_str,
-            "known_distance_ft": sc.known_distance_ft,
-        }
-        for sc in scale_calibrations
-    ]
-    
-    json_content = generate_json_report(
-        project_name=project.name,
-        total_length_ft=project.total_length_ft,
-        polylines=polyline_data,
-        scale_calibrations=scale_calib_data,
-        slack_factor=slack_factor,
-    )
-    
-    # Sanitize project name for filename
-    safe_project_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in project.name)
-    
-    return StreamingResponse(
-        iter([json_content]),
-        media_type="application/json",
-        headers={"Content-Disposition": f"attachment; filename={safe_project_name}_report.json"},
-    )
+    """Export project measurements as JSON, streamed as the rows are read."""
+    return _report_response(request, db, project_id, "json", iter_json_report, "application/json", slack_factor)
 
 @router.get("/{project_id}/pdf")
 def export_pdf_with_overlays(
     project_id: int,
+    request: Request,
     page_number: int = Query(None, description="Specific page to export (default: all pages)"),
     page_width: float = Query(None, description="Rendered page width from frontend"),
     page_height: float = Query(None, description="Rendered page height from frontend"),
     rotation: int = Query(0, description="PDF rotation in degrees (0, 90, 180, 270)"),
+    mode: str = Query("rewrite", description="'rewrite' the whole PDF, or append the overlays as an 'incremental' update"),
     db: Session = Depends(get_db),
 ):
-    """Export PDF with all drawn routes, markers, and annotations overlaid on all pages."""
+    """
+    Export PDF with all drawn routes, markers, and annotations overlaid on all pages.
+
+    In incremental mode the original file is sent unchanged, followed by a
+    PDF incremental update holding only the overlays and the changed pages.
+    PDFs that cannot be updated in place (e.g. encrypted) are rewritten.
+    Exports are cached per project revision and options.
+    """
+    if mode not in ("rewrite", "incremental"):
+        raise HTTPException(status_code=400, detail="mode must be 'rewrite' or 'incremental'")
+    
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Get the actual PDF file path from the project
-    pdf_path = os.path.join(settings.UPLOAD_DIR, project.pdf_filename)
+    pdf_path = project_pdf_path(project)
     if not os.path.exists(pdf_path):
         raise HTTPException(status_code=404, detail="Project PDF not found")
     
-    # Get all drawn content for this project
-    polylines = db.query(Polyline).filter(Polyline.project_id == project_id).all()
-    markers = db.query(Marker).filter(Marker.project_id == project_id).all()
-    marker_links = db.query(MarkerLink).join(Marker).filter(Marker.project_id == project_id).all()
-    conduits = db.query(Conduit).filter(Conduit.project_id == project_id).all()
-    
-    # Filter out any polylines that are actually conduits (legacy data)
-    # Real fiber routes shouldn't have "Conduit" in the name
-    fiber_polylines = [p for p in polylines if "Conduit" not in (p.name or "")]
+    filename = pdf_export_filename(project.name, page_number)
+    options = dict(page_number=page_number, page_width=page_width, page_height=page_height, rotation=rotation, mode=mode)
+    key = export_cache_key(project, "pdf", options)
+    cached = cached_export_response(
+        request.headers,
+        key,
+        filename,
+        "application/pdf",
+        prefix_path=pdf_path if mode == "incremental" else None,
+    )
+    if cached is not None:
+        return cached
     
-    # Sort polylines by page_number and id for consistent global numbering
-    sorted_polylines = sorted(fiber_polylines, key=lambda p: (p.page_number, p.id))
+    # Get all drawn content for this project
+    all_data = collect_overlay_data(db, project)
     
-    # Organize data by page number with global cable numbers
-    all_data = {
-        "polylines": [
-            {
-                "name": p.name,
-                "page_number": p.page_number,
-                "points": p.points,
-                "length_ft": p.length_ft,
-                "type": "fiber",  # All polylines in DB are fiber routes (conduits are separate)
-                "global_index": idx + 1,  # Global cable number across all pages
-            }
-            for idx, p in enumerate(sorted_polylines)
-        ],
-        "markers": [
-            {
-                "id": m.id,
-                "x": m.x,
-                "y": m.y,
-                "type": m.marker_type,
-                "page_number": m.page_number,
-            }
-            for m in markers
-        ],
-        "marker_links": [
-            {
-                "markerId": ml.marker_id,
-                "to": {"x": ml.to_x, "y": ml.to_y},
-                "page_number": ml.page_number,
-            }
-            for ml in marker_links
-        ],
-        "conduits": [
-            {
-                "terminalId": c.terminal_id,
-                "dropPedId": c.drop_ped_id,
-                "footage": c.footage,
-                "page_number": c.page_number,
-            }
-            for c in conduits
-        ],
-    }
+    print(f"PDF Export: {len(all_data['polylines'])} polylines, {len(all_data['markers'])} markers, {len(all_data['conduits'])} conduits")
+    for idx, p in enumerate(all_data["polylines"]):
+        print(f"  Polyline {idx}: page={p['page_number']}, type=fiber, points={len(p['points'])}")
     
-    print(f"PDF Export: {len(polylines)} polylines, {len(markers)} markers, {len(conduits)} conduits")
-    for idx, p in enumerate(polylines):
-        print(f"  Polyline {idx}: page={p.page_number}, type=fiber, points={len(p.points)}")
+    page_geometry = page_geometry_map(load_project_pages(db, project))
     
-    # Create PDF with overlays on all pages
+    # Create PDF with overlays on all pages, spooled to disk once it outgrows memory
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_MEMORY, dir=settings.UPLOAD_DIR)
     try:
-        pdf_bytes = overlay_drawings_on_pdf(
+        if mode == "incremental":
+            try:
+                write_overlay_update(
+                    pdf_path,
+                    spool,
+                    all_data=all_data,
+                    single_page=page_number,
+                    page_width=page_width,
+                    page_height=page_height,
+                    page_geometry=page_geometry,
+                )
+                store_export(key, spool)
+                response = AppendedFileResponse(pdf_path, spool, filename)
+                response.headers.update(export_headers(key, filename))
+                return response
+            except Exception as e:
+                print(f"PDF Export: incremental update failed ({e}), rewriting instead")
+                spool.seek(0)
+                spool.truncate()
+        
+        overlaid = write_overlaid_pdf(
             pdf_path,
+            spool,
             all_data=all_data,
             single_page=page_number,
             page_width=page_width,
             page_height=page_height,
             rotation=rotation,
+            page_geometry=page_geometry,
         )
         
-        # Sanitize project name for filename (replace spaces and special chars)
-        safe_project_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in project.name)
-        filename = f"{safe_project_name}_annotated.pdf" if page_number is None else f"{safe_project_name}_page_{page_number}_annotated.pdf"
-        
-        return StreamingResponse(
-            iter([pdf_bytes]),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        # A fallback copy of the original, or a rewrite standing in for an
+        # incremental update, is not what the key names
+        if not overlaid or mode != "rewrite":
+            return spooled_file_response(spool, filename)
+        store_export(key, spool)
+        response = spooled_file_response(spool, filename)
+        response.headers.update(export_headers(key, filename))
+        return response
     except Exception as e:
+        spool.close()
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
+
+
+def _job_response(job: ExportJob) -> ExportJobResponse:
+    return ExportJobResponse(
+        id=job.id,
+        project_id=job.project_id,
+        format=job.format,
+        options=job.options,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        filename=job.filename,
+        size_bytes=job.size_bytes,
+        download_url=f"/api/exports/{job.project_id}/jobs/{job.id}/download" if job.status == DONE else None,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+    )
+
+
+def _get_job(db: Session, project_id: int, job_id: str) -> ExportJob:
+    collect_expired_jobs(db)
+    job = db.query(ExportJob).filter(ExportJob.id == job_id, ExportJob.project_id == project_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.post("/{project_id}/jobs", response_model=ExportJobResponse)
+def create_export_job(project_id: int, request: ExportJobCreate, db: Session = Depends(get_db)):
+    """
+    Queue a CSV, JSON or PDF export to be built in the background.
+
+    Poll the returned job for progress and download the artifact once it is
+    done. Repeating a request while the project is unchanged returns the
+    same job.
+    """
+    if request.format not in JOB_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(JOB_FORMATS)}")
+    if request.mode not in ("rewrite", "incremental"):
+        raise HTTPException(status_code=400, detail="mode must be 'rewrite' or 'incremental'")
+    
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if request.format == "pdf" and not os.path.exists(project_pdf_path(project)):
+        raise HTTPException(status_code=404, detail="Project PDF not found")
+    
+    collect_expired_jobs(db)
+    export = prepare_export(db, project, request.format, request.model_dump())
+    # The worker thread gets its own session on the same database
+    job = enqueue_export(db, project_id, export, sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()))
+    return _job_response(job)
+
+
+def _recover_job(db: Session, job: ExportJob) -> ExportJob:
+    """
+    Queue an abandoned job again (see is_abandoned) while the project is
+    unchanged; an edited project needs a new job, so the old one is left.
+    """
+    if not is_abandoned(job):
+        return job
+    project = db.query(Project).filter(Project.id == job.project_id).first()
+    if not project:
+        return job
+    if job.format == "pdf" and not os.path.exists(project_pdf_path(project)):
+        return job
+    export = prepare_export(db, project, job.format, job.options)
+    if export["key"] != job.request_key:
+        return job
+    return enqueue_export(db, project.id, export, sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()))
+
+
+@router.get("/{project_id}/jobs/{job_id}", response_model=ExportJobResponse)
+def get_export_job(project_id: int, job_id: str, db: Session = Depends(get_db)):
+    """Status and progress of an export job; one left behind by a stopped worker is queued again."""
+    return _job_response(_recover_job(db, _get_job(db, project_id, job_id)))
+
+
+@router.get("/{project_id}/jobs/{job_id}/download")
+def download_export_job(project_id: int, job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Download a finished export job's artifact, rebuilding it if it has gone missing."""
+    job = _recover_job(db, _get_job(db, project_id, job_id))
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    path = artifact_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Export artifact is no longer available")
+    return conditional_file_response(
+        request.headers,
+        path,
+        filename=job.filename,
+        media_type=JOB_FORMATS[job.format],
+    )
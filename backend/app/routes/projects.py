@@ -1,28 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, update
+from typing import List, Optional
 import os
-import shutil
 import uuid
 
 from app.db.database import get_db
-from app.models.database import Project, Polyline, ScaleCalibration, Marker, MarkerLink, Conduit
+from app.models.database import Project, PdfBlob, Polyline, ScaleCalibration, Marker, MarkerLink, Conduit
 from app.models.schemas import (
     ProjectCreate, ProjectResponse, ProjectDetail,
     PolylineCreate, PolylineResponse,
     ScaleCalibration as ScaleCalibrationSchema,
-    MarkerCreate, MarkerResponse,
+    ScaleCalibrationSaveResponse,
+    MarkerCreate, MarkerResponse, MarkerNearestResponse,
     MarkerLinkCreate, MarkerLinkResponse,
     ConduitCreate, ConduitResponse,
+    ProjectPageResponse,
+    ProjectSnapshot,
 )
 from app.services.geometry import (
+    batch_polyline_lengths_pdf_units,
     calculate_polyline_length_ft,
     calculate_two_point_scale,
     parse_manual_scale,
 )
-from app.services.pdf_handler import validate_pdf_file, get_pdf_info
+from app.services.pdf_handler import compact_pdf, ingest_pdf
+from app.services.page_metadata import build_project_pages, load_project_pages, stored_pages_for_blob
+from app.services.file_delivery import conditional_file_response
+from app.services.export_jobs import remove_job_files
+from app.services.project_revision import bump_revision
+from app.services.project_snapshot import (
+    load_project_snapshot,
+    not_modified_response,
+    snapshot_etag,
+    snapshot_response,
+)
+from app.services.page_cache import extract_pages, format_page_spec, parse_page_spec
+from app.services.pdf_storage import (
+    acquire_blob,
+    adopt_legacy_pdf,
+    blob_lock,
+    blob_path,
+    commit_blob_file,
+    compacted_blob_path,
+    project_pdf_path,
+    project_pdf_tag,
+    release_blob,
+    remove_blob_files,
+    UploadRejected,
+    write_upload,
+)
+from app.services.spatial_index import marker_index
+from app.services.polyline_storage import load_points, pack_stored_polylines, store_points
 from app.config import settings
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
@@ -30,49 +59,73 @@ router = APIRouter(prefix="/api/projects", tags=["projects"])
 # Ensure upload directory exists
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
-@router.post("/", response_model=ProjectResponse)
-def create_project(
-    name: str = Form(...),
-    description: str = Form(None),
-    pdf_file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-):
-    """Create a new project with a PDF upload."""
-    
+def create_project_from_file(db: Session, name: str, description: Optional[str], filename: str, fileobj) -> ProjectResponse:
+    """
+    Store, validate and ingest a plat PDF read from `fileobj` and create its project.
+
+    Shared by the direct upload route and resumable upload finalization.
+    """
     # Enforce unique project names (case-insensitive)
     existing = db.query(Project).filter(func.lower(Project.name) == name.lower()).first()
     if existing:
         raise HTTPException(status_code=400, detail="Project name already exists")
 
-    # Generate unique filename to avoid conflicts
-    file_ext = os.path.splitext(pdf_file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    temp_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    file_ext = os.path.splitext(filename)[1]
+    temp_path = None
     
     try:
-        # Save uploaded file temporarily
-        with open(temp_path, "wb") as f:
-            shutil.copyfileobj(pdf_file.file, f)
+        # Stream the upload to disk, hashing and checking size/header/trailer on the way
+        try:
+            upload = write_upload(fileobj, suffix=file_ext, max_size=settings.MAX_UPLOAD_SIZE)
+        except UploadRejected as e:
+            detail = str(e) if e.status_code == 413 else f"Invalid PDF: {e}"
+            raise HTTPException(status_code=e.status_code, detail=detail)
+        temp_path, sha256, size_bytes = upload["path"], upload["sha256"], upload["size_bytes"]
         
-        # Validate it's a valid PDF
-        is_valid, message = validate_pdf_file(temp_path)
-        if not is_valid:
-            os.remove(temp_path)
-            raise HTTPException(status_code=400, detail=f"Invalid PDF: {message}")
+        # Identical content is already stored: reuse its page metadata without parsing.
+        # Pages depend only on the content, so this holds even if the blob is released meanwhile
+        pages = stored_pages_for_blob(db, sha256) if os.path.exists(blob_path(sha256)) else None
+        if pages is None:
+            # Validate it's a valid PDF and read page geometry in one parse
+            pdf_info = ingest_pdf(temp_path)
+            if not pdf_info["is_valid"]:
+                raise HTTPException(status_code=400, detail=f"Invalid PDF: {pdf_info['message']}")
+            pages = pdf_info["pages"]
         
-        # Get PDF info
-        pdf_info = get_pdf_info(temp_path)
-        
-        # Create project in database
-        db_project = Project(
-            name=name,
-            description=description,
-            pdf_filename=unique_filename,
-            page_count=pdf_info.get("page_count", 1),
-        )
-        db.add(db_project)
-        db.commit()
+        with blob_lock(sha256):
+            # Take the reference first, so no other request can release the file from here on
+            blob = acquire_blob(db, sha256, size_bytes, len(pages))
+            db.flush()
+            is_new_blob = not os.path.exists(blob_path(sha256))
+            commit_blob_file(temp_path, sha256)
+            temp_path = None
+            
+            try:
+                # Optionally store a compacted copy next to the original, which stays as the fallback
+                if is_new_blob and settings.PDF_COMPACT_ON_INGEST:
+                    compaction = compact_pdf(blob_path(sha256), compacted_blob_path(sha256))
+                    print(f"PDF compaction for {sha256[:12]}: {compaction['message']}")
+                    blob.compacted_size_bytes = compaction["compacted_size"]
+                
+                # Create project in database; pdf_filename stays a unique per-project name
+                db_project = Project(
+                    name=name,
+                    description=description,
+                    pdf_filename=f"{uuid.uuid4()}{file_ext}",
+                    pdf_sha256=sha256,
+                    page_count=len(pages),
+                )
+                db.add(db_project)
+                db.add_all(build_project_pages(db_project, pages))
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Nothing references a file this request stored
+                if is_new_blob:
+                    remove_blob_files(sha256)
+                raise
         db.refresh(db_project)
+        marker_index.drop_project(db_project.id)
         
         return ProjectResponse(
             id=db_project.id,
@@ -81,6 +134,8 @@ def create_project(
             pdf_filename=db_project.pdf_filename,
             page_count=db_project.page_count,
             total_length_ft=0.0,
+            pdf_size_bytes=blob.size_bytes,
+            pdf_compacted_size_bytes=blob.compacted_size_bytes,
             created_at=db_project.created_at,
             updated_at=db_project.updated_at,
         )
@@ -88,9 +143,20 @@ def create_project(
     except HTTPException:
         raise
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@router.post("/", response_model=ProjectResponse)
+def create_project(
+    name: str = Form(...),
+    description: str = Form(None),
+    pdf_file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+):
+    """Create a new project with a PDF upload."""
+    return create_project_from_file(db, name, description, pdf_file.filename, pdf_file.file)
 
 @router.get("/", response_model=List[ProjectResponse])
 def list_projects(db: Session = Depends(get_db)):
@@ -114,22 +180,67 @@ def list_projects(db: Session = Depends(get_db)):
     ]
 
 @router.get("/{project_id}/pdf")
-def get_project_pdf(project_id: int, db: Session = Depends(get_db)):
-    """Download the PDF file for a project."""
+def get_project_pdf(
+    project_id: int,
+    request: Request,
+    pages: Optional[str] = Query(None, description='Only these pages, e.g. "3", "2-4" or "1,3,5-7"'),
+    db: Session = Depends(get_db),
+):
+    """
+    Download the PDF file for a project, or a standalone PDF of selected pages.
+
+    Responses carry a strong ETag and Accept-Ranges, answer conditional
+    requests with 304 and single byte ranges with 206.
+    """
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    pdf_path = os.path.join(settings.UPLOAD_DIR, project.pdf_filename)
+    pdf_path = project_pdf_path(project)
     if not os.path.exists(pdf_path):
         raise HTTPException(status_code=404, detail="PDF file not found")
     
-    return FileResponse(
+    if pages is not None:
+        try:
+            page_numbers = parse_page_spec(pages, project.page_count)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Legacy uploads are adopted into blob storage so they are hashed only once
+        sha256 = adopt_legacy_pdf(db, project)
+        if sha256 is None:
+            raise HTTPException(status_code=404, detail="PDF file not found")
+        pdf_path = project_pdf_path(project)
+        spec = format_page_spec(page_numbers)
+        stem = os.path.splitext(project.pdf_filename)[0]
+        return conditional_file_response(
+            request.headers,
+            None,
+            filename=f"{stem}-p{spec}.pdf",
+            content_hash=f"{sha256}-p{spec}",
+            fileobj=extract_pages(pdf_path, sha256, page_numbers),
+        )
+    
+    return conditional_file_response(
+        request.headers,
         pdf_path,
-        media_type="application/pdf",
-        filename=project.pdf_filename
+        filename=project.pdf_filename,
+        content_hash=project_pdf_tag(project),
     )
 
+@router.get("/{project_id}/pages/{page_number}.pdf")
+def get_project_page_pdf(project_id: int, page_number: int, request: Request, db: Session = Depends(get_db)):
+    """Download a single page of a project's PDF as a standalone file."""
+    return get_project_pdf(project_id, request, pages=str(page_number), db=db)
+
+@router.get("/{project_id}/pages", response_model=List[ProjectPageResponse])
+def get_project_pages(project_id: int, db: Session = Depends(get_db)):
+    """Get stored page geometry (media box, rotation, user unit) for a project's PDF."""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    return load_project_pages(db, project)
+
 @router.get("/{project_id}", response_model=ProjectDetail)
 def get_project(project_id: int, db: Session = Depends(get_db)):
     """Get project with all details."""
@@ -141,6 +252,7 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
     scale_calibrations = db.query(ScaleCalibration).filter(
         ScaleCalibration.project_id == project_id
     ).all()
+    blob = db.query(PdfBlob).filter(PdfBlob.sha256 == project.pdf_sha256).first() if project.pdf_sha256 else None
     
     return ProjectDetail(
         id=project.id,
@@ -152,6 +264,8 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
         pdf_filename=project.pdf_filename,
         page_count=project.page_count,
         total_length_ft=project.total_length_ft,
+        pdf_size_bytes=blob.size_bytes if blob else None,
+        pdf_compacted_size_bytes=blob.compacted_size_bytes if blob else None,
         created_at=project.created_at,
         updated_at=project.updated_at,
         polylines=[
@@ -161,7 +275,7 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
                 name=p.name,
                 description=p.description,
                 page_number=p.page_number,
-                points=p.points,
+                points=load_points(p),
                 length_ft=p.length_ft,
                 created_at=p.created_at,
                 updated_at=p.updated_at,
@@ -184,6 +298,29 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
         ],
     )
 
+@router.get("/{project_id}/snapshot", response_model=ProjectSnapshot)
+def get_project_snapshot(project_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Get everything the editor loads when it opens a project in one response.
+
+    The project, page geometry, scale calibrations, polylines, markers,
+    marker links (including assignments), conduits and cable configuration
+    are read with a fixed number of queries. The response carries an ETag
+    that changes with the project's revision and is gzip-encoded when the
+    client accepts it.
+    """
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    etag = snapshot_etag(project)
+    not_modified = not_modified_response(request.headers, etag)
+    if not_modified is not None:
+        return not_modified
+    
+    snapshot = load_project_snapshot(db, project)
+    return snapshot_response(request.headers, snapshot.model_dump_json().encode(), etag)
+
 @router.patch("/{project_id}", response_model=ProjectResponse)
 def update_project(
     project_id: int,
@@ -207,6 +344,7 @@ def update_project(
     if "pon_cable_name" in project_update:
         project.pon_cable_name = project_update["pon_cable_name"]
     
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(project)
     
@@ -219,14 +357,28 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Delete the PDF file
-    pdf_path = os.path.join(settings.UPLOAD_DIR, project.pdf_filename)
-    if os.path.exists(pdf_path):
-        os.remove(pdf_path)
+    sha256 = project.pdf_sha256
+    pdf_path = project_pdf_path(project)
+    export_job_ids = [job.id for job in project.export_jobs]
     
-    # Delete from database (cascades to polylines and calibrations)
-    db.delete(project)
-    db.commit()
+    if sha256:
+        # Release the stored PDF; it is only deleted once no project references it
+        with blob_lock(sha256):
+            # Delete from database (cascades to polylines and calibrations)
+            db.delete(project)
+            db.flush()
+            remove_file = release_blob(db, sha256)
+            db.commit()
+            if remove_file:
+                remove_blob_files(sha256)
+    else:
+        db.delete(project)
+        db.commit()
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+    marker_index.drop_project(project_id)
+    for job_id in export_job_ids:
+        remove_job_files(job_id)
     
     return {"message": "Project deleted"}
 
@@ -247,13 +399,66 @@ def get_scale_calibrations(
     return calibrations
 
 
-@router.post("/{project_id}/scale-calibrations", response_model=ScaleCalibrationSchema)
+def _remeasure_page_polylines(db: Session, project: Project, page_number: int, scale_factor: float) -> dict:
+    """
+    Recompute length_ft for every polyline on a page after its scale changed.
+    
+    Lengths are computed in one batch pass and written with a single
+    executemany UPDATE; the project total is then re-summed in SQL. Nothing is
+    committed here so the caller can keep it in the calibration's transaction.
+    """
+    rows = db.query(Polyline.id, Polyline.points, Polyline.points_packed, Polyline.length_ft).filter(
+        Polyline.project_id == project.id,
+        Polyline.page_number == page_number,
+    ).order_by(Polyline.id).all()
+    
+    coords, offsets = pack_stored_polylines(rows)
+    new_lengths = [
+        length * scale_factor
+        for length in batch_polyline_lengths_pdf_units(coords, offsets)
+    ]
+    changed = [
+        {"id": r.id, "length_ft": length_ft}
+        for r, length_ft in zip(rows, new_lengths)
+        if length_ft != r.length_ft
+    ]
+    if changed:
+        db.execute(update(Polyline), changed)
+    
+    project.total_length_ft = db.query(
+        func.coalesce(func.sum(Polyline.length_ft), 0.0)
+    ).filter(Polyline.project_id == project.id).scalar()
+    
+    return {
+        "routes_remeasured": len(changed),
+        "page_length_ft": sum(new_lengths),
+        "total_length_ft": project.total_length_ft,
+    }
+
+def _calibration_save_response(calib: ScaleCalibration, remeasured: dict) -> ScaleCalibrationSaveResponse:
+    return ScaleCalibrationSaveResponse(
+        page_number=calib.page_number,
+        method=calib.method,
+        scale_factor=calib.scale_factor,
+        manual_scale_str=calib.manual_scale_str,
+        point_a=calib.point_a,
+        point_b=calib.point_b,
+        known_distance_ft=calib.known_distance_ft,
+        **remeasured,
+    )
+
+@router.post("/{project_id}/scale-calibrations", response_model=ScaleCalibrationSaveResponse)
 def create_scale_calibration(
     project_id: int,
     calibration: ScaleCalibrationSchema,
     db: Session = Depends(get_db),
 ):
-    """Create or update scale calibration for a project page."""
+    """
+    Create or update scale calibration for a project page.
+    
+    Every route already drawn on the page is re-measured with the new scale
+    in the same transaction.
+    """
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -275,9 +480,7 @@ def create_scale_calibration(
         existing.point_a = calibration.point_a.dict() if calibration.point_a else None
         existing.point_b = calibration.point_b.dict() if calibration.point_b else None
         existing.known_distance_ft = calibration.known_distance_ft
-        db.commit()
-        db.refresh(existing)
-        return existing
+        db_calib = existing
     else:
         # Create new calibration
         db_calib = ScaleCalibration(
@@ -291,9 +494,12 @@ def create_scale_calibration(
             known_distance_ft=calibration.known_distance_ft,
         )
         db.add(db_calib)
-        db.commit()
-        db.refresh(db_calib)
-        return db_calib
+    
+    remeasured = _remeasure_page_polylines(db, project, page_number, calibration.scale_factor)
+    bump_revision(db, project_id)
+    db.commit()
+    db.refresh(db_calib)
+    return _calibration_save_response(db_calib, remeasured)
 
 @router.get("/{project_id}/polylines", response_model=List[PolylineResponse])
 def get_polylines(project_id: int, db: Session = Depends(get_db)):
@@ -304,7 +510,20 @@ def get_polylines(project_id: int, db: Session = Depends(get_db)):
     
     # Order by ID to ensure consistent ordering across page reloads
     polylines = db.query(Polyline).filter(Polyline.project_id == project_id).order_by(Polyline.id).all()
-    return polylines
+    return [
+        PolylineResponse(
+            id=p.id,
+            project_id=p.project_id,
+            name=p.name,
+            description=p.description,
+            page_number=p.page_number,
+            points=load_points(p),
+            length_ft=p.length_ft,
+            created_at=p.created_at,
+            updated_at=p.updated_at,
+        )
+        for p in polylines
+    ]
 
 @router.post("/{project_id}/polylines", response_model=PolylineResponse)
 def create_polyline(
@@ -339,15 +558,16 @@ def create_polyline(
         name=polyline.name,
         description=polyline.description,
         page_number=polyline.page_number,
-        points=points_dicts,
         length_ft=length_ft,
     )
+    store_points(db_polyline, points_dicts)
     db.add(db_polyline)
     
     # Update project total length
     project.total_length_ft += length_ft
     project.updated_at = func.now()
     
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_polyline)
     
@@ -357,7 +577,7 @@ def create_polyline(
         name=db_polyline.name,
         description=db_polyline.description,
         page_number=db_polyline.page_number,
-        points=db_polyline.points,
+        points=points_dicts,
         length_ft=db_polyline.length_ft,
         created_at=db_polyline.created_at,
         updated_at=db_polyline.updated_at,
@@ -403,8 +623,9 @@ def update_polyline(
             project.total_length_ft += new_length
             polyline.length_ft = new_length
         
-        polyline.points = points_dicts
+        store_points(polyline, points_dicts)
     
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(polyline)
     
@@ -414,7 +635,7 @@ def update_polyline(
         name=polyline.name,
         description=polyline.description,
         page_number=polyline.page_number,
-        points=polyline.points,
+        points=load_points(polyline),
         length_ft=polyline.length_ft,
         created_at=polyline.created_at,
         updated_at=polyline.updated_at,
@@ -439,6 +660,7 @@ def delete_polyline(
     project.total_length_ft -= polyline.length_ft
     
     db.delete(polyline)
+    bump_revision(db, project_id)
     db.commit()
     
     return {"message": "Polyline deleted"}
@@ -463,6 +685,7 @@ def create_marker(
         y=marker.y,
     )
     db.add(db_marker)
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_marker)
     return db_marker
@@ -487,6 +710,75 @@ def get_markers(
     return query.order_by(Marker.id).all()
 
 
+@router.get("/{project_id}/markers/in-bbox", response_model=List[MarkerResponse])
+def get_markers_in_bbox(
+    project_id: int,
+    page_number: int,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    marker_type: str = Query(None, description="Only return this marker type"),
+    db: Session = Depends(get_db),
+):
+    """Get markers on a page that fall inside a viewport bounding box."""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if min_x > max_x or min_y > max_y:
+        raise HTTPException(status_code=400, detail="Bounding box min must not exceed max")
+    
+    marker_ids = marker_index.query_bbox(
+        db, project_id, page_number, min_x, min_y, max_x, max_y, tag=marker_type
+    )
+    if not marker_ids:
+        return []
+    return db.query(Marker).filter(Marker.id.in_(marker_ids)).order_by(Marker.id).all()
+
+
+@router.get("/{project_id}/markers/nearest", response_model=List[MarkerNearestResponse])
+def get_nearest_markers(
+    project_id: int,
+    page_number: int,
+    x: float,
+    y: float,
+    k: int = Query(1, ge=1, le=100),
+    max_distance: float = Query(None, ge=0, description="Ignore markers farther than this (PDF units)"),
+    marker_type: str = Query(None, description="Only consider this marker type"),
+    db: Session = Depends(get_db),
+):
+    """Get the k markers on a page nearest to (x, y), closest first."""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    nearest = marker_index.nearest(
+        db, project_id, page_number, x, y, k=k, max_distance=max_distance, tag=marker_type
+    )
+    if not nearest:
+        return []
+    
+    markers = {
+        m.id: m
+        for m in db.query(Marker).filter(Marker.id.in_([marker_id for _, marker_id in nearest])).all()
+    }
+    return [
+        MarkerNearestResponse(
+            id=markers[marker_id].id,
+            project_id=markers[marker_id].project_id,
+            page_number=markers[marker_id].page_number,
+            marker_type=markers[marker_id].marker_type,
+            x=markers[marker_id].x,
+            y=markers[marker_id].y,
+            created_at=markers[marker_id].created_at,
+            updated_at=markers[marker_id].updated_at,
+            distance=distance,
+        )
+        for distance, marker_id in nearest
+        if marker_id in markers
+    ]
+
+
 @router.put("/{project_id}/markers/{marker_id}", response_model=MarkerResponse)
 def update_marker(
     project_id: int,
@@ -508,6 +800,7 @@ def update_marker(
     db_marker.x = marker.x
     db_marker.y = marker.y
 
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_marker)
 
@@ -530,6 +823,7 @@ def delete_marker(
         raise HTTPException(status_code=404, detail="Marker not found")
     
     db.delete(marker)
+    bump_revision(db, project_id)
     db.commit()
     
     return {"message": "Marker deleted"}
@@ -570,6 +864,7 @@ def create_marker_link(
         to_y=link.to_y,
     )
     db.add(db_link)
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_link)
     return db_link
@@ -610,6 +905,7 @@ def delete_marker_link(
         raise HTTPException(status_code=404, detail="Link not found")
     
     db.delete(link)
+    bump_revision(db, project_id)
     db.commit()
     
     return {"message": "Link deleted"}
@@ -667,6 +963,7 @@ def create_conduit(
         footage=conduit.footage,
     )
     db.add(db_conduit)
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_conduit)
     return db_conduit
@@ -737,6 +1034,7 @@ def update_conduit(
     db_conduit.drop_ped_id = conduit.drop_ped_id
     db_conduit.footage = conduit.footage
 
+    bump_revision(db, project_id)
     db.commit()
     db.refresh(db_conduit)
 
@@ -759,6 +1057,7 @@ def delete_conduit(
         raise HTTPException(status_code=404, detail="Conduit not found")
     
     db.delete(conduit)
+    bump_revision(db, project_id)
     db.commit()
     
     return {"message": "Conduit deleted"}
\ No newline at end of file
@@ -0,0 +1,191 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timezone
+import os
+import uuid
+
+from app.db.database import get_db
+from app.models.database import Project, UploadSession, UploadChunk
+from app.models.schemas import ProjectResponse, UploadSessionCreate, UploadSessionResponse
+from app.routes.projects import create_project_from_file
+from app.services.pdf_storage import UploadRejected
+from app.services.upload_sessions import (
+    ChunkReader,
+    chunk_path,
+    collect_stale_sessions,
+    missing_ranges,
+    overlapping_chunk,
+    received_ranges,
+    receive_chunk,
+    remove_session_files,
+)
+from app.config import settings
+
+router = APIRouter(prefix="/api/uploads", tags=["uploads"])
+
+
+def _get_session(db: Session, session_id: str) -> UploadSession:
+    session = db.query(UploadSession).filter(UploadSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+def _session_response(session: UploadSession) -> UploadSessionResponse:
+    received = received_ranges(session.chunks)
+    return UploadSessionResponse(
+        id=session.id,
+        name=session.name,
+        filename=session.filename,
+        total_size=session.total_size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        received_bytes=sum(end - start for start, end in received),
+        received_ranges=[list(r) for r in received],
+        missing_ranges=[list(r) for r in missing_ranges(session.chunks, session.total_size)],
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+    )
+
+
+@router.post("/", response_model=UploadSessionResponse)
+def create_upload_session(upload: UploadSessionCreate, db: Session = Depends(get_db)):
+    """Start a resumable upload of a plat PDF that will become a new project."""
+    collect_stale_sessions(db)
+
+    if upload.total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive")
+    if upload.total_size > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds maximum upload size of {settings.MAX_UPLOAD_SIZE} bytes",
+        )
+    existing = db.query(Project).filter(func.lower(Project.name) == upload.name.lower()).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Project name already exists")
+
+    session = UploadSession(
+        id=str(uuid.uuid4()),
+        name=upload.name,
+        description=upload.description,
+        filename=upload.filename,
+        total_size=upload.total_size,
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return _session_response(session)
+
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+def get_upload_session(session_id: str, db: Session = Depends(get_db)):
+    """Report which byte ranges of the file have been received."""
+    return _session_response(_get_session(db, session_id))
+
+
+def _check_chunk(db: Session, session_id: str, chunk_number: int, offset: int) -> int:
+    """Validate a chunk's position before its body is read; returns the bytes it may hold."""
+    session = _get_session(db, session_id)
+    if chunk_number < 0:
+        raise HTTPException(status_code=400, detail="chunk_number must not be negative")
+    if offset >= session.total_size:
+        raise HTTPException(status_code=400, detail="Chunk offset is past the end of the file")
+    return session.total_size - offset
+
+
+def _store_chunk(
+    db: Session, session_id: str, chunk_number: int, offset: int, temp_path: str, size: int
+) -> UploadSessionResponse:
+    """Move a received chunk into place and record it, unless it overlaps another chunk."""
+    try:
+        session = _get_session(db, session_id)
+        other = overlapping_chunk(session.chunks, chunk_number, offset, size)
+        if other is not None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Chunk overlaps chunk {other.chunk_number} at bytes {other.offset}-{other.offset + other.size}",
+            )
+        os.replace(temp_path, chunk_path(session_id, chunk_number))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    chunk = next((c for c in session.chunks if c.chunk_number == chunk_number), None)
+    if chunk is None:
+        chunk = UploadChunk(chunk_number=chunk_number)
+        session.chunks.append(chunk)
+    chunk.offset = offset
+    chunk.size = size
+    session.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(session)
+    return _session_response(session)
+
+
+@router.put("/{session_id}/chunks/{chunk_number}", response_model=UploadSessionResponse)
+async def put_upload_chunk(
+    session_id: str,
+    chunk_number: int,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Store one chunk of the file, written at byte `offset`.
+
+    The raw request body is the chunk. Re-sending a chunk number replaces
+    the earlier copy, so a chunk cut off by a dropped connection is simply
+    sent again. The body is read on the event loop; database work and file
+    writes run in worker threads.
+    """
+    max_bytes = await run_in_threadpool(_check_chunk, db, session_id, chunk_number, offset)
+    try:
+        temp_path, size = await receive_chunk(request.stream(), chunk_path(session_id, chunk_number), max_bytes)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        return await run_in_threadpool(_store_chunk, db, session_id, chunk_number, offset, temp_path, size)
+    finally:
+        # Only left behind when the request is cancelled before _store_chunk runs
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@router.post("/{session_id}/finalize", response_model=ProjectResponse)
+def finalize_upload_session(session_id: str, db: Session = Depends(get_db)):
+    """
+    Assemble the received chunks into a project.
+
+    The file goes through the same size, signature and PDF validation as a
+    direct upload. On a validation error the session is kept so bad chunks
+    can be re-sent.
+    """
+    session = _get_session(db, session_id)
+    missing = missing_ranges(session.chunks, session.total_size)
+    if missing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: missing bytes {', '.join(f'{s}-{e}' for s, e in missing)}",
+        )
+
+    reader = ChunkReader(session.id, session.chunks)
+    try:
+        project = create_project_from_file(db, session.name, session.description, session.filename, reader)
+    finally:
+        reader.close()
+
+    db.delete(session)
+    db.commit()
+    remove_session_files(session_id)
+    return project
+
+
+@router.delete("/{session_id}")
+def delete_upload_session(session_id: str, db: Session = Depends(get_db)):
+    """Abandon a resumable upload and discard its chunks."""
+    session = _get_session(db, session_id)
+    db.delete(session)
+    db.commit()
+    remove_session_files(session_id)
+    return {"message": "Upload session deleted"}
@@ -0,0 +1,255 @@
+"""
+Batch export service - CSV, JSON and annotated PDF exports of many projects in one ZIP.
+
+Each (project, format) pair is one archive member, built by write_export
+(generate_csv_report, generate_json_report or write_overlaid_pdf) in a
+process pool of EXPORT_BATCH_WORKERS shared by all batches, so concurrent
+downloads never start more build processes than that. Members are written to temp files under
+UPLOAD_DIR and added to the archive as they finish, so the ZIP streams out
+while the rest are still being generated.
+
+Memory stays bounded however many projects are included: projects are read
+from the database only when their members are submitted, at most two
+members per worker are in flight, and the ZIP is written to an unseekable
+sink that is drained after every chunk.
+"""
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.config import settings
+from app.services.export_jobs import prepare_export, write_export
+from app.services.export_service import safe_filename
+
+BATCH_FORMATS = ("csv", "json", "pdf")
+
+# Bytes of a member file copied into the archive between drains
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Members submitted per worker before waiting for one to finish
+MEMBERS_PER_WORKER = 2
+
+
+def batch_members(
+    session_factory: Callable,
+    project_ids: Iterable[int],
+    formats: Iterable[str],
+    slack_factor: Optional[float] = None,
+) -> Iterator[Dict]:
+    """
+    Prepared exports of each project in each format, read one project at a time.
+
+    Each item is a prepare_export result with an "arcname" added: the
+    member's path in the archive, <project name>_<id>/<export filename>.
+    An export that cannot be prepared is yielded as {"arcname", "error"};
+    projects that no longer exist are skipped.
+    """
+    from app.models.database import Project
+
+    db = session_factory()
+    try:
+        for project_id in project_ids:
+            project = db.query(Project).filter(Project.id == project_id).first()
+            if project is None:
+                continue
+            folder = f"{safe_filename(project.name)}_{project.id}"
+            for format in formats:
+                try:
+                    export = prepare_export(db, project, format, {"slack_factor": slack_factor})
+                except Exception as e:
+                    yield {"arcname": f"{folder}/{format}", "error": str(e)}
+                    continue
+                export["arcname"] = f"{folder}/{export['filename']}"
+                yield export
+            # Nothing read for this project is needed again
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    """Member build pool shared by all batches, EXPORT_BATCH_WORKERS processes."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            # forkserver: the API process is multi-threaded, which makes plain fork unsafe
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=max(settings.EXPORT_BATCH_WORKERS, 1),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _batch_pool
+
+
+def _reset_batch_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool; a pool another batch has already replaced it with is left alone."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False)
+
+
+def build_member(export: Dict, path: str, upload_dir: str = None) -> str:
+    """Write one archive member to `path`; runs in a batch worker."""
+    if upload_dir is not None:
+        # Workers start from a fresh interpreter; share the parent's UPLOAD_DIR (and overlay cache)
+        settings.UPLOAD_DIR = upload_dir
+    with open(path, "wb") as f:
+        # Parallelism is across members, so each PDF renders in its worker
+        write_export(export, f, workers=1)
+    return path
+
+
+class _ZipSink:
+    """Write-only, unseekable file for ZipFile that keeps written bytes until drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_member(archive: zipfile.ZipFile, sink: _ZipSink, arcname: str, path: str) -> Iterator[bytes]:
+    info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+    # PDF content is already compressed
+    info.compress_type = zipfile.ZIP_STORED if arcname.endswith(".pdf") else zipfile.ZIP_DEFLATED
+    info.file_size = os.path.getsize(path)
+    with open(path, "rb") as src, archive.open(info, "w") as dest:
+        while True:
+            chunk = src.read(ZIP_CHUNK_SIZE)
+            if not chunk:
+                break
+            dest.write(chunk)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def stream_batch_zip(members: Iterable[Dict], workers: int = None) -> Iterator[bytes]:
+    """
+    Build archive members in parallel and yield the ZIP as they finish.
+
+    Members appear in the archive in completion order. A member that fails,
+    or arrives with an "error" instead of inputs, is left out and listed in
+    errors.txt at the end.
+
+    Args:
+        members: Prepared exports with an "arcname", e.g. from batch_members()
+        workers: Members this batch builds at once on the shared pool;
+            defaults to settings.EXPORT_BATCH_WORKERS. With 1, members are
+            built one at a time in this process
+    """
+    if workers is None:
+        workers = settings.EXPORT_BATCH_WORKERS
+    work_dir = os.path.join(settings.UPLOAD_DIR, "batch", str(uuid.uuid4()))
+    os.makedirs(work_dir)
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, "w")
+    errors: List[str] = []
+    members = iter(members)
+    in_flight = {}
+    try:
+        if workers > 1:
+            pool = _get_batch_pool()
+            try:
+                for number, export in enumerate(members):
+                    if "error" in export:
+                        errors.append(f"{export['arcname']}: {export['error']}")
+                        continue
+                    path = os.path.join(work_dir, f"{number:06d}")
+                    in_flight[pool.submit(build_member, export, path, settings.UPLOAD_DIR)] = export["arcname"]
+                    while len(in_flight) >= workers * MEMBERS_PER_WORKER:
+                        yield from _finish_members(archive, sink, in_flight, errors)
+                while in_flight:
+                    yield from _finish_members(archive, sink, in_flight, errors)
+            except BrokenProcessPool:
+                _reset_batch_pool(pool)
+                raise
+        else:
+            for number, export in enumerate(members):
+                if "error" in export:
+                    errors.append(f"{export['arcname']}: {export['error']}")
+                    continue
+                try:
+                    path = build_member(export, os.path.join(work_dir, f"{number:06d}"))
+                except Exception as e:
+                    errors.append(f"{export['arcname']}: {e}")
+                    continue
+                yield from _zip_member(archive, sink, export["arcname"], path)
+                os.remove(path)
+
+        if errors:
+            print(f"Batch export: {len(errors)} members failed")
+            archive.writestr("errors.txt", "\n".join(errors) + "\n")
+        archive.close()
+        yield sink.drain()
+    finally:
+        # The client may have gone away. Members not started yet are dropped;
+        # the shared pool is not waited on, so running ones clean up after
+        # themselves when they finish.
+        running = [future for future in in_flight if not future.cancel()]
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for future in running:
+            future.add_done_callback(lambda _: shutil.rmtree(work_dir, ignore_errors=True))
+
+
+def _finish_members(archive, sink: _ZipSink, in_flight: Dict, errors: List[str]) -> Iterator[bytes]:
+    """Wait for at least one member, then add every finished one to the archive."""
+    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    for future in done:
+        arcname = in_flight.pop(future)
+        try:
+            path = future.result()
+        except Exception as e:
+            errors.append(f"{arcname}: {e}")
+            continue
+        yield from _zip_member(archive, sink, arcname, path)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.services.batch_export OUTPUT.zip PROJECT_ID... [--formats csv,json,pdf] [--workers N]
+    import argparse
+
+    from app.db.database import SessionLocal
+    import app.models.cable_config  # noqa: F401 - registers the models Project relates to
+
+    parser = argparse.ArgumentParser(description="Export several projects into one ZIP")
+    parser.add_argument("output")
+    parser.add_argument("project_ids", type=int, nargs="+")
+    parser.add_argument("--formats", default=",".join(BATCH_FORMATS), help="comma-separated subset of csv,json,pdf")
+    parser.add_argument("--slack-factor", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    formats = [f for f in args.formats.split(",") if f]
+    unknown = [f for f in formats if f not in BATCH_FORMATS]
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(unknown)}")
+    members = batch_members(SessionLocal, args.project_ids, formats, args.slack_factor)
+    with open(args.output, "wb") as f:
+        for data in stream_batch_zip(members, args.workers):
+            f.write(data)
+    print(f"Wrote {args.output}")
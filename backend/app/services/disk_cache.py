@@ -0,0 +1,189 @@
+"""
+Disk cache service - size-bounded LRU of files under UPLOAD_DIR.
+
+Entries are files at UPLOAD_DIR/<subdir>/<key[:2]>/<key><suffix>. The
+directory is the index: every worker process shares it, so lookups go to
+disk rather than to a per-process table, recency is the file mtime (a hit
+touches the file) and each write rescans the directory and evicts the
+least recently used files down to the size bound. Files are written to a
+temp name and moved into place, so readers never see a partial entry, and
+hits are handed out as open files, so an entry evicted by another request
+or process while it is being sent stays readable until it is closed.
+"""
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO, List, Optional, Tuple
+
+from app.config import settings
+
+
+class DiskLRUCache:
+    """
+    LRU file cache bounded by total bytes, with hit/miss counters.
+
+    Args:
+        subdir: Directory under UPLOAD_DIR
+        max_bytes_setting: Name of the settings attribute holding the size bound;
+            read on every write so it can be changed at runtime. A bound of 0
+            disables the cache.
+        suffix: File extension of entries
+        max_bytes: Fixed size bound, overriding the setting
+    """
+
+    def __init__(self, subdir: str, max_bytes_setting: str = None, suffix: str = ".pdf", max_bytes: Optional[int] = None):
+        self.subdir = subdir
+        self.suffix = suffix
+        self._max_bytes = max_bytes
+        self._max_bytes_setting = max_bytes_setting
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, self._max_bytes_setting)
+
+    @property
+    def root(self) -> str:
+        return os.path.join(settings.UPLOAD_DIR, self.subdir)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        # time_ns rather than the filesystem's coarse clock, so back-to-back hits keep their order
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _scan(self) -> List[Tuple[int, str, int]]:
+        """(mtime_ns, path, size) of every entry on disk, least recently used first."""
+        found = []
+        try:
+            shards = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return found
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(shard.path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process mid-scan
+                    continue
+                found.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        found.sort()
+        return found
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Open a cached entry for reading, marking it most recently used, or None.
+
+        The caller closes the file. It stays readable if the entry is
+        evicted meanwhile.
+        """
+        if self.max_bytes <= 0:
+            with self._lock:
+                self.misses += 1
+            return None
+        path = self.path_for(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            self._touch(path)
+        except FileNotFoundError:
+            # Evicted after it was opened; the open file is still good
+            pass
+        with self._lock:
+            self.hits += 1
+        return f
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of a cached entry, marking it most recently used, or None.
+
+        The file can be evicted by another process at any time; use open()
+        for anything that reads it later.
+        """
+        f = self.open(key)
+        if f is None:
+            return None
+        f.close()
+        return self.path_for(key)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def temp_path_for(self, key: str) -> str:
+        """Unique temp file beside the entry's final path, for writers that need a file name."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def put_file(self, key: str, temp_path: str) -> str:
+        """Move a finished temp file into the cache and evict down to the size bound."""
+        path = self.path_for(key)
+        self._touch(temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._evict(keep=path)
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> Optional[str]:
+        """Store `data` under `key`; a no-op when the cache is disabled."""
+        if self.max_bytes <= 0:
+            return None
+        temp_path = self.temp_path_for(key)
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            return self.put_file(key, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used entries, other than `keep`, until the directory fits the bound."""
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        entries = self._scan()
+        with self._lock:
+            return {
+                "files": len(entries),
+                "bytes": sum(size for _, _, size in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,136 @@
+"""
+Export cache - finished CSV, JSON and PDF exports keyed by project revision.
+
+Project.revision changes with every write to a project's content, so
+(project, revision, format, options) names one export. Finished exports are
+kept in a DiskLRUCache bounded by EXPORT_CACHE_MAX_BYTES and the key doubles
+as a strong ETag: a client revalidating an unchanged project gets a 304
+without the project being read, and other repeat downloads are served from
+the cached file. Incremental PDF exports cache only the update, which is
+sent after the original file.
+"""
+import hashlib
+import json
+import os
+import shutil
+from typing import BinaryIO, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+from starlette.responses import Response
+
+from app.services.disk_cache import DiskLRUCache
+from app.services.file_delivery import (
+    CACHE_CONTROL,
+    AppendedFileResponse,
+    conditional_file_response,
+    etag_matches,
+    file_etag,
+)
+from app.services.project_revision import revision_tag
+
+# Bump when export output changes so cached exports are not reused
+EXPORT_CACHE_VERSION = 1
+
+export_cache = DiskLRUCache("export_cache", "EXPORT_CACHE_MAX_BYTES", suffix=".export")
+
+
+def export_cache_key(project, format: str, options: Dict) -> str:
+    """
+    SHA-256 naming one export of the project's current revision.
+
+    Args:
+        format: A key of export_jobs.JOB_FORMATS
+        options: Export options; only those the format takes are part of the key
+    """
+    from app.services.export_jobs import FORMAT_OPTIONS
+    from app.services.pdf_storage import project_pdf_path, project_pdf_tag
+
+    options = {name: options.get(name) for name in FORMAT_OPTIONS[format]}
+    payload = [EXPORT_CACHE_VERSION, revision_tag(project), format, options]
+    if format == "pdf":
+        # The stored PDF is not part of the revision (compaction can replace it)
+        payload.append(project_pdf_tag(project) or file_etag(os.stat(project_pdf_path(project))))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def export_etag(key: str) -> str:
+    return f'"{key}"'
+
+
+def export_headers(key: str, filename: str) -> Dict[str, str]:
+    """Headers for an export response generated rather than served from the cache."""
+    return {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "ETag": export_etag(key),
+        "Cache-Control": CACHE_CONTROL,
+    }
+
+
+def cached_export_response(
+    request_headers: Mapping[str, str],
+    key: str,
+    filename: str,
+    media_type: str,
+    prefix_path: Optional[str] = None,
+) -> Optional[Response]:
+    """
+    A 304 or the cached export for `key`, or None when it must be generated.
+
+    Args:
+        prefix_path: File the cached entry is appended to, for incremental PDF exports
+    """
+    etag = export_etag(key)
+    if etag_matches(request_headers, etag):
+        return Response(status_code=304, headers={"etag": etag, "cache-control": CACHE_CONTROL})
+
+    cached = export_cache.open(key)
+    if cached is None:
+        return None
+    if prefix_path is None:
+        return conditional_file_response(
+            request_headers, None, filename, media_type=media_type, content_hash=key, fileobj=cached,
+        )
+    response = AppendedFileResponse(prefix_path, cached, filename, media_type=media_type)
+    response.headers["etag"] = etag
+    response.headers["cache-control"] = CACHE_CONTROL
+    return response
+
+
+def store_export(key: str, fileobj: BinaryIO) -> Optional[str]:
+    """
+    Copy a finished export from a seekable file into the cache.
+
+    Returns:
+        Path of the cache entry, or None when the cache is disabled
+    """
+    if export_cache.max_bytes <= 0:
+        return None
+    temp_path = export_cache.temp_path_for(key)
+    try:
+        fileobj.seek(0)
+        with open(temp_path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+        return export_cache.put_file(key, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def stream_into_cache(key: str, chunks: Iterable[Union[str, bytes]]) -> Iterator[Union[str, bytes]]:
+    """
+    Pass a streamed export through, storing it in the cache once it completes.
+
+    An export that fails or is abandoned part way is not cached.
+    """
+    if export_cache.max_bytes <= 0:
+        yield from chunks
+        return
+    temp_path = export_cache.temp_path_for(key)
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield chunk
+        export_cache.put_file(key, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
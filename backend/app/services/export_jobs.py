@@ -0,0 +1,404 @@
+"""
+Export job service - CSV, JSON and PDF exports built in the background.
+
+A job is keyed by its project, format and options plus a fingerprint of
+everything the export reads (the measurements or drawn content and the
+stored PDF), so identical requests against an unchanged project share one
+job and its artifact, while any edit produces a new key. Jobs run on a
+bounded thread pool of EXPORT_JOB_WORKERS; PDF overlays still render on the
+overlay process pool. Artifacts are written to exports/<job id>/ under
+UPLOAD_DIR and removed along with their rows EXPORT_JOB_TTL_HOURS after the
+job finishes.
+
+Each process keeps the heartbeat_at of its queued and running jobs fresh.
+A queued or running job whose heartbeat is older than
+EXPORT_JOB_STALE_SECONDS was left behind by a worker that exited, and a
+done job whose artifact is gone can no longer be downloaded; both are
+queued again by the next request for them, claimed with a conditional
+update so only one process re-runs a job.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Callable, Dict
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.services.export_service import (
+    collect_overlay_data,
+    collect_report_data,
+    generate_csv_report,
+    generate_json_report,
+    pdf_export_filename,
+    safe_filename,
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Export format -> media type of its artifact
+JOB_FORMATS = {"csv": "text/csv", "json": "application/json", "pdf": "application/pdf"}
+
+# Options each format takes; others in a request are ignored and not part of the job key
+FORMAT_OPTIONS = {
+    "csv": ("slack_factor",),
+    "json": ("slack_factor",),
+    "pdf": ("page_number", "page_width", "page_height", "rotation", "mode"),
+}
+
+# Minimum seconds between progress writes to the job row
+PROGRESS_INTERVAL = 0.5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Job id -> session factory, for jobs queued or running in this process
+_live_jobs: Dict[str, Callable] = {}
+_heartbeat_thread = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(settings.EXPORT_JOB_WORKERS, 1),
+                thread_name_prefix="export-job",
+            )
+        return _executor
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, "exports", job_id)
+
+
+def artifact_path(job) -> str:
+    return os.path.join(job_dir(job.id), job.filename)
+
+
+def remove_job_files(job_id: str) -> None:
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+
+
+def prepare_export(db, project, format: str, options: Dict) -> Dict:
+    """
+    Read everything an export of `project` needs, so the job can run
+    without the request's session and its key reflects this revision.
+
+    Args:
+        format: A key of JOB_FORMATS
+        options: Export options; only FORMAT_OPTIONS[format] are kept
+
+    Returns:
+        {"format", "options", "filename", "inputs", "key"}
+    """
+    from app.services.page_metadata import load_project_pages, page_geometry_map
+    from app.services.pdf_storage import project_pdf_path, project_pdf_tag
+    from app.services.file_delivery import file_etag
+
+    options = {name: options.get(name) for name in FORMAT_OPTIONS[format]}
+    if format == "pdf":
+        pdf_path = project_pdf_path(project)
+        inputs = {
+            "pdf_path": pdf_path,
+            "pdf_tag": project_pdf_tag(project) or file_etag(os.stat(pdf_path)),
+            "all_data": collect_overlay_data(db, project),
+            "page_geometry": page_geometry_map(load_project_pages(db, project)),
+        }
+        filename = pdf_export_filename(project.name, options["page_number"])
+    else:
+        inputs = collect_report_data(db, project)
+        filename = f"{safe_filename(project.name)}_report.{format}"
+
+    # The PDF is identified by its tag and arc-length indexes are derived
+    # from the points, so neither goes into the key
+    fingerprint = dict(inputs)
+    fingerprint.pop("pdf_path", None)
+    if "all_data" in fingerprint:
+        fingerprint["all_data"] = dict(
+            fingerprint["all_data"],
+            polylines=[{k: v for k, v in p.items() if k != "arc_index"} for p in inputs["all_data"]["polylines"]],
+        )
+    payload = json.dumps([project.id, format, options, fingerprint], sort_keys=True, separators=(",", ":"), default=str)
+    return {
+        "format": format,
+        "options": options,
+        "filename": filename,
+        "inputs": inputs,
+        "key": hashlib.sha256(payload.encode()).hexdigest(),
+    }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were stored in UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _stale_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+
+
+def is_abandoned(job) -> bool:
+    """
+    Whether a job will not finish or cannot be downloaded as it stands: queued
+    or running without a recent heartbeat, or done with its artifact missing.
+    """
+    if job.status == DONE:
+        return not os.path.exists(artifact_path(job))
+    if job.status not in (QUEUED, RUNNING) or job.id in _live_jobs:
+        return False
+    return job.heartbeat_at is None or _as_utc(job.heartbeat_at) < _stale_cutoff()
+
+
+def enqueue_export(db, project_id: int, export: Dict, session_factory: Callable):
+    """
+    Get the job for a prepared export, queueing it if there is none yet.
+
+    A live job with the same key (queued, running or done) is returned as it
+    is; a failed or abandoned one (see is_abandoned) is reset and queued again.
+
+    Args:
+        export: Result of prepare_export
+        session_factory: Opens a session on the same database, for the worker thread
+
+    Returns:
+        The ExportJob row
+    """
+    from app.models.database import ExportJob
+
+    job = db.query(ExportJob).filter(ExportJob.request_key == export["key"]).first()
+    if job is not None:
+        if job.status == FAILED or is_abandoned(job):
+            _requeue(db, job, export, session_factory)
+        return job
+
+    job = ExportJob(
+        id=str(uuid.uuid4()),
+        project_id=project_id,
+        request_key=export["key"],
+        format=export["format"],
+        options=export["options"],
+        filename=export["filename"],
+        status=QUEUED,
+        progress=0.0,
+        heartbeat_at=datetime.now(timezone.utc),
+        expires_at=_expiry(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # An identical request queued the job first
+        db.rollback()
+        return db.query(ExportJob).filter(ExportJob.request_key == export["key"]).first()
+    db.refresh(job)
+
+    _submit(job.id, export, session_factory)
+    return job
+
+
+def _requeue(db, job, export: Dict, session_factory: Callable) -> None:
+    """
+    Reset a failed or abandoned job and queue it again.
+
+    The reset only applies if the row is still as this process saw it, so
+    when several processes find the same abandoned job one of them runs it.
+    """
+    from app.models.database import ExportJob
+
+    claim = ExportJob.status == job.status
+    if job.status in (QUEUED, RUNNING):
+        claim = claim & or_(ExportJob.heartbeat_at.is_(None), ExportJob.heartbeat_at < _stale_cutoff())
+    claimed = db.query(ExportJob).filter(ExportJob.id == job.id, claim).update(
+        {
+            "status": QUEUED,
+            "progress": 0.0,
+            "error": None,
+            "size_bytes": None,
+            "finished_at": None,
+            "heartbeat_at": datetime.now(timezone.utc),
+            "expires_at": _expiry(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    db.refresh(job)
+    if claimed:
+        print(f"Export job {job.id}: queued again")
+        _submit(job.id, export, session_factory)
+
+
+def _submit(job_id: str, export: Dict, session_factory: Callable) -> None:
+    global _heartbeat_thread
+    with _executor_lock:
+        _live_jobs[job_id] = session_factory
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name="export-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+    _get_executor().submit(run_export_job, job_id, export, session_factory)
+
+
+def _heartbeat() -> None:
+    """Refresh heartbeat_at of this process's queued and running jobs, for as long as the process lives."""
+    from app.models.database import ExportJob
+
+    while True:
+        time.sleep(max(settings.EXPORT_JOB_STALE_SECONDS / 4, 1))
+        by_factory: Dict[Callable, list] = {}
+        with _executor_lock:
+            for job_id, session_factory in _live_jobs.items():
+                by_factory.setdefault(session_factory, []).append(job_id)
+        for session_factory, job_ids in by_factory.items():
+            db = session_factory()
+            try:
+                db.query(ExportJob).filter(
+                    ExportJob.id.in_(job_ids),
+                    ExportJob.status.in_((QUEUED, RUNNING)),
+                ).update({"heartbeat_at": datetime.now(timezone.utc)}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                print(f"Export job heartbeat failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+
+def write_export(
+    export: Dict,
+    output: BinaryIO,
+    progress: Callable[[float], None] = None,
+    workers: int = None,
+) -> None:
+    """
+    Write a prepared export to a binary file, reporting progress as a fraction.
+
+    `workers` is passed on to the PDF overlay renderer.
+    """
+    from app.services.pdf_incremental import write_overlay_update
+    from app.services.pdf_overlay import COPY_CHUNK_SIZE, write_overlaid_pdf
+
+    inputs = export["inputs"]
+    options = export["options"]
+    if export["format"] == "csv":
+        output.write(generate_csv_report(**inputs, slack_factor=options["slack_factor"]).encode())
+        return
+    if export["format"] == "json":
+        output.write(generate_json_report(**inputs, slack_factor=options["slack_factor"]).encode())
+        return
+
+    drawing = dict(
+        all_data=inputs["all_data"],
+        single_page=options["page_number"],
+        page_width=options["page_width"],
+        page_height=options["page_height"],
+        page_geometry=inputs["page_geometry"],
+        workers=workers,
+    )
+    if options["mode"] == "incremental":
+        # The original file followed by the update, as the synchronous export sends it
+        try:
+            with open(inputs["pdf_path"], "rb") as pdf_file:
+                shutil.copyfileobj(pdf_file, output, COPY_CHUNK_SIZE)
+            write_overlay_update(inputs["pdf_path"], output, **drawing)
+            return
+        except Exception as e:
+            print(f"Export job: incremental update failed ({e}), rewriting instead")
+            output.seek(0)
+            output.truncate()
+
+    def pages_done(done: int, total: int) -> None:
+        # Rendering is the bulk of the work; page assembly takes the rest
+        if progress is not None:
+            progress(0.5 + 0.5 * done / max(total, 1))
+
+    write_overlaid_pdf(inputs["pdf_path"], output, rotation=options["rotation"] or 0, progress=pages_done, **drawing)
+
+
+def run_export_job(job_id: str, export: Dict, session_factory: Callable) -> None:
+    """Build a queued job's artifact and record the outcome on its row."""
+    from app.models.database import ExportJob
+
+    db = session_factory()
+    try:
+        job = db.get(ExportJob, job_id)
+        if job is None:
+            return
+        job.status = RUNNING
+        job.heartbeat_at = datetime.now(timezone.utc)
+        db.commit()
+
+        last_write = time.monotonic()
+
+        def report(fraction: float) -> None:
+            nonlocal last_write
+            now = time.monotonic()
+            if now - last_write >= PROGRESS_INTERVAL:
+                job.progress = round(fraction, 3)
+                db.commit()
+                last_write = now
+
+        path = artifact_path(job)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique: a job taken over from a worker that stalled may still be written by it
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                write_export(export, f, report)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        job.status = DONE
+        job.progress = 1.0
+        job.size_bytes = os.path.getsize(path)
+        job.finished_at = datetime.now(timezone.utc)
+        job.expires_at = _expiry()
+        db.commit()
+        print(f"Export job {job_id}: {job.format} export done, {job.size_bytes} bytes")
+    except Exception as e:
+        print(f"Export job {job_id} failed: {e}")
+        db.rollback()
+        remove_job_files(job_id)
+        job = db.get(ExportJob, job_id)
+        if job is not None:
+            job.status = FAILED
+            job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+    finally:
+        with _executor_lock:
+            _live_jobs.pop(job_id, None)
+        db.close()
+
+
+def collect_expired_jobs(db) -> int:
+    """
+    Delete jobs past their expires_at along with their artifacts.
+
+    Returns:
+        Number of jobs removed
+    """
+    from app.models.database import ExportJob
+
+    expired = db.query(ExportJob).filter(ExportJob.expires_at < datetime.now(timezone.utc)).all()
+    for job in expired:
+        db.delete(job)
+    db.commit()
+    for job in expired:
+        remove_job_files(job.id)
+    return len(expired)
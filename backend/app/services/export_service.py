@@ -1,28 +1,46 @@
+"""
+Export service - CSV and JSON measurement reports, and the project data exports read.
+
+The reports are produced by generators (iter_csv_report, iter_json_report)
+that consume the polylines one at a time and yield text in chunks of about
+REPORT_CHUNK_SIZE, so a report can be streamed while its polylines are still
+being read; generate_csv_report and generate_json_report join them.
+"""
 import csv
 import json
 from io import StringIO, BytesIO
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, Optional, Dict
 from datetime import datetime
 
-def generate_csv_report(
+# Report text is yielded in pieces of at least this many characters (the last may be shorter)
+REPORT_CHUNK_SIZE = 64 * 1024
+
+def _take(buffer: StringIO) -> str:
+    """Buffered text, leaving the buffer empty."""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+def iter_csv_report(
     project_name: str,
     total_length_ft: float,
-    polylines: List[Dict],
+    polylines: Iterable[Dict],
     scale_calibrations: List[Dict],
     slack_factor: Optional[float] = None,
-) -> str:
+) -> Iterator[str]:
     """
-    Generate CSV report of measurements.
+    Generate CSV report of measurements in chunks.
     
     Args:
         project_name: Name of the project
         total_length_ft: Total fiber length in feet
-        polylines: List of polyline data
+        polylines: Polyline data, consumed once in order (e.g. a generator)
         scale_calibrations: List of scale calibration data
         slack_factor: Optional slack factor (e.g., 0.05 for 5%)
     
-    Returns:
-        CSV string
+    Yields:
+        Consecutive pieces of the CSV text
     """
     output = StringIO()
     writer = csv.writer(output)
@@ -60,6 +78,7 @@ def generate_csv_report(
     writer.writerow(["Path Measurements"])
     writer.writerow(["Page", "Path Name", "Segments", "Length (ft)"])
     
+    polyline_count = 0
     for polyline in polylines:
         points = polyline.get("points", [])
         writer.writerow([
@@ -68,20 +87,95 @@ def generate_csv_report(
             len(points) - 1 if len(points) > 1 else 0,
             f"{polyline.get('length_ft', 0):.2f}",
         ])
+        polyline_count += 1
+        if output.tell() >= REPORT_CHUNK_SIZE:
+            yield _take(output)
     
     writer.writerow([])
     
     # Summary section
     writer.writerow(["Summary"])
     writer.writerow(["Total Fiber Length", f"{total_length_ft:.2f} ft"])
-    writer.writerow(["Number of Paths", len(polylines)])
+    writer.writerow(["Number of Paths", polyline_count])
     
     if slack_factor:
         adjusted_length = total_length_ft * (1 + slack_factor)
         slack_pct = slack_factor * 100
         writer.writerow([f"Slack Factor (+{slack_pct}%)", f"{adjusted_length:.2f} ft"])
     
-    return output.getvalue()
+    yield _take(output)
+
+def generate_csv_report(
+    project_name: str,
+    total_length_ft: float,
+    polylines: List[Dict],
+    scale_calibrations: List[Dict],
+    slack_factor: Optional[float] = None,
+) -> str:
+    """
+    Generate CSV report of measurements.
+    
+    Takes the same arguments as iter_csv_report.
+    
+    Returns:
+        CSV string
+    """
+    return "".join(iter_csv_report(project_name, total_length_ft, polylines, scale_calibrations, slack_factor))
+
+def _json_value(value, level: int) -> str:
+    """`value` as json.dumps(..., indent=2) writes it when nested `level` deep."""
+    return json.dumps(value, indent=2).replace("\n", "\n" + "  " * level)
+
+def iter_json_report(
+    project_name: str,
+    total_length_ft: float,
+    polylines: Iterable[Dict],
+    scale_calibrations: List[Dict],
+    slack_factor: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Generate JSON report of measurements in chunks.
+    
+    The text is what json.dumps(report, indent=2) writes for the whole
+    report, produced one polyline at a time.
+    
+    Yields:
+        Consecutive pieces of the JSON text
+    """
+    output = StringIO()
+    output.write("{\n")
+    output.write(f'  "project_name": {_json_value(project_name, 1)},\n')
+    output.write(f'  "generated_at": {_json_value(datetime.now().isoformat(), 1)},\n')
+    output.write(f'  "scale_calibrations": {_json_value(scale_calibrations, 1)},\n')
+    output.write('  "polylines": [')
+    
+    polyline_count = 0
+    for p in polylines:
+        entry = {
+            "name": p.get("name"),
+            "page_number": p.get("page_number"),
+            "point_count": len(p.get("points", [])),
+            "length_ft": p.get("length_ft"),
+        }
+        output.write(",\n    " if polyline_count else "\n    ")
+        output.write(_json_value(entry, 2))
+        polyline_count += 1
+        if output.tell() >= REPORT_CHUNK_SIZE:
+            yield _take(output)
+    output.write("\n  ]" if polyline_count else "]")
+    
+    summary = {
+        "total_length_ft": total_length_ft,
+        "polyline_count": polyline_count,
+    }
+    
+    if slack_factor:
+        adjusted_length = total_length_ft * (1 + slack_factor)
+        summary["slack_factor"] = slack_factor
+        summary["adjusted_length_ft"] = adjusted_length
+    
+    output.write(f',\n  "summary": {_json_value(summary, 1)}\n}}')
+    yield _take(output)
 
 def generate_json_report(
     project_name: str,
@@ -96,28 +190,127 @@ def generate_json_report(
     Returns:
         JSON string
     """
-    report = {
-        "project_name": project_name,
-        "generated_at": datetime.now().isoformat(),
-        "scale_calibrations": scale_calibrations,
+    return "".join(iter_json_report(project_name, total_length_ft, polylines, scale_calibrations, slack_factor))
+
+def safe_filename(name: str) -> str:
+    """Project name with anything but letters, digits, '-' and '_' replaced, for download names."""
+    return "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in name)
+
+def pdf_export_filename(project_name: str, page_number: Optional[int] = None) -> str:
+    """Download name of an annotated PDF export of the whole plat or one page."""
+    if page_number is None:
+        return f"{safe_filename(project_name)}_annotated.pdf"
+    return f"{safe_filename(project_name)}_page_{page_number}_annotated.pdf"
+
+# Polylines loaded per round trip when a report streams them
+REPORT_POLYLINE_BATCH = 500
+
+def iter_report_polylines(db, project_id: int) -> Iterator[Dict]:
+    """
+    A project's polylines as report entries, read REPORT_POLYLINE_BATCH rows
+    at a time so a large project is never fully loaded.
+    """
+    from app.models.database import Polyline
+    from app.services.polyline_storage import load_points
+    
+    query = db.query(Polyline).filter(Polyline.project_id == project_id)
+    for p in query.yield_per(REPORT_POLYLINE_BATCH):
+        yield {
+            "name": p.name,
+            "page_number": p.page_number,
+            "points": load_points(p),
+            "length_ft": p.length_ft,
+        }
+
+def report_scale_calibrations(db, project_id: int) -> List[Dict]:
+    """A project's scale calibrations as report entries."""
+    from app.models.database import ScaleCalibration
+    
+    scale_calibrations = db.query(ScaleCalibration).filter(
+        ScaleCalibration.project_id == project_id
+    ).all()
+    return [
+        {
+            "page_number": sc.page_number,
+            "method": sc.method,
+            "scale_factor": sc.scale_factor,
+            "manual_scale_str": sc.manual_scale_str,
+            "known_distance_ft": sc.known_distance_ft,
+        }
+        for sc in scale_calibrations
+    ]
+
+def collect_report_data(db, project) -> Dict:
+    """
+    Keyword arguments for generate_csv_report / generate_json_report
+    (all but slack_factor) from a project's stored measurements.
+    """
+    return {
+        "project_name": project.name,
+        "total_length_ft": project.total_length_ft,
+        "polylines": list(iter_report_polylines(db, project.id)),
+        "scale_calibrations": report_scale_calibrations(db, project.id),
+    }
+
+def collect_overlay_data(db, project) -> Dict:
+    """
+    Everything drawn on a project, as the all_data argument of
+    write_overlaid_pdf: fiber routes numbered across the whole plat,
+    markers, marker links and conduits.
+    """
+    from app.models.database import Polyline, Marker, MarkerLink, Conduit
+    from app.services.polyline_storage import load_arc_index, load_points
+    
+    polylines = db.query(Polyline).filter(Polyline.project_id == project.id).all()
+    markers = db.query(Marker).filter(Marker.project_id == project.id).all()
+    marker_links = db.query(MarkerLink).join(Marker).filter(Marker.project_id == project.id).all()
+    conduits = db.query(Conduit).filter(Conduit.project_id == project.id).all()
+    
+    # Filter out any polylines that are actually conduits (legacy data)
+    # Real fiber routes shouldn't have "Conduit" in the name
+    fiber_polylines = [p for p in polylines if "Conduit" not in (p.name or "")]
+    
+    # Sort polylines by page_number and id for consistent global numbering
+    sorted_polylines = sorted(fiber_polylines, key=lambda p: (p.page_number, p.id))
+    
+    return {
         "polylines": [
             {
-                "name": p.get("name"),
-                "page_number": p.get("page_number"),
-                "point_count": len(p.get("points", [])),
-                "length_ft": p.get("length_ft"),
+                "name": p.name,
+                "page_number": p.page_number,
+                "points": load_points(p),
+                "arc_index": load_arc_index(p),
+                "length_ft": p.length_ft,
+                "type": "fiber",  # All polylines in DB are fiber routes (conduits are separate)
+                "global_index": idx + 1,  # Global cable number across all pages
+            }
+            for idx, p in enumerate(sorted_polylines)
+        ],
+        "markers": [
+            {
+                "id": m.id,
+                "x": m.x,
+                "y": m.y,
+                "type": m.marker_type,
+                "page_number": m.page_number,
+            }
+            for m in markers
+        ],
+        "marker_links": [
+            {
+                "markerId": ml.marker_id,
+                "to": {"x": ml.to_x, "y": ml.to_y},
+                "page_number": ml.page_number,
+            }
+            for ml in marker_links
+        ],
+        "conduits": [
+            {
+                "terminalId": c.terminal_id,
+                "dropPedId": c.drop_ped_id,
+                "footage": c.footage,
+                "page_number": c.page_number,
             }
-            for p in polylines
+            for c in conduits
         ],
-        "summary": {
-            "total_length_ft": total_length_ft,
-            "polyline_count": len(polylines),
-        },
     }
-    
-    if slack_factor:
-        adjusted_length = total_length_ft * (1 + slack_factor)
-        report["summary"]["slack_factor"] = slack_factor
-        report["summary"]["adjusted_length_ft"] = adjusted_length
-    
-    return json.dumps(report, indent=2)
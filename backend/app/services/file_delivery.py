@@ -0,0 +1,338 @@
+"""
+File delivery service - conditional, ranged and streamed responses for PDFs.
+
+Starlette's FileResponse sends the whole file every time. The helpers here
+add strong ETags, If-None-Match / If-Modified-Since revalidation (304) and
+single-range requests (206) so PDF.js can load large plats progressively.
+"""
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import BinaryIO, Iterator, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+# Clients may keep a copy but must revalidate it; the ETag makes that a 304
+CACHE_CONTROL = "private, no-cache"
+
+# Body chunk size for streamed temp files
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(stat_result: os.stat_result, content_hash: Optional[str] = None) -> str:
+    """Strong ETag from the content hash, else from mtime and size."""
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_list(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(headers: Mapping[str, str], etag: str) -> bool:
+    """Whether If-None-Match is "*" or lists `etag` (weak comparison)."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = _etag_list(if_none_match)
+    return "*" in tags or _opaque(etag) in [_opaque(tag) for tag in tags]
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """
+    Whether a GET can be answered with 304 Not Modified.
+
+    If-None-Match (weak comparison) takes precedence over If-Modified-Since,
+    as RFC 7232 requires.
+    """
+    if headers.get("if-none-match") is not None:
+        return etag_matches(headers, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(mtime) <= since
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end).
+
+    Returns None when the whole file should be sent: no header, another
+    unit, a malformed value or a multi-range request.
+
+    Raises:
+        ValueError: the range is well formed but unsatisfiable
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not sep or "," in last or not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+        return None
+
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start >= size:
+            raise ValueError("Range starts past the end of the file")
+        return start, min(end, size - 1)
+    if last:
+        # Suffix range: the final N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    return None
+
+
+class FileRangeResponse(FileResponse):
+    """206 Partial Content for bytes start..end (inclusive) of a file."""
+
+    def __init__(self, path: str, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; close the body rather than hang
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class OpenFileResponse(Response):
+    """
+    Bytes start..end (inclusive) of an already open file, closed once sent.
+
+    Used for cache entries: the file was opened before the response was
+    built, so it can be unlinked (evicted) meanwhile without breaking the body.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        start: int,
+        end: int,
+        stat_result: os.stat_result,
+        filename: str,
+        media_type: str,
+        headers: Mapping[str, str],
+    ):
+        partial = start > 0 or end < stat_result.st_size - 1
+        super().__init__(status_code=206 if partial else 200, media_type=media_type, headers=dict(headers))
+        self.fileobj = fileobj
+        self.start = start
+        self.end = end
+        # As FileResponse writes it
+        quoted = quote(filename)
+        if quoted != filename:
+            self.headers["content-disposition"] = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            self.headers["content-disposition"] = f'attachment; filename="{filename}"'
+        self.headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers["content-length"] = str(max(end - start + 1, 0))
+        if partial:
+            self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            remaining = self.end - self.start + 1
+            await anyio.to_thread.run_sync(self.fileobj.seek, self.start)
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(self.fileobj.read, min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0 or self.end < self.start:
+                # Short file, or an empty one
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.fileobj.close()
+
+
+def _close(fileobj: Optional[BinaryIO]) -> None:
+    if fileobj is not None:
+        fileobj.close()
+
+
+def conditional_file_response(
+    request_headers: Mapping[str, str],
+    path: Optional[str],
+    filename: str,
+    media_type: str = "application/pdf",
+    content_hash: Optional[str] = None,
+    fileobj: Optional[BinaryIO] = None,
+) -> Response:
+    """
+    Serve `path` honouring If-None-Match, If-Modified-Since, Range and If-Range.
+
+    Args:
+        request_headers: Incoming request headers (case-insensitive mapping)
+        path: File to send; ignored when fileobj is given
+        filename: Download name for Content-Disposition
+        media_type: Content type
+        content_hash: Hex digest of the content, used as the ETag when known
+        fileobj: The file already open, sent instead of `path` and closed
+            once the response is done with it (see OpenFileResponse)
+
+    Returns:
+        304, 206, 416 or a full 200 response
+    """
+    stat_result = os.fstat(fileobj.fileno()) if fileobj is not None else os.stat(path)
+    etag = file_etag(stat_result, content_hash)
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "cache-control": CACHE_CONTROL,
+    }
+
+    if is_not_modified(request_headers, etag, stat_result.st_mtime):
+        headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        _close(fileobj)
+        return Response(status_code=304, headers=headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    # A stale If-Range validator means the client's partial copy is outdated: send it all
+    if range_header and if_range is not None and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, stat_result.st_size)
+    except ValueError:
+        headers["content-range"] = f"bytes */{stat_result.st_size}"
+        _close(fileobj)
+        return Response(status_code=416, headers=headers)
+
+    if fileobj is not None:
+        if byte_range is None:
+            byte_range = (0, stat_result.st_size - 1)
+        return OpenFileResponse(fileobj, *byte_range, stat_result, filename, media_type, headers)
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat_result)
+    start, end = byte_range
+    return FileRangeResponse(
+        path, start, end, stat_result,
+        media_type=media_type, filename=filename, headers=headers,
+    )
+
+
+def iter_file(fileobj: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a file from its current position in fixed-size chunks, closing it at the end."""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def spooled_file_response(
+    fileobj: BinaryIO,
+    filename: str,
+    media_type: str = "application/pdf",
+) -> StreamingResponse:
+    """
+    Stream a fully written temp file (e.g. a SpooledTemporaryFile) with a known Content-Length.
+
+    The file is closed, and so deleted, once the body has been sent or the
+    response is abandoned.
+    """
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(0)
+    return StreamingResponse(
+        iter_file(fileobj),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size),
+        },
+        background=BackgroundTask(fileobj.close),
+    )
+
+
+class AppendedFileResponse(Response):
+    """
+    A file on disk followed by the contents of a temp file, e.g. an original
+    PDF and an incremental update to it.
+
+    The file is handed to the server with the ASGI zero-copy send extension
+    when it offers one (the server can then sendfile() it) and read in
+    chunks otherwise. The temp file is closed once the body has been sent.
+    """
+
+    def __init__(self, path: str, tail: BinaryIO, filename: str, media_type: str = "application/pdf"):
+        super().__init__(
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+        self.path = path
+        self.tail = tail
+        self.file_size = os.path.getsize(path)
+        tail_size = tail.seek(0, os.SEEK_END)
+        tail.seek(0)
+        self.headers["content-length"] = str(self.file_size + tail_size)
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                with open(self.path, "rb") as file:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file,
+                        "count": self.file_size,
+                        "more_body": True,
+                    })
+            else:
+                remaining = self.file_size
+                async with await anyio.open_file(self.path, mode="rb") as file:
+                    while remaining > 0:
+                        chunk = await file.read(min(STREAM_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            for chunk in iter_file(self.tail):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.tail.close()
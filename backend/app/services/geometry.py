@@ -1,5 +1,18 @@
 import math
-from typing import List, Dict
+import sys
+from array import array
+from bisect import bisect_left
+from typing import List, Dict, Optional, Sequence, Tuple
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many vertices the per-call NumPy overhead outweighs the vectorized math
+NUMPY_MIN_VERTICES = 64
+
+# Polylines up to this many segments are summed in lockstep rather than one by one
+NUMPY_COLUMN_MAX_SEGMENTS = 64
 
 class Point:
     def __init__(self, x: float, y: float):
@@ -10,6 +23,147 @@ class Point:
         """Calculate Euclidean distance to another point."""
         return math.sqrt((self.x - other.x)**2 + (self.y - other.y)**2)
 
+def pack_polylines(polylines: Sequence[List[Dict]]) -> Tuple[array, List[int]]:
+    """
+    Pack many polylines into one flat coordinate buffer.
+    
+    Args:
+        polylines: Sequence of point lists, each point a dict with 'x' and 'y' keys
+    
+    Returns:
+        (coords, offsets) where coords is a float64 array of interleaved
+        [x0, y0, x1, y1, ...] values and offsets[i]:offsets[i + 1] is the
+        vertex range of polyline i
+    """
+    coords = array('d')
+    offsets = [0]
+    for points in polylines:
+        for point in points:
+            coords.append(point['x'])
+            coords.append(point['y'])
+        offsets.append(len(coords) // 2)
+    return coords, offsets
+
+def encode_points_blob(points: List[Dict]) -> bytes:
+    """
+    Encode a polyline as a packed little-endian float64 blob.
+    
+    Args:
+        points: List of dictionaries with 'x' and 'y' keys
+    
+    Returns:
+        16 bytes per vertex: x and y as '<f8', interleaved
+    """
+    coords, _ = pack_polylines([points])
+    if sys.byteorder != 'little':
+        coords.byteswap()
+    return coords.tobytes()
+
+def decode_points_blob(blob: bytes) -> Sequence[float]:
+    """
+    Decode a blob from encode_points_blob into interleaved [x0, y0, ...] values.
+    
+    The result is a zero-copy view of the blob (a NumPy array when available,
+    otherwise a memoryview) on little-endian hosts, so it can be fed straight
+    to batch_polyline_lengths_pdf_units.
+    """
+    if np is not None:
+        return np.frombuffer(blob, dtype='<f8')
+    if sys.byteorder == 'little':
+        return memoryview(blob).cast('d')
+    coords = array('d', blob)
+    coords.byteswap()
+    return coords
+
+def coords_to_points(coords: Sequence[float]) -> List[Dict]:
+    """Convert interleaved [x0, y0, x1, y1, ...] values back to [{x, y}, ...]."""
+    values = coords.tolist()
+    return [{'x': values[i], 'y': values[i + 1]} for i in range(0, len(values), 2)]
+
+def _batch_lengths_python(coords: Sequence[float], offsets: Sequence[int]) -> List[float]:
+    """Pure-Python fallback for batch_polyline_lengths_pdf_units."""
+    lengths = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        total_length = 0.0
+        for i in range(start, end - 1):
+            dx = coords[2 * i] - coords[2 * i + 2]
+            dy = coords[2 * i + 1] - coords[2 * i + 3]
+            total_length += math.sqrt(dx**2 + dy**2)
+        lengths.append(total_length)
+    return lengths
+
+def _batch_lengths_numpy(coords: Sequence[float], offsets: Sequence[int]) -> List[float]:
+    """
+    NumPy implementation of batch_polyline_lengths_pdf_units.
+    
+    Every total is summed left to right from 0.0, as the Python path does, so
+    the results are bit-identical (np.add.reduceat sums pairwise and is not).
+    Polylines of up to NUMPY_COLUMN_MAX_SEGMENTS segments are summed together,
+    one segment position per vectorized step; longer ones use their own cumsum.
+    """
+    xy = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    deltas = xy[:-1] - xy[1:]
+    # Segment i joins vertex i and i + 1; segments spanning two polylines are never read
+    segments = np.sqrt(deltas[:, 0] ** 2 + deltas[:, 1] ** 2)
+    
+    starts = np.asarray(offsets[:-1], dtype=np.intp)
+    counts = np.maximum(np.asarray(offsets[1:], dtype=np.intp) - starts - 1, 0)
+    lengths = np.zeros(len(starts))
+    
+    short = np.flatnonzero((counts > 0) & (counts <= NUMPY_COLUMN_MAX_SEGMENTS))
+    if short.size:
+        # Longest first, so the polylines that still have a segment k are a prefix
+        order = short[np.argsort(-counts[short], kind='stable')]
+        order_starts = starts[order]
+        descending = -counts[order]
+        totals = np.zeros(order.size)
+        for k in range(int(-descending[0])):
+            active = int(np.searchsorted(descending, -k, side='left'))
+            totals[:active] += segments[order_starts[:active] + k]
+        lengths[order] = totals
+    
+    for i in np.flatnonzero(counts > NUMPY_COLUMN_MAX_SEGMENTS):
+        # cumsum adds left to right, matching the sequential sum of the Python path
+        lengths[i] = np.cumsum(segments[starts[i]:starts[i] + counts[i]])[-1]
+    return lengths.tolist()
+
+def batch_polyline_lengths_pdf_units(
+    coords: Sequence[float],
+    offsets: Sequence[int],
+    use_numpy: Optional[bool] = None,
+) -> List[float]:
+    """
+    Calculate the length of every packed polyline in PDF units in one pass.
+    
+    Args:
+        coords: Interleaved [x0, y0, x1, y1, ...] values (see pack_polylines)
+        offsets: Vertex offsets, one more entry than there are polylines
+        use_numpy: Force (True) or skip (False) the vectorized path; by default
+            NumPy is used when installed and the batch is large enough
+    
+    Returns:
+        List of lengths in PDF units, one per polyline
+    """
+    if use_numpy is None:
+        use_numpy = np is not None and len(coords) // 2 >= NUMPY_MIN_VERTICES
+    if use_numpy and np is not None:
+        return _batch_lengths_numpy(coords, offsets)
+    return _batch_lengths_python(coords, offsets)
+
+def calculate_polyline_lengths_ft(polylines: Sequence[List[Dict]], scale_factor: float) -> List[float]:
+    """
+    Calculate the length in feet of many polylines that share a scale factor.
+    
+    Args:
+        polylines: Sequence of point lists (in PDF units)
+        scale_factor: feet per PDF unit
+    
+    Returns:
+        List of lengths in feet, one per polyline
+    """
+    coords, offsets = pack_polylines(polylines)
+    return [length * scale_factor for length in batch_polyline_lengths_pdf_units(coords, offsets)]
+
 def calculate_polyline_length_pdf_units(points: List[Dict]) -> float:
     """
     Calculate total length of a polyline in PDF units.
@@ -23,13 +177,8 @@ def calculate_polyline_length_pdf_units(points: List[Dict]) -> float:
     if len(points) < 2:
         return 0.0
     
-    total_length = 0.0
-    for i in range(len(points) - 1):
-        p1 = Point(points[i]['x'], points[i]['y'])
-        p2 = Point(points[i + 1]['x'], points[i + 1]['y'])
-        total_length += p1.distance_to(p2)
-    
-    return total_length
+    coords, offsets = pack_polylines([points])
+    return batch_polyline_lengths_pdf_units(coords, offsets)[0]
 
 def calculate_polyline_length_ft(points: List[Dict], scale_factor: float) -> float:
     """
@@ -42,8 +191,130 @@ def calculate_polyline_length_ft(points: List[Dict], scale_factor: float) -> flo
     Returns:
         Total length in feet
     """
-    length_pdf_units = calculate_polyline_length_pdf_units(points)
-    return length_pdf_units * scale_factor
+    return calculate_polyline_lengths_ft([points], scale_factor)[0]
+
+def cumulative_arc_lengths(coords: Sequence[float]) -> Sequence[float]:
+    """
+    Calculate running distance along a polyline at each vertex.
+    
+    Args:
+        coords: Interleaved [x0, y0, x1, y1, ...] values
+    
+    Returns:
+        [0, d1, d1 + d2, ...] in PDF units, one entry per vertex; the last
+        entry equals calculate_polyline_length_pdf_units exactly
+    """
+    vertex_count = len(coords) // 2
+    if np is not None and vertex_count >= NUMPY_MIN_VERTICES:
+        xy = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        deltas = xy[:-1] - xy[1:]
+        cumulative = np.zeros(vertex_count)
+        np.cumsum(np.sqrt(deltas[:, 0] ** 2 + deltas[:, 1] ** 2), out=cumulative[1:])
+        return cumulative
+    
+    cumulative = array('d', [0.0]) if vertex_count else array('d')
+    total_length = 0.0
+    for i in range(vertex_count - 1):
+        dx = coords[2 * i] - coords[2 * i + 2]
+        dy = coords[2 * i + 1] - coords[2 * i + 3]
+        total_length += math.sqrt(dx**2 + dy**2)
+        cumulative.append(total_length)
+    return cumulative
+
+class ArcLengthIndex:
+    """
+    Cumulative arc-length index over one polyline.
+    
+    Built once per route (or loaded from a persisted blob), it answers
+    "distance at vertex i" directly and "point at distance d" with a binary
+    search instead of rescanning every segment from the start.
+    """
+    
+    def __init__(self, coords: Sequence[float], cumulative: Optional[Sequence[float]] = None):
+        """
+        Args:
+            coords: Interleaved [x0, y0, x1, y1, ...] values
+            cumulative: Previously computed cumulative_arc_lengths(coords), if any
+        """
+        self.coords = coords
+        self.cumulative = cumulative if cumulative is not None else cumulative_arc_lengths(coords)
+    
+    @classmethod
+    def from_points(cls, points: List[Dict]) -> 'ArcLengthIndex':
+        """Build an index from a list of dictionaries with 'x' and 'y' keys."""
+        coords, _ = pack_polylines([points])
+        return cls(coords)
+    
+    @classmethod
+    def from_blob(cls, coords: Sequence[float], blob: bytes) -> 'ArcLengthIndex':
+        """Build an index from coords and a blob written by to_blob."""
+        return cls(coords, decode_points_blob(blob))
+    
+    def __reduce__(self):
+        # Blob-backed memoryviews cannot be pickled; ship plain float64 arrays to worker processes
+        return (ArcLengthIndex, (array('d', self.coords), array('d', self.cumulative)))
+    
+    def to_blob(self) -> bytes:
+        """Serialize the cumulative distances as little-endian float64."""
+        cumulative = array('d', self.cumulative)
+        if sys.byteorder != 'little':
+            cumulative.byteswap()
+        return cumulative.tobytes()
+    
+    @property
+    def vertex_count(self) -> int:
+        return len(self.cumulative)
+    
+    @property
+    def segment_count(self) -> int:
+        return max(self.vertex_count - 1, 0)
+    
+    @property
+    def total_length(self) -> float:
+        return float(self.cumulative[-1]) if self.vertex_count else 0.0
+    
+    def distance_at_vertex(self, index: int) -> float:
+        """Distance along the polyline from the first vertex to vertex `index`."""
+        return float(self.cumulative[index])
+    
+    def vertex(self, index: int) -> Tuple[float, float]:
+        return float(self.coords[2 * index]), float(self.coords[2 * index + 1])
+    
+    def segment_at_distance(self, distance: float) -> int:
+        """
+        Index of the first segment whose end lies at or beyond `distance`.
+        
+        Segment i joins vertex i and i + 1.
+        """
+        if np is not None and isinstance(self.cumulative, np.ndarray):
+            end_vertex = int(np.searchsorted(self.cumulative[1:], distance, side='left')) + 1
+        else:
+            end_vertex = bisect_left(self.cumulative, distance, 1)
+        return min(end_vertex, self.segment_count) - 1
+    
+    def point_at_distance(self, distance: float) -> Tuple[float, float]:
+        """
+        Interpolate the point `distance` PDF units along the polyline.
+        
+        Distances outside [0, total_length] clamp to the end vertices.
+        """
+        if self.vertex_count == 0:
+            raise ValueError("Polyline has no points")
+        if self.vertex_count == 1 or distance <= 0:
+            return self.vertex(0)
+        if distance > self.total_length:
+            return self.vertex(self.vertex_count - 1)
+        
+        segment = self.segment_at_distance(distance)
+        x1, y1 = self.vertex(segment)
+        x2, y2 = self.vertex(segment + 1)
+        segment_length = math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
+        local_t = (distance - self.distance_at_vertex(segment)) / segment_length if segment_length > 0 else 0
+        return x1 + (x2 - x1) * local_t, y1 + (y2 - y1) * local_t
+    
+    def point_at_fraction(self, fraction: float) -> Tuple[float, float]:
+        """Interpolate the point at `fraction` (0-1) of the total length."""
+        return self.point_at_distance(self.total_length * fraction)
 
 def calculate_two_point_scale(
     point_a: Dict,
@@ -0,0 +1,365 @@
+"""
+Overlay content streams - PDF drawing operators written directly, without reportlab.
+
+ContentStreamCanvas implements the part of reportlab's Canvas API that the
+overlay drawing code uses (colours, line widths, lines, rectangles,
+circles, closed paths and centred Helvetica-Bold text) and emits the same
+operators a Canvas would, straight into a content stream. The stream
+becomes a Form XObject drawn on the target page, so no intermediate PDF is
+saved, re-parsed or merged.
+
+Marker glyphs repeat thousands of times on a plat, so each is a form
+XObject defined once per document (GLYPHS) and placed with a translation
+and Do. Colour, line width and font changes that would not change the
+current state are left out.
+"""
+import math
+from typing import Callable, Dict, List, Tuple
+
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+)
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Resource names inside the overlay form; the form has its own /Resources,
+# so they cannot clash with the page's
+FONT_RESOURCE = "/F1"
+FONT_NAME = "Helvetica-Bold"
+
+# Resource name of the overlay form on each page
+OVERLAY_XOBJECT_NAME = "/FrcOverlay"
+
+# Half the side of each glyph form's bounding box; covers the largest
+# glyph (the terminal triangle) including its mitred stroke
+GLYPH_EXTENT = 20
+
+# Bezier control distance for a quarter circle, as reportlab's bezierArc computes it
+_KAPPA = 4.0 / 3.0 * (1.0 - math.cos(math.pi / 4)) / math.sin(math.pi / 4)
+
+# (stroke, fill) -> path painting operator, even-odd fill as reportlab uses
+_PAINT_OPS = {(0, 0): "n", (1, 0): "S", (0, 1): "f*", (1, 1): "B*"}
+
+
+def _rgb(color: str) -> str:
+    """'#rrggbb' as operands for rg/RG."""
+    value = int(color.lstrip("#"), 16)
+    return fp_str((value >> 16 & 0xFF) / 255.0, (value >> 8 & 0xFF) / 255.0, (value & 0xFF) / 255.0)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class ContentStreamPath:
+    """Closed or open path built with moveTo/lineTo/close, like reportlab's PDFPathObject."""
+
+    def __init__(self):
+        self._ops: List[str] = []
+
+    def moveTo(self, x: float, y: float) -> None:
+        self._ops.append(f"{fp_str(x, y)} m")
+
+    def lineTo(self, x: float, y: float) -> None:
+        self._ops.append(f"{fp_str(x, y)} l")
+
+    def close(self) -> None:
+        self._ops.append("h")
+
+
+class ContentStreamCanvas:
+    """
+    Drop-in for the reportlab Canvas calls made by _draw_overlay that
+    appends PDF operators to a list. getvalue() returns the content stream.
+
+    Only opaque colours are supported; text is Helvetica-Bold. Consecutive
+    strings share one text object, and glyphs from GLYPHS are placed as
+    form XObjects with drawGlyph() unless glyph_forms is False.
+    """
+
+    def __init__(self, pagesize: Tuple[float, float], glyph_forms: bool = True):
+        self.width, self.height = pagesize
+        self.glyph_forms = glyph_forms
+        self._ops: List[str] = []
+        self._font_size = 12
+        # Current graphics state as emitted; None until first set
+        self._fill = None
+        self._stroke = None
+        self._line_width = None
+        self._text_font_size = None
+        self._in_text = False
+
+    def setFillColor(self, color: str, alpha: float = None) -> None:
+        self._check_opaque(alpha)
+        if color != self._fill:
+            # Colour operators are allowed inside a text object
+            self._ops.append(f"{_rgb(color)} rg")
+            self._fill = color
+
+    def setStrokeColor(self, color: str, alpha: float = None) -> None:
+        self._check_opaque(alpha)
+        if color != self._stroke:
+            self._ops.append(f"{_rgb(color)} RG")
+            self._stroke = color
+
+    def setFillAlpha(self, alpha: float) -> None:
+        self._check_opaque(alpha)
+
+    @staticmethod
+    def _check_opaque(alpha) -> None:
+        if alpha is not None and alpha != 1:
+            raise ValueError("ContentStreamCanvas only draws opaque colours")
+
+    def setLineWidth(self, width: float) -> None:
+        if width != self._line_width:
+            self._end_text()
+            self._ops.append(f"{fp_str(width)} w")
+            self._line_width = width
+
+    def setFont(self, name: str, size: float) -> None:
+        if name != FONT_NAME:
+            raise ValueError(f"ContentStreamCanvas only draws {FONT_NAME}")
+        self._font_size = size
+
+    def _path(self, ops: List[str]) -> None:
+        self._end_text()
+        self._ops.extend(ops)
+
+    def _end_text(self) -> None:
+        if self._in_text:
+            self._ops.append("ET")
+            self._in_text = False
+
+    def line(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        self._path([f"{fp_str(x1, y1)} m {fp_str(x2, y2)} l S"])
+
+    def rect(self, x: float, y: float, width: float, height: float, stroke: int = 1, fill: int = 0) -> None:
+        self._path([f"{fp_str(x, y, width, height)} re {_PAINT_OPS[stroke, fill]}"])
+
+    def circle(self, x: float, y: float, r: float, stroke: int = 1, fill: int = 0) -> None:
+        k = r * _KAPPA
+        self._path([
+            f"{fp_str(x + r, y)} m",
+            f"{fp_str(x + r, y + k, x + k, y + r, x, y + r)} c",
+            f"{fp_str(x - k, y + r, x - r, y + k, x - r, y)} c",
+            f"{fp_str(x - r, y - k, x - k, y - r, x, y - r)} c",
+            f"{fp_str(x + k, y - r, x + r, y - k, x + r, y)} c",
+            _PAINT_OPS[stroke, fill],
+        ])
+
+    def beginPath(self) -> ContentStreamPath:
+        return ContentStreamPath()
+
+    def drawPath(self, path: ContentStreamPath, stroke: int = 1, fill: int = 0) -> None:
+        self._path(path._ops + [_PAINT_OPS[stroke, fill]])
+
+    def drawCentredString(self, x: float, y: float, text: str) -> None:
+        if not self._in_text:
+            self._ops.append("BT")
+            self._in_text = True
+        if self._font_size != self._text_font_size:
+            # The text font is graphics state, so it carries over between text objects
+            self._ops.append(f"{FONT_RESOURCE} {fp_str(self._font_size)} Tf")
+            self._text_font_size = self._font_size
+        width = stringWidth(text, FONT_NAME, self._font_size)
+        self._ops.append(f"1 0 0 1 {fp_str(x - 0.5 * width, y)} Tm ({_escape(text)}) Tj")
+
+    def drawGlyph(self, name: str, x: float, y: float) -> None:
+        """Place glyph `name` (a key of GLYPHS) centred on (x, y)."""
+        # Do saves and restores the graphics state, so the tracked state still holds
+        self._path([f"q 1 0 0 1 {fp_str(x, y)} cm {_glyph_resource(name)} Do Q"])
+
+    def getvalue(self) -> bytes:
+        self._end_text()
+        return "\n".join(self._ops).encode("latin-1")
+
+
+def _draw_handhole(c, x: float, y: float) -> None:
+    size = 14
+    # Outer purple square
+    c.setFillColor("#a855f7", 1)  # Purple
+    c.rect(x - size, y - size, size * 2, size * 2, fill=1, stroke=0)
+    # White border
+    c.setStrokeColor("#ffffff", 1)
+    c.setLineWidth(2)
+    c.rect(x - size, y - size, size * 2, size * 2, fill=0, stroke=1)
+    # Hollow center (white square inside)
+    inner_size = 6
+    c.setFillColor("#ffffff", 1)
+    c.rect(x - inner_size, y - inner_size, inner_size * 2, inner_size * 2, fill=1, stroke=0)
+
+
+def _draw_route_label(c, x: float, y: float) -> None:
+    # Label background circle
+    c.setFillColor("#22c55e", 1)  # Green
+    c.setStrokeColor("#ffffff", 1)
+    c.setLineWidth(2)
+    c.circle(x, y, 12, fill=1, stroke=1)
+
+
+def _draw_terminal(c, x: float, y: float) -> None:
+    # Larger green triangle to fit letter inside (25% bigger: 24 * 1.25 = 30)
+    size = 30
+    h = size * math.sqrt(3) / 2
+    c.setFillColor("#10b981", 1)  # Green
+    c.setStrokeColor("#ffffff", 1)
+    c.setLineWidth(2)
+    path = c.beginPath()
+    path.moveTo(x, y + h / 2)
+    path.lineTo(x - size / 2, y - h / 2)
+    path.lineTo(x + size / 2, y - h / 2)
+    path.close()
+    c.drawPath(path, fill=1, stroke=1)
+
+
+def _draw_drop(c, x: float, y: float) -> None:
+    # Purple circle
+    radius = 12
+    c.setFillColor("#a855f7", 1)  # Purple
+    c.setStrokeColor("#ffffff", 1)
+    c.setLineWidth(2)
+    c.circle(x, y, radius, fill=1, stroke=1)
+
+
+# Marker glyphs: name -> function drawing it centred on (x, y) on a canvas
+GLYPHS: Dict[str, Callable] = {
+    "handhole": _draw_handhole,
+    "route_label": _draw_route_label,
+    "terminal": _draw_terminal,
+    "drop": _draw_drop,
+}
+
+
+def draw_glyph(c, name: str, x: float, y: float) -> None:
+    """Draw a glyph: placed as a form XObject on a ContentStreamCanvas, as paths on a reportlab Canvas."""
+    if isinstance(c, ContentStreamCanvas) and c.glyph_forms:
+        c.drawGlyph(name, x, y)
+    else:
+        GLYPHS[name](c, x, y)
+
+
+def _glyph_resource(name: str) -> str:
+    return f"/G_{name}"
+
+
+def font_dictionary() -> DictionaryObject:
+    """The Helvetica-Bold font shared by every overlay form in a document."""
+    return DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject(f"/{FONT_NAME}"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    })
+
+
+def glyph_form(name: str) -> StreamObject:
+    """Form XObject of one glyph, drawn centred on the origin."""
+    c = ContentStreamCanvas((0, 0))
+    GLYPHS[name](c, 0, 0)
+    form = DecodedStreamObject()
+    form.set_data(c.getvalue())
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject(
+            FloatObject(v) for v in (-GLYPH_EXTENT, -GLYPH_EXTENT, GLYPH_EXTENT, GLYPH_EXTENT)
+        ),
+        NameObject("/Resources"): DictionaryObject(),
+    })
+    return form.flate_encode()
+
+
+def overlay_resources(add_object: Callable[[DictionaryObject], IndirectObject]) -> IndirectObject:
+    """
+    Resources shared by every overlay form in a document: the font and one
+    form per glyph, each added once with `add_object`.
+    """
+    glyphs = DictionaryObject({
+        NameObject(_glyph_resource(name)): add_object(glyph_form(name)) for name in GLYPHS
+    })
+    return add_object(DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject(FONT_RESOURCE): add_object(font_dictionary())}),
+        NameObject("/XObject"): glyphs,
+    }))
+
+
+def overlay_form(content: bytes, width: float, height: float, resources: IndirectObject) -> StreamObject:
+    """
+    A page overlay as a Form XObject using the document's overlay_resources().
+
+    Drawn with the identity matrix, it paints what merging a reportlab
+    overlay page of the same size would, clipped to that page's box.
+    """
+    form = DecodedStreamObject()
+    form.set_data(content)
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)]),
+        NameObject("/Resources"): resources,
+    })
+    return form.flate_encode()
+
+
+def _content_stream(data: bytes) -> StreamObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def _copy_dict(obj) -> DictionaryObject:
+    """Shallow copy of a possibly indirect dictionary, so shared originals are left alone."""
+    if obj is None:
+        return DictionaryObject()
+    return DictionaryObject(obj.get_object().items())
+
+
+def draw_form_on_page(
+    page: DictionaryObject,
+    form: IndirectObject,
+    add_object: Callable[[StreamObject], IndirectObject],
+) -> None:
+    """
+    Draw `form` over a page, in place.
+
+    The page's original content is wrapped in q/Q, as merge_page does, so
+    its graphics state cannot leak into the overlay. The page gets its own
+    copy of /Resources with the form added under an unused name.
+
+    Args:
+        page: Page dictionary to change
+        form: Reference to the overlay form
+        add_object: Registers a new stream in the output document and returns its reference
+    """
+    resources = _copy_dict(page.raw_get("/Resources") if "/Resources" in page else None)
+    xobjects = _copy_dict(resources.raw_get("/XObject") if "/XObject" in resources else None)
+    name = OVERLAY_XOBJECT_NAME
+    suffix = 1
+    while name in xobjects:
+        suffix += 1
+        name = f"{OVERLAY_XOBJECT_NAME}{suffix}"
+    xobjects[NameObject(name)] = form
+    resources[NameObject("/XObject")] = xobjects
+    page[NameObject("/Resources")] = resources
+
+    original = page.raw_get("/Contents") if "/Contents" in page else None
+    if original is None:
+        parts = []
+    elif isinstance(original.get_object(), ArrayObject):
+        parts = list(original.get_object())
+    else:
+        parts = [original]
+    draw = f"q {name} Do Q\n".encode()
+    contents = ArrayObject()
+    if parts:
+        contents.append(add_object(_content_stream(b"q\n")))
+        contents.extend(parts)
+        draw = b"\nQ\n" + draw
+    contents.append(add_object(_content_stream(draw)))
+    page[NameObject("/Contents")] = contents
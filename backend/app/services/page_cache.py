@@ -0,0 +1,96 @@
+"""
+Page extraction service - standalone PDFs of selected plat pages, cached on disk.
+
+Extracted files live at UPLOAD_DIR/page_cache/<aa>/<sha256>-p<pages>.pdf, so
+every project sharing a stored PDF shares its extracted pages. The cache is
+a DiskLRUCache bounded by PAGE_CACHE_MAX_BYTES.
+"""
+import os
+from typing import BinaryIO, List, Optional
+
+from pypdf import PdfReader, PdfWriter
+
+from app.services.disk_cache import DiskLRUCache
+
+
+def parse_page_spec(spec: str, page_count: int) -> List[int]:
+    """
+    Parse a page selection such as "3", "2-4" or "1,3,5-7" (1-based).
+
+    Returns:
+        Sorted, de-duplicated page numbers
+
+    Raises:
+        ValueError: malformed selection or page outside 1..page_count
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            raise ValueError(f"Invalid page selection: {spec!r}")
+        first, sep, last = part.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if sep else start
+        except ValueError:
+            raise ValueError(f"Invalid page selection: {spec!r}")
+        if start < 1 or end > page_count or start > end:
+            raise ValueError(f"Pages must be within 1-{page_count}: {part!r}")
+        pages.update(range(start, end + 1))
+    return sorted(pages)
+
+
+def format_page_spec(pages: List[int]) -> str:
+    """Canonical form of a page list: runs collapsed, e.g. [1, 2, 3, 5] -> "1-3_5"."""
+    runs = []
+    for page in pages:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return "_".join(str(a) if a == b else f"{a}-{b}" for a, b in runs)
+
+
+class PageCache(DiskLRUCache):
+    """DiskLRUCache of extracted page files, keyed by content hash and page selection."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        super().__init__("page_cache", "PAGE_CACHE_MAX_BYTES", max_bytes=max_bytes)
+
+    @staticmethod
+    def key_for(sha256: str, pages: List[int]) -> str:
+        return f"{sha256}-p{format_page_spec(pages)}"
+
+
+page_cache = PageCache()
+
+
+def extract_pages(source_path: str, sha256: str, pages: List[int], cache: PageCache = None) -> BinaryIO:
+    """
+    Open file of a standalone PDF holding `pages` (1-based) of the source file.
+
+    Served from the cache when present; otherwise the pages are copied into
+    a new document and written atomically into the cache. The file is opened
+    before it enters the cache, so it stays readable if it is evicted before
+    the caller has sent it. The caller closes it.
+    """
+    cache = cache or page_cache
+    key = cache.key_for(sha256, pages)
+    cached = cache.open(key)
+    if cached:
+        return cached
+
+    reader = PdfReader(source_path)
+    writer = PdfWriter()
+    for page_number in pages:
+        writer.add_page(reader.pages[page_number - 1])
+    temp_path = cache.temp_path_for(key)
+    try:
+        with open(temp_path, "wb") as f:
+            writer.write(f)
+        extracted = open(temp_path, "rb")
+        cache.put_file(key, temp_path)
+        return extracted
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
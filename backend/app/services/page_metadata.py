@@ -0,0 +1,91 @@
+"""
+Page metadata service - per-page PDF geometry persisted at ingest.
+"""
+from typing import Dict, List, Optional
+
+from app.services.pdf_handler import ingest_pdf
+from app.services.pdf_storage import project_pdf_path
+
+
+def build_project_pages(project, pages: List[Dict]) -> list:
+    """Create ProjectPage rows for a project from ingest_pdf()["pages"]."""
+    from app.models.database import ProjectPage
+
+    return [
+        ProjectPage(
+            project=project,
+            page_number=page["page_number"],
+            media_box=page["media_box"],
+            width=page["width"],
+            height=page["height"],
+            rotation=page["rotation"],
+            user_unit=page["user_unit"],
+        )
+        for page in pages
+    ]
+
+
+def stored_pages_for_blob(db, sha256: str) -> Optional[List[Dict]]:
+    """
+    Page metadata already ingested for a stored PDF, in ingest_pdf()["pages"] form.
+
+    Returns:
+        None if no project using this content has page rows yet
+    """
+    from app.models.database import Project, ProjectPage
+
+    source = db.query(Project.id).join(ProjectPage).filter(
+        Project.pdf_sha256 == sha256
+    ).order_by(Project.id).first()
+    if source is None:
+        return None
+    pages = db.query(ProjectPage).filter(
+        ProjectPage.project_id == source.id
+    ).order_by(ProjectPage.page_number).all()
+    return [
+        {
+            "page_number": page.page_number,
+            "media_box": page.media_box,
+            "width": page.width,
+            "height": page.height,
+            "rotation": page.rotation,
+            "user_unit": page.user_unit,
+        }
+        for page in pages
+    ]
+
+
+def load_project_pages(db, project) -> list:
+    """
+    Get a project's ProjectPage rows, ordered by page number.
+
+    Projects created before page metadata existed are ingested once here and
+    their rows persisted, so later calls never reparse the PDF.
+    """
+    from app.models.database import ProjectPage
+
+    pages = db.query(ProjectPage).filter(
+        ProjectPage.project_id == project.id
+    ).order_by(ProjectPage.page_number).all()
+    if pages:
+        return pages
+
+    info = ingest_pdf(project_pdf_path(project))
+    if not info["is_valid"]:
+        return []
+    pages = build_project_pages(project, info["pages"])
+    db.add_all(pages)
+    db.commit()
+    return pages
+
+
+def page_geometry_map(pages) -> Dict[int, Dict]:
+    """Page number -> {width, height, rotation} as accepted by overlay_drawings_on_pdf."""
+    return {
+        page.page_number: {
+            "width": page.width,
+            "height": page.height,
+            "rotation": page.rotation,
+        }
+        for page in pages
+    }
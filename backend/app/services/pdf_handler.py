@@ -39,6 +39,120 @@ def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     except Exception as e:
         return False, f"Invalid PDF: {str(e)}"
 
+def page_rotate_entry(page) -> int:
+    """
+    A page's own /Rotate entry in degrees, 0 when it has none.
+
+    This is the value the overlay code has always read (page.get('/Rotate')),
+    rather than pypdf's page.rotation, so stored page metadata and a fresh
+    read of the PDF agree.
+    """
+    rotate = page.get('/Rotate', 0)
+    return int(rotate.get_object() if hasattr(rotate, "get_object") else rotate)
+
+
+def ingest_pdf(file_path: str) -> dict:
+    """
+    Validate a PDF and extract its page geometry in a single parse.
+    
+    Returns:
+        {
+            "is_valid": bool,
+            "message": str,
+            "page_count": int,
+            "pages": [{page_number, media_box, width, height, rotation, user_unit}, ...],
+        }
+    """
+    result = {"is_valid": False, "message": "", "page_count": 0, "pages": []}
+    
+    if not os.path.exists(file_path):
+        result["message"] = "File does not exist"
+        return result
+    
+    if not file_path.lower().endswith('.pdf'):
+        result["message"] = "File is not a PDF"
+        return result
+    
+    if not pypdf:
+        raise ImportError("pypdf is required for PDF handling")
+    
+    try:
+        with open(file_path, 'rb') as f:
+            reader = pypdf.PdfReader(f)
+            if not reader.pages:
+                result["message"] = "PDF has no pages"
+                return result
+            
+            for i, page in enumerate(reader.pages):
+                media_box = page.mediabox
+                result["pages"].append({
+                    "page_number": i + 1,
+                    "media_box": [float(media_box.left), float(media_box.bottom), float(media_box.right), float(media_box.top)],
+                    "width": float(media_box.width),
+                    "height": float(media_box.height),
+                    "rotation": page_rotate_entry(page),
+                    "user_unit": float(page.user_unit),
+                })
+        result["page_count"] = len(result["pages"])
+        result["is_valid"] = True
+        result["message"] = "Valid PDF"
+        return result
+    except Exception as e:
+        result["pages"] = []
+        result["message"] = f"Invalid PDF: {str(e)}"
+        return result
+
+def compact_pdf(source_path: str, dest_path: str) -> dict:
+    """
+    Write a smaller copy of a PDF: identical objects merged, unreferenced
+    objects dropped and page content streams Flate-compressed.
+    
+    The copy is kept only if it re-parses with the same page count and is
+    smaller than the source; otherwise dest_path is not created.
+    
+    Returns:
+        {
+            "compacted": bool,
+            "message": str,
+            "original_size": int,
+            "compacted_size": int | None,
+        }
+    """
+    if not pypdf:
+        raise ImportError("pypdf is required for PDF handling")
+    
+    original_size = os.path.getsize(source_path)
+    result = {"compacted": False, "message": "", "original_size": original_size, "compacted_size": None}
+    temp_path = f"{dest_path}.tmp"
+    try:
+        reader = pypdf.PdfReader(source_path)
+        writer = pypdf.PdfWriter(clone_from=reader)
+        for page in writer.pages:
+            page.compress_content_streams()
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+        with open(temp_path, 'wb') as f:
+            writer.write(f)
+        
+        compacted_size = os.path.getsize(temp_path)
+        if compacted_size >= original_size:
+            result["message"] = "Already compact"
+            return result
+        if len(pypdf.PdfReader(temp_path).pages) != len(reader.pages):
+            result["message"] = "Compacted copy lost pages"
+            return result
+        
+        os.replace(temp_path, dest_path)
+        result["compacted"] = True
+        result["compacted_size"] = compacted_size
+        result["message"] = f"Compacted {original_size} -> {compacted_size} bytes"
+        return result
+    except Exception as e:
+        result["message"] = f"Compaction failed: {str(e)}"
+        return result
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 def get_pdf_info(pdf_path: str) -> dict:
     """Get detailed information about a PDF file."""
     if not pypdf:
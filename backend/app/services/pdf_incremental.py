@@ -0,0 +1,247 @@
+"""
+Incremental PDF export - route overlays appended to the original as a PDF incremental update.
+
+write_overlaid_pdf re-serializes every object of the plat. The update written
+here holds only what changes: one Form XObject per annotated page (the
+overlay drawing), a replacement dictionary for each page that gains an
+overlay or a rotation, and a cross-reference section chained to the
+original's through /Prev (ISO 32000-1, 7.5.6). The export is the untouched
+original file followed by the update, so the original can be sent straight
+from disk and the work done scales with the overlay content, not the plat.
+"""
+import os
+import struct
+from typing import BinaryIO, Dict, List, Tuple
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+)
+
+from app.services.overlay_stream import draw_form_on_page, overlay_form, overlay_resources
+from app.services.pdf_overlay import overlay_page_size, plan_overlay_pages, render_page_overlays
+
+# Bytes searched at the end of the file for the startxref keyword
+TAIL_SIZE = 1024
+
+
+class IncrementalUpdateUnsupported(ValueError):
+    """The original PDF cannot take an appended update (encrypted or unreadable trailer)."""
+
+
+def read_xref_tail(path: str) -> Tuple[int, int, bool, bool]:
+    """
+    Locate the original's last cross-reference section.
+
+    Returns:
+        (file size, startxref offset, whether the file ends with an EOL,
+        whether that section is a cross-reference stream)
+
+    Raises:
+        IncrementalUpdateUnsupported: no usable startxref
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - TAIL_SIZE, 0))
+        tail = f.read()
+        keyword = tail.rfind(b"startxref")
+        if keyword < 0:
+            raise IncrementalUpdateUnsupported("No startxref at the end of the PDF")
+        try:
+            startxref = int(tail[keyword + len(b"startxref"):].split()[0])
+        except (IndexError, ValueError):
+            raise IncrementalUpdateUnsupported("Malformed startxref at the end of the PDF")
+        if not 0 < startxref < size:
+            raise IncrementalUpdateUnsupported("startxref points outside the PDF")
+        f.seek(startxref)
+        is_stream = not f.read(4).startswith(b"xref")
+    return size, startxref, tail.endswith((b"\n", b"\r")), is_stream
+
+
+class _UpdateWriter:
+    """Writes numbered objects after the original bytes and the xref section indexing them."""
+
+    def __init__(self, output: BinaryIO, original_size: int, next_number: int):
+        self.output = output
+        self.original_size = original_size
+        self.next_number = next_number
+        self.offsets: Dict[int, Tuple[int, int]] = {}  # number -> (absolute offset, generation)
+        self._start = output.tell()
+
+    def tell(self) -> int:
+        """Absolute offset in the combined file."""
+        return self.original_size + self.output.tell() - self._start
+
+    def allocate(self) -> int:
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def add_object(self, obj: PdfObject) -> IndirectObject:
+        """Write `obj` under a new object number and return a reference to it."""
+        number = self.allocate()
+        self.write_object(number, obj)
+        return IndirectObject(number, 0, None)
+
+    def write_object(self, number: int, obj: PdfObject, generation: int = 0) -> None:
+        self.offsets[number] = (self.tell(), generation)
+        self.output.write(f"{number} {generation} obj\n".encode())
+        obj.write_to_stream(self.output)
+        self.output.write(b"\nendobj\n")
+
+    def _subsections(self) -> List[Tuple[int, List[int]]]:
+        runs: List[Tuple[int, List[int]]] = []
+        for number in sorted(self.offsets):
+            if runs and number == runs[-1][0] + len(runs[-1][1]):
+                runs[-1][1].append(number)
+            else:
+                runs.append((number, [number]))
+        return runs
+
+    def write_xref_table(self, trailer: DictionaryObject) -> None:
+        startxref = self.tell()
+        # Object 0 heads the free list; repeating it keeps readers that expect
+        # a section to start at 0 from renumbering the entries
+        lines = [b"xref\n", b"0 1\n", b"0000000000 65535 f\r\n"]
+        for first, numbers in self._subsections():
+            lines.append(f"{first} {len(numbers)}\n".encode())
+            for number in numbers:
+                offset, generation = self.offsets[number]
+                lines.append(f"{offset:010d} {generation:05d} n\r\n".encode())
+        self.output.write(b"".join(lines))
+        trailer[NameObject("/Size")] = NumberObject(self.next_number)
+        self.output.write(b"trailer\n")
+        trailer.write_to_stream(self.output)
+        self.output.write(f"\nstartxref\n{startxref}\n%%EOF\n".encode())
+
+    def write_xref_stream(self, trailer: DictionaryObject) -> None:
+        # An update to a file indexed by xref streams is indexed by one too
+        number = self.allocate()
+        startxref = self.tell()
+        self.offsets[number] = (startxref, 0)
+        offset_width = max(4, (startxref.bit_length() + 7) // 8)
+        index = ArrayObject()
+        rows = []
+        for first, numbers in self._subsections():
+            index.extend([NumberObject(first), NumberObject(len(numbers))])
+            for n in numbers:
+                offset, generation = self.offsets[n]
+                rows.append(b"\x01" + offset.to_bytes(offset_width, "big") + struct.pack(">H", generation))
+        xref = DecodedStreamObject()
+        xref.set_data(b"".join(rows))
+        xref.update(trailer)
+        xref.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(self.next_number),
+            NameObject("/Index"): index,
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)]),
+        })
+        self.output.write(f"{number} 0 obj\n".encode())
+        xref.write_to_stream(self.output)
+        self.output.write(f"\nendobj\nstartxref\n{startxref}\n%%EOF\n".encode())
+
+
+def _updated_page(page, writer: _UpdateWriter, form_number: int = None, rotation: int = 0) -> DictionaryObject:
+    """
+    Replacement page dictionary: the original's entries, with the overlay
+    form drawn over the page and `rotation` added to /Rotate. Inherited
+    attributes are already copied in by PdfReader.
+    """
+    updated = DictionaryObject(page.items())
+
+    if form_number is not None:
+        draw_form_on_page(updated, IndirectObject(form_number, 0, None), writer.add_object)
+
+    if rotation:
+        current = page.raw_get("/Rotate").get_object() if "/Rotate" in page else 0
+        updated[NameObject("/Rotate")] = NumberObject(int(current) + rotation)
+    return updated
+
+
+def write_overlay_update(
+    original_pdf_path: str,
+    output: BinaryIO,
+    all_data: Dict = None,
+    single_page: int = None,
+    page_width: float = None,
+    page_height: float = None,
+    page_geometry: Dict[int, Dict] = None,
+    workers: int = None,
+) -> int:
+    """
+    Write the incremental update that adds route overlays to the original PDF.
+
+    The annotated PDF is the original file's bytes followed by what is
+    written to `output`. Takes the same drawing arguments as
+    write_overlaid_pdf and renders through the same overlay cache; a page
+    whose overlay fails to render is left as it is.
+
+    Returns:
+        Number of pages changed
+
+    Raises:
+        IncrementalUpdateUnsupported: the original cannot be updated in place
+            (encrypted, or its trailer cannot be found); use write_overlaid_pdf
+    """
+    original_size, prev_xref, ends_with_eol, xref_is_stream = read_xref_tail(original_pdf_path)
+
+    with open(original_pdf_path, "rb") as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        if pdf_reader.is_encrypted:
+            raise IncrementalUpdateUnsupported("Encrypted PDFs cannot be updated incrementally")
+
+        page_plans, render_tasks = plan_overlay_pages(
+            pdf_reader, all_data, single_page, page_width, page_height, page_geometry
+        )
+        overlays = render_page_overlays(render_tasks, workers)
+
+        writer = _UpdateWriter(output, original_size, int(pdf_reader.trailer["/Size"]))
+        if not ends_with_eol:
+            output.write(b"\n")
+
+        overlay_sizes = {page_num: overlay_page_size(args) for page_num, args in render_tasks}
+        resources = None
+        changed = 0
+        for page, current_page_num, rotation in page_plans:
+            rotation = rotation if rotation in (90, 180, 270) else 0
+            form_number = None
+            overlay = overlays.get(current_page_num)
+            if isinstance(overlay, Exception):
+                print(f"Warning: Could not overlay content on page {current_page_num}: {overlay}")
+            elif overlay is not None:
+                if resources is None:
+                    resources = overlay_resources(writer.add_object)
+                form = overlay_form(overlay, *overlay_sizes[current_page_num], resources)
+                form_number = writer.add_object(form).idnum
+
+            if form_number is None and not rotation:
+                continue
+            reference = page.indirect_reference
+            if reference is None:
+                raise IncrementalUpdateUnsupported(f"Page {current_page_num} is not an indirect object")
+            writer.write_object(
+                reference.idnum,
+                _updated_page(page, writer, form_number, rotation),
+                reference.generation,
+            )
+            changed += 1
+
+        trailer = DictionaryObject({NameObject("/Prev"): NumberObject(prev_xref)})
+        for key in ("/Root", "/Info", "/ID"):
+            if key in pdf_reader.trailer:
+                trailer[NameObject(key)] = pdf_reader.trailer.raw_get(key)
+        if xref_is_stream:
+            writer.write_xref_stream(trailer)
+        else:
+            writer.write_xref_table(trailer)
+
+        update_size = writer.tell() - original_size
+
+    print(f"PDF Overlay: incremental update of {changed} pages, {update_size} bytes")
+    return changed
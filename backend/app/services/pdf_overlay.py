@@ -1,11 +1,33 @@
 """
 PDF overlay service - adds drawn routes, markers, and conduits to PDF.
 """
+import hashlib
 import io
+import json
 import math
-from typing import List, Dict
+import multiprocessing
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Callable, List, Dict
 from reportlab.pdfgen import canvas
 from pypdf import PdfReader, PdfWriter
+from app.config import settings
+from app.services.disk_cache import DiskLRUCache
+from app.services.geometry import ArcLengthIndex
+from app.services.pdf_handler import page_rotate_entry
+from app.services.overlay_stream import (
+    ContentStreamCanvas,
+    draw_form_on_page,
+    draw_glyph,
+    overlay_form,
+    overlay_resources,
+)
+
+# Buffer for copying the original PDF when overlaying fails
+COPY_CHUNK_SIZE = 1024 * 1024
 
 
 def _get_label(index: int) -> str:
@@ -32,11 +54,16 @@ def overlay_drawings_on_pdf(
     marker_links: List[Dict] = None,
     conduits: List[Dict] = None,
     page_number: int = None,
+    page_geometry: Dict[int, Dict] = None,
+    workers: int = None,
 ) -> bytes:
     """
     Overlay drawn routes, markers, and conduits on PDF pages.
     Returns the original PDF with route overlays on all pages.
 
+    Large documents should use write_overlaid_pdf with a file instead, which
+    avoids holding the result in memory.
+
     Args:
         original_pdf_path: Path to the original PDF file
         all_data: Dict containing polylines, markers, marker_links, conduits for all pages
@@ -44,76 +71,97 @@ def overlay_drawings_on_pdf(
         page_width: Rendered page width from frontend
         page_height: Rendered page height from frontend
         rotation: User-applied rotation in degrees (0, 90, 180, 270)
+        page_geometry: Optional stored page metadata, page number -> {width, height, rotation};
+            when given, /MediaBox and /Rotate are not re-read from the PDF
+        workers: Overlay rendering processes; defaults to settings.OVERLAY_RENDER_WORKERS.
+            Pages are still merged in order, so the output does not depend on it
 
     Returns:
         Bytes of the PDF with route overlays
     """
+    # Handle legacy API
+    if all_data is None and polylines is not None:
+        all_data = {
+            "polylines": polylines or [],
+            "markers": markers or [],
+            "marker_links": marker_links or [],
+            "conduits": conduits or [],
+        }
+        single_page = page_number or 1
+    
+    output = io.BytesIO()
+    write_overlaid_pdf(
+        original_pdf_path,
+        output,
+        all_data=all_data,
+        single_page=single_page,
+        page_width=page_width,
+        page_height=page_height,
+        rotation=rotation,
+        page_geometry=page_geometry,
+        workers=workers,
+    )
+    return output.getvalue()
+
+
+def write_overlaid_pdf(
+    original_pdf_path: str,
+    output: BinaryIO,
+    all_data: Dict = None,
+    single_page: int = None,
+    page_width: float = None,
+    page_height: float = None,
+    rotation: int = 0,
+    page_geometry: Dict[int, Dict] = None,
+    workers: int = None,
+    progress: Callable[[int, int], None] = None,
+) -> bool:
+    """
+    Write the original PDF with route overlays to a writable, seekable file.
+
+    Takes the same arguments as overlay_drawings_on_pdf. If overlaying fails
+    the output is rewound and the original PDF is copied into it in chunks.
+    `progress`, if given, is called with (pages done, total pages) once the
+    overlays are rendered and after each page is added.
+
+    Returns:
+        True if the overlays were written, False if the original was copied instead
+    """
     try:
         # Open and read original PDF
         with open(original_pdf_path, 'rb') as pdf_file:
             pdf_reader = PdfReader(pdf_file)
             pdf_writer = PdfWriter()
             
-            # Handle legacy API
-            if all_data is None and polylines is not None:
-                all_data = {
-                    "polylines": polylines or [],
-                    "markers": markers or [],
-                    "marker_links": marker_links or [],
-                    "conduits": conduits or [],
-                }
-                single_page = page_number or 1
+            # Plan every page first so overlay rendering can run in parallel
+            page_plans, render_tasks = plan_overlay_pages(
+                pdf_reader, all_data, single_page, page_width, page_height, page_geometry
+            )
             
-            # Process all pages
-            for i in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[i]
-                current_page_num = i + 1
-                
-                # Get rotation if any
-                rotation = page.get('/Rotate', 0)
-                print(f"PDF Overlay: Page {current_page_num} mediabox: {page.mediabox.width} x {page.mediabox.height}, rotation: {rotation}")
-                
-                # Determine if we should add overlay to this page
-                should_overlay = (single_page is None) or (current_page_num == single_page)
-                
-                # Filter data for current page
-                if should_overlay and all_data:
-                    page_polylines = [p for p in all_data.get("polylines", []) if p.get("page_number") == current_page_num]
-                    page_markers = [m for m in all_data.get("markers", []) if m.get("page_number") == current_page_num]
-                    page_links = [l for l in all_data.get("marker_links", []) if l.get("page_number") == current_page_num]
-                    page_conduits = [c for c in all_data.get("conduits", []) if c.get("page_number") == current_page_num]
-                    
-                    has_content = page_polylines or page_markers or page_conduits
-                    
-                    if has_content:
-                        try:
-                            # Use frontend dimensions if provided, otherwise use PDF mediabox
-                            overlay_width = page_width if page_width else float(page.mediabox.width)
-                            overlay_height = page_height if page_height else float(page.mediabox.height)
-                            
-                            print(f"PDF Overlay: Page {current_page_num} - Adding {len(page_polylines)} polylines, {len(page_markers)} markers, {len(page_conduits)} conduits")
-                            print(f"PDF Overlay: Using dimensions {overlay_width} x {overlay_height}")
-                            
-                            # Create overlay with routes, markers, and conduits for this page
-                            overlay_bytes = _create_overlay_content(
-                                overlay_width,
-                                overlay_height,
-                                page_polylines,
-                                page_markers,
-                                page_links,
-                                page_conduits,
-                                rotation=rotation,
-                                original_width=float(page.mediabox.width),
-                                original_height=float(page.mediabox.height),
-                            )
-                            
-                            # Merge overlay with page
-                            overlay_pdf = PdfReader(io.BytesIO(overlay_bytes))
-                            overlay_page = overlay_pdf.pages[0]
-                            page.merge_page(overlay_page)
-                        except Exception as e:
-                            # Log but don't fail - just include original page
-                            print(f"Warning: Could not overlay content on page {current_page_num}: {e}")
+            # Create overlays with routes, markers, and conduits for each page,
+            # reusing cached overlays for pages whose drawn content is unchanged
+            overlays = render_page_overlays(render_tasks, workers)
+            if progress is not None:
+                progress(0, len(page_plans))
+            
+            # Draw overlays in page order, all sharing one set of glyph and font resources
+            overlay_sizes = {page_num: overlay_page_size(args) for page_num, args in render_tasks}
+            resources = None
+            for done, (page, current_page_num, rotation) in enumerate(page_plans, 1):
+                page = pdf_writer.add_page(page)
+                overlay = overlays.get(current_page_num)
+                if isinstance(overlay, Exception):
+                    # Log but don't fail - just include original page
+                    print(f"Warning: Could not overlay content on page {current_page_num}: {overlay}")
+                elif overlay is not None:
+                    try:
+                        if resources is None:
+                            resources = overlay_resources(pdf_writer._add_object)
+                        form = overlay_form(overlay, *overlay_sizes[current_page_num], resources)
+                        draw_form_on_page(page, pdf_writer._add_object(form), pdf_writer._add_object)
+                    except Exception as e:
+                        # Log but don't fail - just include original page
+                        print(f"Warning: Could not overlay content on page {current_page_num}: {e}")
                 
                 # Apply user-specified rotation to the page
                 if rotation != 0:
@@ -124,19 +172,113 @@ def overlay_drawings_on_pdf(
                     elif rotation == 270:
                         page.rotate(270)
                 
-                pdf_writer.add_page(page)
+                if progress is not None:
+                    progress(done, len(page_plans))
             
-            # Write result to bytes
-            output = io.BytesIO()
+            # Write result
             pdf_writer.write(output)
-            output.seek(0)
-            return output.getvalue()
+        return True
     
     except Exception as e:
         # If any error, return original PDF
         print(f"Error in PDF overlay: {e}")
+        output.seek(0)
+        output.truncate()
         with open(original_pdf_path, 'rb') as pdf_file:
-            return pdf_file.read()
+            shutil.copyfileobj(pdf_file, output, COPY_CHUNK_SIZE)
+        return False
+
+
+# Lists in all_data that are drawn per page
+PAGE_ITEM_KEYS = ("polylines", "markers", "marker_links", "conduits")
+
+
+def bucket_by_page(all_data: Dict) -> Dict[int, Dict[str, List[Dict]]]:
+    """
+    Group all_data's lists by page_number in one pass over each.
+
+    Returns:
+        page_number -> {key: items on that page} for every key in PAGE_ITEM_KEYS,
+        items in their original order
+    """
+    buckets: Dict[int, Dict[str, List[Dict]]] = {}
+    for key in PAGE_ITEM_KEYS:
+        for item in all_data.get(key, []):
+            page = item.get("page_number")
+            if page not in buckets:
+                buckets[page] = {k: [] for k in PAGE_ITEM_KEYS}
+            buckets[page][key].append(item)
+    return buckets
+
+
+def plan_overlay_pages(
+    pdf_reader: PdfReader,
+    all_data: Dict,
+    single_page: int = None,
+    page_width: float = None,
+    page_height: float = None,
+    page_geometry: Dict[int, Dict] = None,
+):
+    """
+    Work out each page's rotation and the overlay to draw on it.
+
+    Returns:
+        (page_plans, render_tasks): (page, page number, rotation) for every
+        page in order, and (page number, render args) for pages with content
+    """
+    page_plans = []
+    render_tasks = []
+    page_items = bucket_by_page(all_data) if all_data else {}
+    for i in range(len(pdf_reader.pages)):
+        page = pdf_reader.pages[i]
+        current_page_num = i + 1
+        
+        # Get rotation and size, preferring stored page metadata
+        geometry = page_geometry.get(current_page_num) if page_geometry else None
+        if geometry:
+            rotation = geometry["rotation"]
+            media_width = geometry["width"]
+            media_height = geometry["height"]
+        else:
+            rotation = page_rotate_entry(page)
+            media_width = float(page.mediabox.width)
+            media_height = float(page.mediabox.height)
+        print(f"PDF Overlay: Page {current_page_num} mediabox: {media_width} x {media_height}, rotation: {rotation}")
+        page_plans.append((page, current_page_num, rotation))
+        
+        # Determine if we should add overlay to this page
+        should_overlay = (single_page is None) or (current_page_num == single_page)
+        
+        # Data for current page
+        if should_overlay and current_page_num in page_items:
+            items = page_items[current_page_num]
+            page_polylines = items["polylines"]
+            page_markers = items["markers"]
+            page_links = items["marker_links"]
+            page_conduits = items["conduits"]
+            
+            has_content = page_polylines or page_markers or page_conduits
+            
+            if has_content:
+                # Use frontend dimensions if provided, otherwise use PDF mediabox
+                overlay_width = page_width if page_width else media_width
+                overlay_height = page_height if page_height else media_height
+                
+                print(f"PDF Overlay: Page {current_page_num} - Adding {len(page_polylines)} polylines, {len(page_markers)} markers, {len(page_conduits)} conduits")
+                print(f"PDF Overlay: Using dimensions {overlay_width} x {overlay_height}")
+                
+                render_tasks.append((current_page_num, (
+                    overlay_width,
+                    overlay_height,
+                    page_polylines,
+                    page_markers,
+                    page_links,
+                    page_conduits,
+                    rotation,
+                    media_width,
+                    media_height,
+                )))
+    return page_plans, render_tasks
 
 
 def _get_label(index: int) -> str:
@@ -150,7 +292,173 @@ def _get_label(index: int) -> str:
         return first + second
 
 
-def _create_overlay_content(
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """
+    Overlay rendering pool shared by all requests, OVERLAY_RENDER_WORKERS processes.
+
+    Its size never follows a single export; requests limit how many of
+    their pages are in flight instead (see _render_overlays).
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # forkserver: the API process is multi-threaded, which makes plain fork unsafe
+            _render_pool = ProcessPoolExecutor(
+                max_workers=max(settings.OVERLAY_RENDER_WORKERS, 1),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _render_pool
+
+
+def _reset_render_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool; a pool another request has already replaced it with is left alone."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False)
+
+
+def _render_overlay_task(args: tuple) -> bytes:
+    width, height, polylines, markers, links, conduits, rotation, original_width, original_height = args
+    return _create_overlay_stream(
+        width,
+        height,
+        polylines,
+        markers,
+        links,
+        conduits,
+        rotation=rotation,
+        original_width=original_width,
+        original_height=original_height,
+    )
+
+
+def _render_overlays(tasks: List[tuple], workers: int = None) -> Dict[int, object]:
+    """
+    Render (page_number, args) overlay tasks.
+
+    Uses the shared process pool when more than one page has content and
+    more than one worker is configured, with at most `workers` of this
+    request's pages queued at a time; otherwise renders in this process.
+
+    Returns:
+        page_number -> overlay content stream, or the Exception that page raised
+    """
+    if workers is None:
+        workers = settings.OVERLAY_RENDER_WORKERS
+    workers = min(workers, len(tasks))
+
+    results: Dict[int, object] = {}
+    if workers > 1:
+        pool = None
+        in_flight = deque()
+        try:
+            pool = _get_render_pool()
+            for page_num, args in tasks:
+                if len(in_flight) >= workers:
+                    _collect_render(results, *in_flight.popleft())
+                in_flight.append((page_num, pool.submit(_render_overlay_task, args)))
+            while in_flight:
+                _collect_render(results, *in_flight.popleft())
+            return results
+        except Exception as e:
+            print(f"Warning: Parallel overlay rendering failed, rendering serially: {e}")
+            for _, future in in_flight:
+                future.cancel()
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                _reset_render_pool(pool)
+            results = {}
+
+    for page_num, args in tasks:
+        try:
+            results[page_num] = _render_overlay_task(args)
+        except Exception as e:
+            results[page_num] = e
+    return results
+
+
+def _collect_render(results: Dict[int, object], page_num: int, future) -> None:
+    try:
+        results[page_num] = future.result()
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        results[page_num] = e
+
+
+# Bump when _create_overlay_stream output changes so cached overlays are not reused
+OVERLAY_RENDER_VERSION = 3
+
+overlay_cache = DiskLRUCache("overlay_cache", "OVERLAY_CACHE_MAX_BYTES")
+
+
+def _overlay_cache_key(args: tuple) -> str:
+    """SHA-256 of one page's overlay inputs: drawn content, rotation and dimensions."""
+    width, height, polylines, markers, links, conduits, rotation, original_width, original_height = args
+    # The arc-length index is derived from the points, so it is left out of the key
+    polylines = [{k: v for k, v in p.items() if k != "arc_index"} for p in polylines]
+    payload = json.dumps(
+        [OVERLAY_RENDER_VERSION, width, height, polylines, markers, links, conduits, rotation, original_width, original_height],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=repr,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_page_overlays(tasks: List[tuple], workers: int = None) -> Dict[int, object]:
+    """
+    Overlay content stream for each (page number, render args) task,
+    rendering only pages that are not in overlay_cache.
+
+    Returns:
+        Page number -> content stream bytes, or the exception that page raised
+    """
+    results: Dict[int, object] = {}
+    keys = {}
+    pending = []
+    for page_num, args in tasks:
+        keys[page_num] = _overlay_cache_key(args)
+        cached = overlay_cache.get_bytes(keys[page_num])
+        if cached is not None:
+            results[page_num] = cached
+        else:
+            pending.append((page_num, args))
+    print(f"PDF Overlay: {len(tasks) - len(pending)} cached overlays, {len(pending)} to render")
+
+    for page_num, overlay in _render_overlays(pending, workers).items():
+        results[page_num] = overlay
+        if isinstance(overlay, bytes):
+            overlay_cache.put_bytes(keys[page_num], overlay)
+    return results
+
+
+def _overlay_canvas_size(width: float, height: float, rotation: int = 0, original_width: float = None, original_height: float = None):
+    """
+    Size of the overlay drawing.
+
+    For rotated PDFs the overlay is drawn in the ORIGINAL (unrotated) space,
+    because the page rotation is applied to it along with the page.
+    """
+    if original_width and original_height and rotation in [90, 270]:
+        # Use original unrotated dimensions
+        return original_width, original_height
+    return width, height
+
+
+def overlay_page_size(args: tuple):
+    """Overlay drawing size for a render task's args, as drawn by _draw_overlay."""
+    width, height, polylines, markers, links, conduits, rotation, original_width, original_height = args
+    return _overlay_canvas_size(width, height, rotation, original_width, original_height)
+
+
+def _draw_overlay(
+    c,
     width: float,
     height: float,
     polylines: List[Dict],
@@ -160,266 +468,226 @@ def _create_overlay_content(
     rotation: int = 0,
     original_width: float = None,
     original_height: float = None,
-) -> bytes:
+) -> None:
     """
-    Create a PDF overlay with routes, markers, and conduits.
-    
-    Args:
-        width: Rendered page width (after rotation) - coordinates are in this space
-        height: Rendered page height (after rotation) - coordinates are in this space
-        rotation: PDF rotation in degrees (0, 90, 180, 270)
-        original_width: Original PDF page width (before rotation)
-        original_height: Original PDF page height (before rotation)
+    Draw routes, markers, and conduits on a reportlab Canvas or a ContentStreamCanvas.
+
+    Takes the same arguments as _create_overlay_content after the canvas.
     """
-    pdf_buffer = io.BytesIO()
-    
-    # For rotated PDFs, we need to create overlay in the ORIGINAL (unrotated) space
-    # because pypdf will apply rotation when merging
-    if original_width and original_height and rotation in [90, 270]:
-        # Use original unrotated dimensions
-        canvas_width = original_width
-        canvas_height = original_height
-    else:
-        canvas_width = width
-        canvas_height = height
+    canvas_width, canvas_height = _overlay_canvas_size(width, height, rotation, original_width, original_height)
     
     print(f"PDF Overlay: Creating overlay canvas {canvas_width} x {canvas_height} (rotation: {rotation})")
     print(f"PDF Overlay: Frontend sent dimensions {width} x {height}")
     if markers:
         print(f"PDF Overlay: First marker at ({markers[0].get('x')}, {markers[0].get('y')}) in rotated space")
     
-    try:
-        c = canvas.Canvas(pdf_buffer, pagesize=(canvas_width, canvas_height))
-        c.setFillAlpha(1.0)
-        
-        # Helper function to transform coordinates
-        def transform_point(x, y):
-            """
-            Transform coordinates from frontend rotated view space to original PDF space.
-            Frontend coordinates are in the rotated viewport (what user sees after browser rotation).
-            We need to reverse the rotation to get back to original PDF coordinates.
-            """
-            if rotation == 0:
-                # No rotation: simple Y flip for bottom-left origin
+    # Helper function to transform coordinates
+    def transform_point(x, y):
+        """
+        Transform coordinates from frontend rotated view space to original PDF space.
+        Frontend coordinates are in the rotated viewport (what user sees after browser rotation).
+        We need to reverse the rotation to get back to original PDF coordinates.
+        """
+        if rotation == 0:
+            # No rotation: simple Y flip for bottom-left origin
+            return x, canvas_height - y
+        elif rotation == 270:
+            # Frontend rotated view: W=2592, H=1728
+            # Original PDF: W=1728, H=2592
+            if width == canvas_width and height == canvas_height:
                 return x, canvas_height - y
-            elif rotation == 270:
-                # Frontend rotated view: W=2592, H=1728
-                # Original PDF: W=1728, H=2592
-                if width == canvas_width and height == canvas_height:
-                    return x, canvas_height - y
-                else:
-                    # Reverse 270° rotation and flip vertically
-                    new_x = height - y  # height = 1728
-                    new_y = canvas_height - x  # canvas_height = 2592
-                    return new_x, new_y
-            elif rotation == 90:
-                # Frontend view is rotated 90° CW from original
-                # To reverse: apply 270° CW
-                new_x = y  
-                new_y = width - x
-                return new_x, new_y
-            elif rotation == 180:
-                # Reverse 180° rotation
-                return canvas_width - x, canvas_height - y
             else:
-                # Default: no rotation
-                return x, canvas_height - y
-        
-        # DRAWING ORDER: Back to front
-        # 1. Draw handholes first (bottom layer - everything appears on top)
-        if markers:
-            handholes = [m for m in markers if m.get("type") == "handhole"]
-            for marker in handholes:
-                x, y = transform_point(marker.get("x", 0), marker.get("y", 0))
-                size = 14
-                # Outer purple square
-                c.setFillColor("#a855f7", 1)  # Purple
-                c.rect(x - size, y - size, size * 2, size * 2, fill=1, stroke=0)
-                # White border
-                c.setStrokeColor("#ffffff", 1)
+                # Reverse 270° rotation and flip vertically
+                new_x = height - y  # height = 1728
+                new_y = canvas_height - x  # canvas_height = 2592
+                return new_x, new_y
+        elif rotation == 90:
+            # Frontend view is rotated 90° CW from original
+            # To reverse: apply 270° CW
+            new_x = y  
+            new_y = width - x
+            return new_x, new_y
+        elif rotation == 180:
+            # Reverse 180° rotation
+            return canvas_width - x, canvas_height - y
+        else:
+            # Default: no rotation
+            return x, canvas_height - y
+    
+    # Conduits and marker links refer to markers by id; the first marker with an id wins
+    markers_by_id = {}
+    for marker in markers or []:
+        markers_by_id.setdefault(marker.get("id"), marker)
+    
+    # DRAWING ORDER: Back to front
+    # 1. Draw handholes first (bottom layer - everything appears on top)
+    if markers:
+        handholes = [m for m in markers if m.get("type") == "handhole"]
+        for marker in handholes:
+            x, y = transform_point(marker.get("x", 0), marker.get("y", 0))
+            draw_glyph(c, "handhole", x, y)
+    
+    # 2. Draw polylines (fiber routes and conduit polylines)
+    if polylines:
+        print(f"PDF Overlay: Drawing {len(polylines)} polylines")
+        for idx, polyline in enumerate(polylines):
+            points = polyline.get("points", [])
+            polyline_type = polyline.get("type", "fiber")
+            print(f"  Polyline {idx}: type={polyline_type}, points={len(points)}")
+            
+            # Set color and width based on type
+            if polyline_type == "conduit":
+                c.setStrokeColor("#9333ea", 1)  # Purple for conduits
                 c.setLineWidth(2)
-                c.rect(x - size, y - size, size * 2, size * 2, fill=0, stroke=1)
-                # Hollow center (white square inside)
-                inner_size = 6
-                c.setFillColor("#ffffff", 1)
-                c.rect(x - inner_size, y - inner_size, inner_size * 2, inner_size * 2, fill=1, stroke=0)
-        
-        # 2. Draw polylines (fiber routes and conduit polylines)
-        if polylines:
-            print(f"PDF Overlay: Drawing {len(polylines)} polylines")
-            for idx, polyline in enumerate(polylines):
-                points = polyline.get("points", [])
-                polyline_type = polyline.get("type", "fiber")
-                print(f"  Polyline {idx}: type={polyline_type}, points={len(points)}")
-                
-                # Set color and width based on type
-                if polyline_type == "conduit":
-                    c.setStrokeColor("#9333ea", 1)  # Purple for conduits
-                    c.setLineWidth(2)
-                else:
-                    c.setStrokeColor("#22c55e", 1)  # Green for fiber cables
-                    c.setLineWidth(4)  # Thicker for better visibility
-                
-                if len(points) >= 2:
-                    for i in range(len(points) - 1):
-                        p1 = points[i]
-                        p2 = points[i + 1]
-                        
-                        x1, y1 = transform_point(p1.get("x", 0), p1.get("y", 0))
-                        x2, y2 = transform_point(p2.get("x", 0), p2.get("y", 0))
-                        
-                        c.line(x1, y1, x2, y2)
-                
-                # Add labels for fiber routes (not conduits) at 25% and 75% points
-                # Skip labeling for very short polylines (likely conduits) or explicit conduit type
-                if polyline_type != "conduit" and len(points) >= 2:
-                    # Calculate total route length
-                    segment_lengths = []
-                    total_length = 0
-                    for i in range(len(points) - 1):
-                        dx = points[i + 1].get("x", 0) - points[i].get("x", 0)
-                        dy = points[i + 1].get("y", 0) - points[i].get("y", 0)
-                        seg_length = (dx * dx + dy * dy) ** 0.5
-                        segment_lengths.append(seg_length)
-                        total_length += seg_length
+            else:
+                c.setStrokeColor("#22c55e", 1)  # Green for fiber cables
+                c.setLineWidth(4)  # Thicker for better visibility
+            
+            if len(points) >= 2:
+                for i in range(len(points) - 1):
+                    p1 = points[i]
+                    p2 = points[i + 1]
                     
-                    # Only label routes longer than 150 pixels (skip short conduit-like polylines)
-                    if total_length >= 150:
-                        # Use global cable number if provided, otherwise count locally
-                        fiber_count = polyline.get("global_index")
-                        if fiber_count is None:
-                            # Fallback: count which fiber route this is (skip conduits in numbering)
-                            fiber_count = sum(1 for p in polylines[:idx+1] if p.get("type", "fiber") != "conduit")
-                        
-                        # For short routes (< 300 pixels), use single label at midpoint
-                        # For longer routes, use labels at 25% and 75%
-                        positions = [0.5] if total_length < 300 else [0.25, 0.75]
-                        
-                        for position in positions:
-                            target_dist = total_length * position
-                            
-                            # Find which segment contains this distance
-                            accumulated_dist = 0
-                            segment_idx = 0
-                            local_t = 0
-                            
-                            for i in range(len(segment_lengths)):
-                                if accumulated_dist + segment_lengths[i] >= target_dist:
-                                    segment_idx = i
-                                    local_t = (target_dist - accumulated_dist) / segment_lengths[i] if segment_lengths[i] > 0 else 0
-                                    break
-                                accumulated_dist += segment_lengths[i]
-                            
-                            # Interpolate position along the segment
-                            point = points[segment_idx]
-                            next_point = points[segment_idx + 1]
-                            x = point.get("x", 0) + (next_point.get("x", 0) - point.get("x", 0)) * local_t
-                            y = point.get("y", 0) + (next_point.get("y", 0) - point.get("y", 0)) * local_t
-                            label_x, label_y = transform_point(x, y)
-                            
-                            # Draw label background circle
-                            c.setFillColor("#22c55e", 1)  # Green
-                            c.setStrokeColor("#ffffff", 1)
-                            c.setLineWidth(2)
-                            c.circle(label_x, label_y, 12, fill=1, stroke=1)
-                            
-                            # Draw label number
-                            c.setFillColor("#ffffff", 1)
-                            c.setFont("Helvetica-Bold", 11)
-                            c.drawCentredString(label_x, label_y - 2, str(fiber_count))
-        
-        # 3. Draw conduits (drop conduit connections)
-        if conduits and markers:
-            for conduit in conduits:
-                term_marker = next((m for m in markers if m.get("id") == conduit.get("terminalId")), None)
-                drop_marker = next((m for m in markers if m.get("id") == conduit.get("dropPedId")), None)
-                
-                if term_marker and drop_marker:
-                    from_x, from_y = transform_point(term_marker.get("x", 0), term_marker.get("y", 0))
-                    to_x, to_y = transform_point(drop_marker.get("x", 0), drop_marker.get("y", 0))
+                    x1, y1 = transform_point(p1.get("x", 0), p1.get("y", 0))
+                    x2, y2 = transform_point(p2.get("x", 0), p2.get("y", 0))
                     
-                    # Draw solid conduit line in purple
-                    c.setStrokeColor("#9333ea", 1)  # Purple
-                    c.setLineWidth(3)
-                    c.line(from_x, from_y, to_x, to_y)
-        
-        # 4. Draw marker assignment arrows
-        if marker_links and markers:
-            for link in marker_links:
-                marker = next((m for m in markers if m.get("id") == link.get("markerId")), None)
-                if marker:
-                    from_x, from_y = transform_point(marker.get("x", 0), marker.get("y", 0))
-                    to_x, to_y = transform_point(link.get("to", {}).get("x", 0), link.get("to", {}).get("y", 0))
+                    c.line(x1, y1, x2, y2)
+            
+            # Add labels for fiber routes (not conduits) at 25% and 75% points
+            # Skip labeling for very short polylines (likely conduits) or explicit conduit type
+            if polyline_type != "conduit" and len(points) >= 2:
+                # Reuse the route's arc-length index when the caller loaded one
+                arc_index = polyline.get("arc_index") or ArcLengthIndex.from_points(points)
+                total_length = arc_index.total_length
+                
+                # Only label routes longer than 150 pixels (skip short conduit-like polylines)
+                if total_length >= 150:
+                    # Use global cable number if provided, otherwise count locally
+                    fiber_count = polyline.get("global_index")
+                    if fiber_count is None:
+                        # Fallback: count which fiber route this is (skip conduits in numbering)
+                        fiber_count = sum(1 for p in polylines[:idx+1] if p.get("type", "fiber") != "conduit")
                     
-                    # Draw arrow line
-                    c.setStrokeColor("#0f172a", 1)  # Dark
-                    c.setLineWidth(2)
-                    c.line(from_x, from_y, to_x, to_y)
+                    # For short routes (< 300 pixels), use single label at midpoint
+                    # For longer routes, use labels at 25% and 75%
+                    positions = [0.5] if total_length < 300 else [0.25, 0.75]
                     
-                    # Draw arrowhead
-                    dx = to_x - from_x
-                    dy = to_y - from_y
-                    angle = math.atan2(dy, dx)
-                    headlen = 12
+                    label_points = [transform_point(*arc_index.point_at_fraction(position)) for position in positions]
                     
-                    c.setFillColor("#0f172a", 1)
-                    path = c.beginPath()
-                    path.moveTo(to_x, to_y)
-                    path.lineTo(
-                        to_x - headlen * math.cos(angle - math.pi / 6),
-                        to_y - headlen * math.sin(angle - math.pi / 6)
-                    )
-                    path.lineTo(
-                        to_x - headlen * math.cos(angle + math.pi / 6),
-                        to_y - headlen * math.sin(angle + math.pi / 6)
-                    )
-                    path.close()
-                    c.drawPath(path, fill=1, stroke=0)
-        
-        # 5. Draw terminals and drops LAST (on top of everything) with labels
-        if markers:
-            # Separate markers by type for proper indexing
-            terminals = [m for m in markers if m.get("type") == "terminal"]
-            drops = [m for m in markers if m.get("type") == "dropPed"]
+                    # Draw label background circles, then the numbers on top
+                    for label_x, label_y in label_points:
+                        draw_glyph(c, "route_label", label_x, label_y)
+                    c.setFillColor("#ffffff", 1)
+                    c.setFont("Helvetica-Bold", 11)
+                    for label_x, label_y in label_points:
+                        c.drawCentredString(label_x, label_y - 2, str(fiber_count))
+    
+    # 3. Draw conduits (drop conduit connections)
+    if conduits and markers:
+        for conduit in conduits:
+            term_marker = markers_by_id.get(conduit.get("terminalId"))
+            drop_marker = markers_by_id.get(conduit.get("dropPedId"))
             
-            # Draw terminals with labels inside
-            for idx, marker in enumerate(terminals):
-                x, y = transform_point(marker.get("x", 0), marker.get("y", 0))
-                # Larger green triangle to fit letter inside (25% bigger: 24 * 1.25 = 30)
-                size = 30
-                h = size * math.sqrt(3) / 2
-                c.setFillColor("#10b981", 1)  # Green
-                c.setStrokeColor("#ffffff", 1)
-                c.setLineWidth(2)
-                path = c.beginPath()
-                path.moveTo(x, y + h / 2)
-                path.lineTo(x - size / 2, y - h / 2)
-                path.lineTo(x + size / 2, y - h / 2)
-                path.close()
-                c.drawPath(path, fill=1, stroke=1)
+            if term_marker and drop_marker:
+                from_x, from_y = transform_point(term_marker.get("x", 0), term_marker.get("y", 0))
+                to_x, to_y = transform_point(drop_marker.get("x", 0), drop_marker.get("y", 0))
                 
-                # Draw white label inside the triangle
-                label = _get_label(idx)
-                c.setFillColor("#ffffff", 1)
-                c.setFont("Helvetica-Bold", 13)
-                c.drawCentredString(x, y - 4, label)
-            
-            # Draw drops with labels
-            for idx, marker in enumerate(drops):
-                x, y = transform_point(marker.get("x", 0), marker.get("y", 0))
-                # Purple circle
-                radius = 12
-                c.setFillColor("#a855f7", 1)  # Purple
-                c.setStrokeColor("#ffffff", 1)
+                # Draw solid conduit line in purple
+                c.setStrokeColor("#9333ea", 1)  # Purple
+                c.setLineWidth(3)
+                c.line(from_x, from_y, to_x, to_y)
+    
+    # 4. Draw marker assignment arrows
+    if marker_links and markers:
+        for link in marker_links:
+            marker = markers_by_id.get(link.get("markerId"))
+            if marker:
+                from_x, from_y = transform_point(marker.get("x", 0), marker.get("y", 0))
+                to_x, to_y = transform_point(link.get("to", {}).get("x", 0), link.get("to", {}).get("y", 0))
+                
+                # Draw arrow line
+                c.setStrokeColor("#0f172a", 1)  # Dark
                 c.setLineWidth(2)
-                c.circle(x, y, radius, fill=1, stroke=1)
+                c.line(from_x, from_y, to_x, to_y)
                 
-                # Draw white label inside the circle
-                label = _get_label(idx)
-                c.setFillColor("#ffffff", 1)
-                c.setFont("Helvetica-Bold", 10)
-                c.drawCentredString(x, y - 3, label)
+                # Draw arrowhead
+                dx = to_x - from_x
+                dy = to_y - from_y
+                angle = math.atan2(dy, dx)
+                headlen = 12
+                
+                c.setFillColor("#0f172a", 1)
+                path = c.beginPath()
+                path.moveTo(to_x, to_y)
+                path.lineTo(
+                    to_x - headlen * math.cos(angle - math.pi / 6),
+                    to_y - headlen * math.sin(angle - math.pi / 6)
+                )
+                path.lineTo(
+                    to_x - headlen * math.cos(angle + math.pi / 6),
+                    to_y - headlen * math.sin(angle + math.pi / 6)
+                )
+                path.close()
+                c.drawPath(path, fill=1, stroke=0)
+    
+    # 5. Draw terminals and drops LAST (on top of everything) with labels
+    if markers:
+        # Separate markers by type for proper indexing
+        terminals = [m for m in markers if m.get("type") == "terminal"]
+        drops = [m for m in markers if m.get("type") == "dropPed"]
         
+        # Draw terminals, then white labels inside the triangles on top
+        terminal_points = [transform_point(m.get("x", 0), m.get("y", 0)) for m in terminals]
+        for x, y in terminal_points:
+            draw_glyph(c, "terminal", x, y)
+        c.setFillColor("#ffffff", 1)
+        c.setFont("Helvetica-Bold", 13)
+        for idx, (x, y) in enumerate(terminal_points):
+            c.drawCentredString(x, y - 4, _get_label(idx))
+        
+        # Draw drops, then white labels inside the circles on top
+        drop_points = [transform_point(m.get("x", 0), m.get("y", 0)) for m in drops]
+        for x, y in drop_points:
+            draw_glyph(c, "drop", x, y)
+        c.setFillColor("#ffffff", 1)
+        c.setFont("Helvetica-Bold", 10)
+        for idx, (x, y) in enumerate(drop_points):
+            c.drawCentredString(x, y - 3, _get_label(idx))
+
+
+def _create_overlay_content(
+    width: float,
+    height: float,
+    polylines: List[Dict],
+    markers: List[Dict],
+    marker_links: List[Dict],
+    conduits: List[Dict],
+    rotation: int = 0,
+    original_width: float = None,
+    original_height: float = None,
+) -> bytes:
+    """
+    Create a PDF overlay with routes, markers, and conduits using reportlab.
+
+    Exports draw with _create_overlay_stream instead; this is kept as the
+    reference rendering for comparisons and benchmarks.
+    
+    Args:
+        width: Rendered page width (after rotation) - coordinates are in this space
+        height: Rendered page height (after rotation) - coordinates are in this space
+        rotation: PDF rotation in degrees (0, 90, 180, 270)
+        original_width: Original PDF page width (before rotation)
+        original_height: Original PDF page height (before rotation)
+    """
+    pdf_buffer = io.BytesIO()
+    
+    try:
+        c = canvas.Canvas(
+            pdf_buffer,
+            pagesize=_overlay_canvas_size(width, height, rotation, original_width, original_height),
+        )
+        c.setFillAlpha(1.0)
+        _draw_overlay(c, width, height, polylines, markers, marker_links, conduits, rotation, original_width, original_height)
         c.save()
         pdf_buffer.seek(0)
         return pdf_buffer.getvalue()
@@ -431,3 +699,24 @@ def _create_overlay_content(
         c = canvas.Canvas(pdf_buffer, pagesize=(612, 792))
         c.save()
         pdf_buffer.seek(0)
+
+
+def _create_overlay_stream(
+    width: float,
+    height: float,
+    polylines: List[Dict],
+    markers: List[Dict],
+    marker_links: List[Dict],
+    conduits: List[Dict],
+    rotation: int = 0,
+    original_width: float = None,
+    original_height: float = None,
+) -> bytes:
+    """
+    Overlay content stream with routes, markers, and conduits, for overlay_form().
+
+    Same arguments and drawing as _create_overlay_content, without building a PDF.
+    """
+    c = ContentStreamCanvas(_overlay_canvas_size(width, height, rotation, original_width, original_height))
+    _draw_overlay(c, width, height, polylines, markers, marker_links, conduits, rotation, original_width, original_height)
+    return c.getvalue()
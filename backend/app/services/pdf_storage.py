@@ -0,0 +1,272 @@
+"""
+PDF storage service - content-addressed, de-duplicated plat storage under UPLOAD_DIR.
+
+Uploads are hashed with SHA-256 while they are written to disk and kept once
+per distinct content at objects/<aa>/<sha256>.pdf. Projects reference the
+stored file through a PdfBlob row whose ref_count tracks how many projects
+use it; the file is removed when the last reference is released. Taking or
+releasing a reference together with writing or removing the file happens
+under blob_lock(), so workers never remove a file another has just adopted.
+"""
+import fcntl
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Optional
+
+from app.config import settings
+
+# Copy buffer for streaming uploads to disk
+CHUNK_SIZE = 1024 * 1024
+
+# Readers accept the header anywhere in the first 1 KB and %%EOF in the last 1 KB
+PDF_HEADER = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+PDF_TRAILER = b"%%EOF"
+PDF_TRAILER_WINDOW = 1024
+
+# Lock files shared by all content hashes; a hash uses the stripe of its first byte
+BLOB_LOCK_STRIPES = 256
+
+
+def blob_path(sha256: str) -> str:
+    """Absolute path of the stored file for a content hash."""
+    return os.path.join(settings.UPLOAD_DIR, "objects", sha256[:2], f"{sha256}.pdf")
+
+
+def compacted_blob_path(sha256: str) -> str:
+    """Path of the compacted copy written at ingest when PDF_COMPACT_ON_INGEST is on."""
+    return os.path.join(settings.UPLOAD_DIR, "objects", sha256[:2], f"{sha256}.compact.pdf")
+
+
+@contextmanager
+def blob_lock(sha256: str) -> Iterator[None]:
+    """
+    Exclusive lock on one stored PDF, held across processes sharing UPLOAD_DIR.
+
+    Hold it from taking or releasing a reference until the file has been
+    written or removed and the transaction has committed.
+    """
+    lock_dir = os.path.join(settings.UPLOAD_DIR, "locks", "blobs")
+    os.makedirs(lock_dir, exist_ok=True)
+    stripe = int(sha256[:2], 16) % BLOB_LOCK_STRIPES
+    with open(os.path.join(lock_dir, f"{stripe:02x}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def project_pdf_path(project) -> str:
+    """
+    Absolute path of the PDF to serve and render for a project.
+
+    The compacted copy is preferred when one exists; the original upload is
+    always kept beside it as the fallback. Projects created before
+    content-addressed storage keep their file at UPLOAD_DIR/<pdf_filename>.
+    """
+    if project.pdf_sha256:
+        compacted = compacted_blob_path(project.pdf_sha256)
+        if os.path.exists(compacted):
+            return compacted
+        return blob_path(project.pdf_sha256)
+    return os.path.join(settings.UPLOAD_DIR, project.pdf_filename)
+
+
+def project_pdf_tag(project) -> Optional[str]:
+    """Content tag of the file project_pdf_path() serves, for ETags; None for legacy uploads."""
+    if not project.pdf_sha256:
+        return None
+    if os.path.exists(compacted_blob_path(project.pdf_sha256)):
+        return f"{project.pdf_sha256}-compact"
+    return project.pdf_sha256
+
+
+class UploadRejected(ValueError):
+    """An upload failed a streaming check; status_code is the HTTP status to report."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def write_upload(
+    fileobj: BinaryIO,
+    suffix: str = ".pdf",
+    max_size: Optional[int] = None,
+) -> Dict:
+    """
+    Stream an upload to a temporary file in UPLOAD_DIR, hashing it on the way.
+
+    The size limit and the %PDF- header are enforced while bytes are copied,
+    and the %%EOF trailer is checked from the last chunk, so a wrong or
+    oversized file is rejected without a parse. The temp file is removed on
+    any failure.
+
+    Args:
+        fileobj: Readable binary file object
+        suffix: Extension for the temp file
+        max_size: Reject uploads larger than this many bytes
+
+    Returns:
+        {"path", "sha256", "size_bytes", "elapsed_s", "throughput_mb_s"}
+
+    Raises:
+        UploadRejected: size limit exceeded (413) or not a PDF (400)
+    """
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    temp_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{suffix}")
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    tail = b""
+    started = time.perf_counter()
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadRejected(f"File exceeds maximum upload size of {max_size} bytes", 413)
+                if len(head) < PDF_HEADER_WINDOW:
+                    head += chunk[:PDF_HEADER_WINDOW - len(head)]
+                    if len(head) == PDF_HEADER_WINDOW and PDF_HEADER not in head:
+                        raise UploadRejected("File is not a PDF (missing %PDF- header)")
+                tail = (tail + chunk)[-PDF_TRAILER_WINDOW:]
+                digest.update(chunk)
+                f.write(chunk)
+        if PDF_HEADER not in head:
+            raise UploadRejected("File is not a PDF (missing %PDF- header)")
+        if PDF_TRAILER not in tail:
+            raise UploadRejected("File is truncated (missing %%EOF trailer)")
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    elapsed = time.perf_counter() - started
+    throughput = size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    print(f"Upload: {size} bytes in {elapsed:.3f}s ({throughput:.1f} MB/s)")
+    return {
+        "path": temp_path,
+        "sha256": digest.hexdigest(),
+        "size_bytes": size,
+        "elapsed_s": elapsed,
+        "throughput_mb_s": throughput,
+    }
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 hex digest of a file on disk."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def commit_blob_file(temp_path: str, sha256: str) -> str:
+    """
+    Move a validated temp file to its content address.
+
+    If the content is already stored the temp file is discarded instead.
+
+    Returns:
+        The content-addressed path
+    """
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return path
+
+
+def acquire_blob(db, sha256: str, size_bytes: int, page_count: int, compacted_size_bytes: Optional[int] = None):
+    """
+    Add a project reference to the PdfBlob for `sha256`, creating it if needed.
+
+    Call under blob_lock(sha256); the caller commits.
+    """
+    from app.models.database import PdfBlob
+
+    blob = db.query(PdfBlob).filter(PdfBlob.sha256 == sha256).with_for_update().first()
+    if blob is None:
+        blob = PdfBlob(
+            sha256=sha256,
+            size_bytes=size_bytes,
+            compacted_size_bytes=compacted_size_bytes,
+            page_count=page_count,
+            ref_count=0,
+        )
+        db.add(blob)
+    blob.ref_count += 1
+    return blob
+
+
+def release_blob(db, sha256: str) -> bool:
+    """
+    Drop one project reference to a stored PDF.
+
+    When no references remain the row is deleted; the caller removes the
+    files with remove_blob_files(sha256) once its transaction has committed,
+    all under blob_lock(sha256).
+
+    Returns:
+        True if this was the last reference
+    """
+    from app.models.database import PdfBlob
+
+    blob = db.query(PdfBlob).filter(PdfBlob.sha256 == sha256).with_for_update().first()
+    if blob is None:
+        return False
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return False
+    db.delete(blob)
+    return True
+
+
+def remove_blob_files(sha256: str) -> None:
+    """Delete the stored original and any compacted copy of a released blob."""
+    for path in (blob_path(sha256), compacted_blob_path(sha256)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def adopt_legacy_pdf(db, project) -> Optional[str]:
+    """
+    Move a project's pre-content-addressed upload into blob storage.
+
+    The legacy UPLOAD_DIR/<pdf_filename> file is hashed, moved (or, if the
+    content is already stored, deleted) and referenced through a PdfBlob
+    row, and the hash is recorded on the project, so it is computed once.
+    Commits.
+
+    Returns:
+        The project's content hash, or None when it has no file to adopt
+    """
+    if project.pdf_sha256:
+        return project.pdf_sha256
+    path = project_pdf_path(project)
+    if not os.path.exists(path):
+        return None
+    sha256 = hash_file(path)
+    with blob_lock(sha256):
+        # Another request may have adopted it while this one was hashing
+        db.refresh(project)
+        if project.pdf_sha256:
+            return project.pdf_sha256
+        if not os.path.exists(path):
+            return None
+        acquire_blob(db, sha256, os.path.getsize(path), project.page_count)
+        commit_blob_file(path, sha256)
+        project.pdf_sha256 = sha256
+        db.commit()
+    return sha256
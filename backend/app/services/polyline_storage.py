@@ -0,0 +1,88 @@
+"""
+Polyline point storage - reads and writes Polyline points as JSON or packed blobs.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+from app.config import settings
+from app.services.geometry import (
+    ArcLengthIndex,
+    coords_to_points,
+    decode_points_blob,
+    encode_points_blob,
+    pack_polylines,
+)
+
+# Bytes per vertex in a packed blob (x and y as little-endian float64)
+POINT_BLOB_STRIDE = 16
+
+
+def store_points(polyline, points: List[Dict]) -> None:
+    """
+    Store points on a Polyline row using the configured POLYLINE_POINTS_FORMAT.
+
+    Args:
+        polyline: Polyline model instance
+        points: List of dictionaries with 'x' and 'y' keys
+    """
+    polyline.point_count = len(points)
+    if settings.POLYLINE_POINTS_FORMAT == "packed":
+        polyline.points_packed = encode_points_blob(points)
+        polyline.arc_lengths_packed = ArcLengthIndex(decode_points_blob(polyline.points_packed)).to_blob()
+        polyline.points = None
+    else:
+        polyline.points = points
+        polyline.points_packed = None
+        polyline.arc_lengths_packed = None
+
+
+def load_coords(polyline) -> Sequence[float]:
+    """
+    Get a polyline's points as interleaved [x0, y0, x1, y1, ...] values.
+
+    Packed rows are decoded zero-copy; JSON rows are packed on the fly.
+    Works with Polyline instances and with query rows that select the
+    points and points_packed columns.
+    """
+    if polyline.points_packed is not None:
+        return decode_points_blob(polyline.points_packed)
+    coords, _ = pack_polylines([polyline.points or []])
+    return coords
+
+
+def pack_stored_polylines(polylines) -> Tuple[Sequence[float], List[int]]:
+    """
+    Pack many stored polylines into one coordinate buffer for batch geometry.
+
+    Packed blobs are concatenated as-is and decoded once, so packed rows are
+    never expanded into Python dicts.
+
+    Returns:
+        (coords, offsets) as accepted by batch_polyline_lengths_pdf_units
+    """
+    blobs = []
+    offsets = [0]
+    for polyline in polylines:
+        blob = polyline.points_packed
+        if blob is None:
+            blob = encode_points_blob(polyline.points or [])
+        blobs.append(blob)
+        offsets.append(offsets[-1] + len(blob) // POINT_BLOB_STRIDE)
+    return decode_points_blob(b"".join(blobs)), offsets
+
+
+def load_points(polyline) -> List[Dict]:
+    """Get a polyline's points as [{x, y}, ...] regardless of storage format."""
+    if polyline.points_packed is not None:
+        return coords_to_points(decode_points_blob(polyline.points_packed))
+    return polyline.points or []
+
+
+def load_arc_index(polyline) -> ArcLengthIndex:
+    """
+    Get a polyline's arc-length index, using the persisted one when present.
+    """
+    coords = load_coords(polyline)
+    blob = polyline.arc_lengths_packed
+    if blob is not None and len(blob) == len(coords) * 4:
+        return ArcLengthIndex.from_blob(coords, blob)
+    return ArcLengthIndex(coords)
@@ -0,0 +1,45 @@
+"""
+Project revisions - a counter bumped by every write to a project's content.
+
+Project.revision increases with each committed change to a project's details,
+polylines, markers, marker links, conduits, scale calibrations or cable
+configuration, so revision_tag() names one state of the project for caches
+and ETags. Routes call bump_revision() in the transaction that makes the
+change.
+"""
+from sqlalchemy import func, update
+
+
+def bump_revision(db, project_id: int) -> None:
+    """
+    Count a change to a project; call before committing the change.
+
+    The increment runs in the database as part of the same transaction, so
+    concurrent writes to one project always end on distinct revisions.
+    Project rows already loaded in the session see the new value once the
+    commit expires them.
+    """
+    from app.models.database import Project
+
+    db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(revision=func.coalesce(Project.revision, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def project_revision(project) -> int:
+    """Current revision of a loaded project; projects from before revisions start at 0."""
+    return project.revision or 0
+
+
+def revision_tag(project) -> str:
+    """
+    Identifies the project's current state across its lifetime.
+
+    SQLite can hand a deleted project's id to a new project, which starts
+    again at revision 0, so the creation time is part of the tag.
+    """
+    created = project.created_at.isoformat() if project.created_at else ""
+    return f"{project.id}-{created}-{project_revision(project)}"
@@ -0,0 +1,184 @@
+"""
+Project snapshot - everything the editor needs to open a project, in one response.
+
+The editor used to fetch the project, markers, polylines, calibrations,
+conduits, marker links, assignments and cable configuration separately,
+each request looking the project up again. load_project_snapshot reads
+them with a fixed number of queries however large the project is: one per
+table, with the cable configuration's children loaded by selectinload.
+Assignments are marker links, so they are sent once, as marker_links.
+
+The ETag is derived from the project's revision, so a client revalidating
+an unchanged project gets a 304 after a single query.
+"""
+import gzip
+from typing import Mapping
+
+from sqlalchemy.orm import selectinload
+from starlette.responses import Response
+
+from app.services.file_delivery import CACHE_CONTROL, etag_matches
+from app.services.project_revision import project_revision, revision_tag
+
+# Bump when the snapshot document changes shape so clients refetch it
+SNAPSHOT_VERSION = 1
+
+# Bodies smaller than this are sent uncompressed
+SNAPSHOT_GZIP_MIN_BYTES = 1024
+
+
+def snapshot_etag(project) -> str:
+    # Weak: the same snapshot is sent gzip-encoded or not
+    return f'W/"snapshot-{SNAPSHOT_VERSION}-{revision_tag(project)}"'
+
+
+def load_project_snapshot(db, project):
+    """
+    Read a project's pages, calibrations, drawn content and cable configuration.
+
+    Returns:
+        ProjectSnapshot
+    """
+    from app.models.cable_config import CableConfig, CableConfiguration
+    from app.models.database import Conduit, Marker, MarkerLink, PdfBlob, Polyline, ScaleCalibration
+    from app.models.schemas import (
+        ConduitResponse,
+        MarkerLinkResponse,
+        MarkerResponse,
+        PolylineResponse,
+        ProjectPageResponse,
+        ProjectResponse,
+        ProjectSnapshot,
+        ScaleCalibrationResponse,
+    )
+    from app.models.cable_schemas import CableConfigurationResponse
+    from app.services.page_metadata import load_project_pages
+    from app.services.polyline_storage import load_points
+
+    project_id = project.id
+    blob = db.query(PdfBlob).filter(PdfBlob.sha256 == project.pdf_sha256).first() if project.pdf_sha256 else None
+    pages = load_project_pages(db, project)
+    calibrations = db.query(ScaleCalibration).filter(
+        ScaleCalibration.project_id == project_id
+    ).order_by(ScaleCalibration.id).all()
+    polylines = db.query(Polyline).filter(Polyline.project_id == project_id).order_by(Polyline.id).all()
+    markers = db.query(Marker).filter(Marker.project_id == project_id).order_by(Marker.id).all()
+    links = db.query(MarkerLink).join(Marker).filter(Marker.project_id == project_id).order_by(MarkerLink.id).all()
+    conduits = db.query(Conduit).filter(
+        Conduit.project_id == project_id,
+        Conduit.terminal_id.isnot(None),
+        Conduit.drop_ped_id.isnot(None),
+    ).order_by(Conduit.id).all()
+    config = db.query(CableConfiguration).options(
+        selectinload(CableConfiguration.terminals),
+        selectinload(CableConfiguration.cables).selectinload(CableConfig.terminal_assignments),
+        selectinload(CableConfiguration.teathers),
+    ).filter(CableConfiguration.project_id == project_id).first()
+
+    return ProjectSnapshot(
+        revision=project_revision(project),
+        project=ProjectResponse(
+            id=project.id,
+            name=project.name,
+            description=project.description,
+            project_number=project.project_number,
+            devlog_number=project.devlog_number,
+            pon_cable_name=project.pon_cable_name,
+            pdf_filename=project.pdf_filename,
+            page_count=project.page_count,
+            total_length_ft=project.total_length_ft,
+            pdf_size_bytes=blob.size_bytes if blob else None,
+            pdf_compacted_size_bytes=blob.compacted_size_bytes if blob else None,
+            created_at=project.created_at,
+            updated_at=project.updated_at,
+        ),
+        pages=[ProjectPageResponse.model_validate(page, from_attributes=True) for page in pages],
+        scale_calibrations=[
+            ScaleCalibrationResponse.model_validate(sc, from_attributes=True) for sc in calibrations
+        ],
+        polylines=[
+            PolylineResponse(
+                id=p.id,
+                project_id=p.project_id,
+                name=p.name,
+                description=p.description,
+                page_number=p.page_number,
+                points=load_points(p),
+                length_ft=p.length_ft,
+                created_at=p.created_at,
+                updated_at=p.updated_at,
+            )
+            for p in polylines
+        ],
+        markers=[MarkerResponse.model_validate(m, from_attributes=True) for m in markers],
+        marker_links=[MarkerLinkResponse.model_validate(link, from_attributes=True) for link in links],
+        conduits=[ConduitResponse.model_validate(c, from_attributes=True) for c in conduits],
+        cable_configuration=CableConfigurationResponse(
+            id=config.id,
+            project_id=config.project_id,
+            name=config.name,
+            created_at=config.created_at,
+            updated_at=config.updated_at,
+            terminals=[
+                {
+                    "id": t.id,
+                    "cable_config_id": t.cable_config_id,
+                    "terminal_marker_id": t.terminal_marker_id,
+                    "address": t.address,
+                    "suggested_size": t.suggested_size,
+                    "actual_size": t.actual_size,
+                    "order": t.order,
+                    "created_at": t.created_at,
+                    "updated_at": t.updated_at,
+                }
+                for t in config.terminals
+            ],
+            cables=[
+                {
+                    "id": c.id,
+                    "cable_config_id": c.cable_config_id,
+                    "cable_number": c.cable_number,
+                    "cable_type": c.cable_type,
+                    "cable_size": c.cable_size,
+                    "order": c.order,
+                    "assigned_terminals": [a.terminal_marker_id for a in c.terminal_assignments],
+                    "created_at": c.created_at,
+                    "updated_at": c.updated_at,
+                }
+                for c in config.cables
+            ],
+            teathers=[
+                {
+                    "id": th.id,
+                    "cable_config_id": th.cable_config_id,
+                    "cable_id": th.cable_id,
+                    "target_cable_id": th.target_cable_id,
+                    "divert_count": th.divert_count,
+                    "created_at": th.created_at,
+                    "updated_at": th.updated_at,
+                }
+                for th in config.teathers
+            ],
+        ) if config else None,
+    )
+
+
+def snapshot_response(request_headers: Mapping[str, str], body: bytes, etag: str) -> Response:
+    """Compact JSON snapshot, gzip-encoded when the client accepts it and it is worth it."""
+    headers = {
+        "etag": etag,
+        "cache-control": CACHE_CONTROL,
+        "vary": "Accept-Encoding",
+    }
+    accept_encoding = request_headers.get("accept-encoding", "")
+    if len(body) >= SNAPSHOT_GZIP_MIN_BYTES and "gzip" in accept_encoding.lower():
+        body = gzip.compress(body, compresslevel=6)
+        headers["content-encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def not_modified_response(request_headers: Mapping[str, str], etag: str):
+    """A 304 when the client's copy of the snapshot is current, else None."""
+    if not etag_matches(request_headers, etag):
+        return None
+    return Response(status_code=304, headers={"etag": etag, "cache-control": CACHE_CONTROL, "vary": "Accept-Encoding"})
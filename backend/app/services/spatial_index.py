@@ -0,0 +1,240 @@
+"""
+Spatial index service - uniform grid over marker coordinates per project page.
+"""
+import heapq
+import math
+import threading
+from typing import Collection, Dict, Iterable, List, Optional, Tuple, Union
+
+# Grid cell edge in PDF units; roughly one lot frontage on a typical plat render
+DEFAULT_CELL_SIZE = 64.0
+
+TagFilter = Union[None, str, Collection[str]]
+
+
+def _tag_set(tag: TagFilter) -> Optional[frozenset]:
+    if tag is None:
+        return None
+    if isinstance(tag, str):
+        return frozenset([tag])
+    return frozenset(tag)
+
+
+class GridIndex:
+    """
+    Uniform grid of point items keyed by integer id.
+
+    Supports incremental insert/move/remove, bounding-box queries and
+    k-nearest-neighbour queries that search outward ring by ring. Each item
+    may carry a tag (e.g. a marker type) that queries can filter on, by one
+    tag or a collection of tags.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Dict[int, Tuple[float, float, Optional[str]]]] = {}
+        self._items: Dict[int, Tuple[float, float, Optional[str]]] = {}
+        # Occupied cell extent; only grows, which keeps ring searches bounded
+        self._bounds: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._items
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, item_id: int, x: float, y: float, tag: Optional[str] = None) -> None:
+        """Add an item, moving it if the id is already indexed."""
+        if item_id in self._items:
+            self.remove(item_id)
+        cell = self._cell(x, y)
+        self._cells.setdefault(cell, {})[item_id] = (x, y, tag)
+        self._items[item_id] = (x, y, tag)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self._bounds[0] = min(self._bounds[0], cell[0])
+            self._bounds[1] = min(self._bounds[1], cell[1])
+            self._bounds[2] = max(self._bounds[2], cell[0])
+            self._bounds[3] = max(self._bounds[3], cell[1])
+
+    def remove(self, item_id: int) -> None:
+        """Remove an item; unknown ids are ignored."""
+        position = self._items.pop(item_id, None)
+        if position is None:
+            return
+        cell = self._cell(position[0], position[1])
+        bucket = self._cells[cell]
+        del bucket[item_id]
+        if not bucket:
+            del self._cells[cell]
+
+    def query_bbox(
+        self,
+        min_x: float,
+        min_y: float,
+        max_x: float,
+        max_y: float,
+        tag: TagFilter = None,
+    ) -> List[int]:
+        """Ids of items inside the box (edges inclusive), sorted by id."""
+        tags = _tag_set(tag)
+        min_cx, min_cy = self._cell(min_x, min_y)
+        max_cx, max_cy = self._cell(max_x, max_y)
+        span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+
+        # Walk whichever is smaller: the cells under the box or the occupied cells
+        if span <= len(self._cells):
+            buckets = (
+                self._cells.get((cx, cy))
+                for cx in range(min_cx, max_cx + 1)
+                for cy in range(min_cy, max_cy + 1)
+            )
+        else:
+            buckets = (
+                bucket for (cx, cy), bucket in self._cells.items()
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy
+            )
+
+        found = []
+        for bucket in buckets:
+            if not bucket:
+                continue
+            for item_id, (x, y, item_tag) in bucket.items():
+                if tags is not None and item_tag not in tags:
+                    continue
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    found.append(item_id)
+        return sorted(found)
+
+    def _ring(self, center: Tuple[int, int], radius: int) -> Iterable[Dict[int, Tuple[float, float, Optional[str]]]]:
+        cx, cy = center
+        if radius == 0:
+            bucket = self._cells.get(center)
+            return [bucket] if bucket else []
+        buckets = []
+        for dx in range(-radius, radius + 1):
+            for dy in (-radius, radius):
+                buckets.append(self._cells.get((cx + dx, cy + dy)))
+        for dy in range(-radius + 1, radius):
+            for dx in (-radius, radius):
+                buckets.append(self._cells.get((cx + dx, cy + dy)))
+        return [b for b in buckets if b]
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        k: int = 1,
+        max_distance: Optional[float] = None,
+        tag: TagFilter = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Find the k items closest to (x, y), optionally only those with `tag`.
+
+        Returns:
+            List of (distance, item_id), nearest first; ties break on id
+        """
+        if k <= 0 or not self._items:
+            return []
+
+        tags = _tag_set(tag)
+        center = self._cell(x, y)
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        max_radius = max(center[0] - min_cx, max_cx - center[0], center[1] - min_cy, max_cy - center[1], 0)
+
+        candidates: List[Tuple[float, int]] = []
+        for radius in range(max_radius + 1):
+            # A ring with more cells than items is cheaper to answer by brute force
+            if 8 * radius > len(self._items):
+                candidates = [
+                    (math.hypot(px - x, py - y), item_id)
+                    for item_id, (px, py, item_tag) in self._items.items()
+                    if tags is None or item_tag in tags
+                ]
+                break
+            for bucket in self._ring(center, radius):
+                for item_id, (px, py, item_tag) in bucket.items():
+                    if tags is None or item_tag in tags:
+                        candidates.append((math.hypot(px - x, py - y), item_id))
+            # Anything in ring r + 1 is at least r cells away from the query point
+            if len(candidates) >= k and heapq.nsmallest(k, candidates)[-1][0] <= radius * self.cell_size:
+                break
+            if max_distance is not None and radius * self.cell_size > max_distance:
+                break
+
+        if max_distance is not None:
+            candidates = [c for c in candidates if c[0] <= max_distance]
+        return heapq.nsmallest(k, candidates)
+
+
+class MarkerIndexRegistry:
+    """
+    In-process cache of one GridIndex per (project_id, page_number).
+
+    Each index remembers the project revision it was built at. Every marker
+    write bumps the revision in the database, so an index is rebuilt on first
+    use after a write made by any worker process; project delete drops a
+    project's indexes.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._indexes: Dict[Tuple[int, int], Tuple[str, GridIndex]] = {}  # key -> (revision tag, index)
+        self._lock = threading.RLock()
+
+    def get(self, db, project_id: int, page_number: int) -> GridIndex:
+        """Return the page's index, rebuilding it from the database if the project changed."""
+        from app.models.database import Marker, Project
+        from app.services.project_revision import revision_tag
+
+        key = (project_id, page_number)
+        row = db.query(Project.id, Project.created_at, Project.revision).filter(Project.id == project_id).first()
+        tag = revision_tag(row) if row is not None else None
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == tag:
+                return cached[1]
+            index = GridIndex(self.cell_size)
+            rows = db.query(Marker.id, Marker.x, Marker.y, Marker.marker_type).filter(
+                Marker.project_id == project_id,
+                Marker.page_number == page_number,
+            ).all()
+            for marker in rows:
+                index.insert(marker.id, marker.x, marker.y, marker.marker_type)
+            self._indexes[key] = (tag, index)
+            return index
+
+    def query_bbox(self, db, project_id: int, page_number: int, *args, **kwargs) -> List[int]:
+        """GridIndex.query_bbox on the page's current index."""
+        with self._lock:
+            return self.get(db, project_id, page_number).query_bbox(*args, **kwargs)
+
+    def nearest(self, db, project_id: int, page_number: int, *args, **kwargs) -> List[Tuple[float, int]]:
+        """GridIndex.nearest on the page's current index."""
+        with self._lock:
+            return self.get(db, project_id, page_number).nearest(*args, **kwargs)
+
+    def nearest_many(
+        self,
+        db,
+        project_id: int,
+        page_number: int,
+        points: Iterable[Tuple[float, float]],
+        **kwargs,
+    ) -> List[List[Tuple[float, int]]]:
+        """GridIndex.nearest for each (x, y) in `points`, under a single lock."""
+        with self._lock:
+            index = self.get(db, project_id, page_number)
+            return [index.nearest(x, y, **kwargs) for x, y in points]
+
+    def drop_project(self, project_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._indexes if k[0] == project_id]:
+                del self._indexes[key]
+
+
+marker_index = MarkerIndexRegistry()
@@ -0,0 +1,156 @@
+"""
+Upload session service - resumable chunked uploads staged under UPLOAD_DIR.
+
+Each session keeps its chunks as separate files at sessions/<id>/<n>.part,
+with the byte offset of each chunk recorded in the upload_chunks table. A
+retried chunk replaces its file once accepted, received ranges are derived from
+the chunk rows, and finalizing streams the chunks back in offset order
+through the normal upload path without assembling them in memory.
+"""
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Tuple
+
+import anyio
+
+from app.config import settings
+from app.services.pdf_storage import UploadRejected
+
+Range = Tuple[int, int]  # [start, end) in bytes
+
+
+def session_dir(session_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, "sessions", session_id)
+
+
+def chunk_path(session_id: str, chunk_number: int) -> str:
+    return os.path.join(session_dir(session_id), f"{chunk_number:06d}.part")
+
+
+async def receive_chunk(stream: AsyncIterator[bytes], path: str, max_bytes: int) -> Tuple[str, int]:
+    """
+    Write a request body to a temp file beside the chunk file at `path`.
+
+    The earlier copy of the chunk is left alone: the caller moves the temp
+    file over it with os.replace only once the chunk has been accepted, so
+    a dropped connection or a rejected chunk never loses a received one.
+    Writes go through a worker thread to keep them off the event loop.
+
+    Returns:
+        (temp file path, number of bytes written)
+
+    Raises:
+        UploadRejected: the body is longer than max_bytes (413)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    size = 0
+    try:
+        async with await anyio.open_file(temp_path, mode="wb") as f:
+            async for data in stream:
+                size += len(data)
+                if size > max_bytes:
+                    raise UploadRejected("Chunk runs past the declared upload size", 413)
+                await f.write(data)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, size
+
+
+def received_ranges(chunks) -> List[Range]:
+    """Merge the byte ranges covered by UploadChunk rows."""
+    ranges: List[List[int]] = []
+    for start, end in sorted((c.offset, c.offset + c.size) for c in chunks if c.size > 0):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return [(start, end) for start, end in ranges]
+
+
+def missing_ranges(chunks, total_size: int) -> List[Range]:
+    """Byte ranges of [0, total_size) not covered by any chunk."""
+    missing = []
+    position = 0
+    for start, end in received_ranges(chunks):
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < total_size:
+        missing.append((position, total_size))
+    return missing
+
+
+def overlapping_chunk(chunks, chunk_number: int, offset: int, size: int):
+    """Another chunk whose bytes intersect [offset, offset + size), if any."""
+    for chunk in chunks:
+        if chunk.chunk_number == chunk_number or chunk.size == 0 or size == 0:
+            continue
+        if chunk.offset < offset + size and offset < chunk.offset + chunk.size:
+            return chunk
+    return None
+
+
+class ChunkReader:
+    """
+    Read-only file object over a session's chunk files in offset order.
+
+    Only one chunk file is open at a time; the chunks must be contiguous
+    from offset 0 (missing_ranges() is empty).
+    """
+
+    def __init__(self, session_id: str, chunks):
+        self._paths = [
+            chunk_path(session_id, c.chunk_number)
+            for c in sorted(chunks, key=lambda c: c.offset)
+            if c.size > 0
+        ]
+        self._current = None
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return b""
+                self._current = open(self._paths.pop(0), "rb")
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+    def close(self) -> None:
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        self._paths = []
+
+
+def remove_session_files(session_id: str) -> None:
+    shutil.rmtree(session_dir(session_id), ignore_errors=True)
+
+
+def collect_stale_sessions(db, max_age: timedelta = None) -> int:
+    """
+    Delete sessions with no activity for `max_age` (default
+    UPLOAD_SESSION_TTL_HOURS) along with their chunk files.
+
+    Returns:
+        Number of sessions removed
+    """
+    from app.models.database import UploadSession
+
+    if max_age is None:
+        max_age = timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    cutoff = datetime.now(timezone.utc) - max_age
+    stale = db.query(UploadSession).filter(UploadSession.updated_at < cutoff).all()
+    for session in stale:
+        db.delete(session)
+    db.commit()
+    for session in stale:
+        remove_session_files(session.id)
+    return len(stale)
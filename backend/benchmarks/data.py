@@ -0,0 +1,82 @@
+"""
+Synthetic project content for the benchmarks, shaped like the export route's all_data.
+"""
+import random
+from typing import Dict
+
+MARKER_TYPES = ["terminal", "dropPed", "handhole"]
+
+
+def synthetic_project(
+    pages: int = 10,
+    markers_per_page: int = 200,
+    routes_per_page: int = 20,
+    links_per_page: int = 100,
+    points_per_route: int = 30,
+    page_size: tuple = (1728, 2592),
+    seed: int = 1,
+) -> Dict:
+    """
+    Randomly placed routes, markers, marker links and conduits on `pages` pages.
+
+    Marker ids are unique across the project; each page's links and
+    conduits refer to markers on the same page.
+    """
+    rng = random.Random(seed)
+    width, height = page_size
+    data = {"polylines": [], "markers": [], "marker_links": [], "conduits": []}
+    marker_id = 0
+    for page in range(1, pages + 1):
+        for _ in range(routes_per_page):
+            data["polylines"].append({
+                "name": "Fiber Route",
+                "page_number": page,
+                "points": [
+                    {"x": rng.uniform(0, width), "y": rng.uniform(0, height)}
+                    for _ in range(points_per_route)
+                ],
+                "type": "fiber",
+                "global_index": len(data["polylines"]) + 1,
+            })
+        page_markers = []
+        for i in range(markers_per_page):
+            marker_id += 1
+            page_markers.append(marker_id)
+            data["markers"].append({
+                "id": marker_id,
+                "x": rng.uniform(0, width),
+                "y": rng.uniform(0, height),
+                "type": MARKER_TYPES[i % len(MARKER_TYPES)],
+                "page_number": page,
+            })
+        for _ in range(links_per_page):
+            data["marker_links"].append({
+                "markerId": rng.choice(page_markers),
+                "to": {"x": rng.uniform(0, width), "y": rng.uniform(0, height)},
+                "page_number": page,
+            })
+        for _ in range(markers_per_page // 10):
+            data["conduits"].append({
+                "terminalId": rng.choice(page_markers),
+                "dropPedId": rng.choice(page_markers),
+                "footage": rng.uniform(10, 200),
+                "page_number": page,
+            })
+    return data
+
+
+def page_render_args(data: Dict, page: int, page_size: tuple = (1728, 2592)) -> tuple:
+    """Overlay render args for one page, as plan_overlay_pages builds them."""
+    width, height = page_size
+    on_page = {key: [item for item in items if item["page_number"] == page] for key, items in data.items()}
+    return (
+        width,
+        height,
+        on_page["polylines"],
+        on_page["markers"],
+        on_page["marker_links"],
+        on_page["conduits"],
+        0,
+        width,
+        height,
+    )
@@ -0,0 +1,105 @@
+"""
+Overlay rendering benchmark: reportlab round trip vs direct content streams.
+
+    python -m benchmarks.overlay_render [--pages N] [--markers N] [--routes N] [--links N]
+
+Per page, the reportlab path draws a Canvas, saves it as a PDF, re-parses it
+and merge_page()s it onto a blank page, as exports did before. The direct
+paths emit the content stream and draw it on a blank page as a Form
+XObject, with marker glyphs either repeated inline or placed as shared
+glyph forms. Everything runs in this process, without the overlay cache.
+
+Besides render time and output size, each path reports the operators in
+its overlay streams and the time pypdf takes to parse them, a stand-in for
+the work a viewer does to draw the page.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream
+
+from app.services.overlay_stream import ContentStreamCanvas, draw_form_on_page, overlay_form, overlay_resources
+from app.services.pdf_overlay import _create_overlay_content, _draw_overlay, overlay_page_size
+from benchmarks.data import page_render_args, synthetic_project
+
+
+def _reportlab_page(writer: PdfWriter, args: tuple, resources) -> bytes:
+    width, height, polylines, markers, links, conduits, rotation, original_width, original_height = args
+    overlay = _create_overlay_content(
+        width, height, polylines, markers, links, conduits,
+        rotation=rotation, original_width=original_width, original_height=original_height,
+    )
+    page = writer.add_blank_page(*overlay_page_size(args))
+    overlay_page = PdfReader(io.BytesIO(overlay)).pages[0]
+    page.merge_page(overlay_page)
+    return overlay_page.get_contents().get_data()
+
+
+def _direct_page(glyph_forms: bool):
+    def render(writer: PdfWriter, args: tuple, resources) -> bytes:
+        c = ContentStreamCanvas(overlay_page_size(args), glyph_forms=glyph_forms)
+        _draw_overlay(c, *args)
+        content = c.getvalue()
+        page = writer.add_blank_page(*overlay_page_size(args))
+        form = overlay_form(content, *overlay_page_size(args), resources)
+        draw_form_on_page(page, writer._add_object(form), writer._add_object)
+        return content
+    return render
+
+
+def _run(label: str, tasks: list, render, reader_pdf) -> None:
+    writer = PdfWriter()
+    resources = overlay_resources(writer._add_object)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        contents = [render(writer, args, resources) for args in tasks]
+    render_s = time.perf_counter() - start
+    output = io.BytesIO()
+    writer.write(output)
+    total_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    operators = 0
+    for content in contents:
+        stream = ContentStream(None, reader_pdf)
+        stream.set_data(content)
+        operators += len(stream.operations)
+    parse_s = time.perf_counter() - start
+
+    print(
+        f"{label:>18}: {render_s * 1000 / len(tasks):7.1f} ms/page render+merge, "
+        f"{total_s:5.2f} s with write, output {output.tell() / 1024:7.1f} KiB, "
+        f"{operators:7d} operators, parsed in {parse_s * 1000:6.0f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--markers", type=int, default=300, help="markers per page")
+    parser.add_argument("--routes", type=int, default=20, help="routes per page")
+    parser.add_argument("--links", type=int, default=150, help="marker links per page")
+    args = parser.parse_args()
+
+    data = synthetic_project(args.pages, args.markers, args.routes, args.links)
+    tasks = [page_render_args(data, page) for page in range(1, args.pages + 1)]
+    reader_pdf = PdfReader(io.BytesIO(_blank_pdf()))
+    print(f"{args.pages} pages, {args.markers} markers, {args.routes} routes, {args.links} links per page")
+    _run("reportlab", tasks, _reportlab_page, reader_pdf)
+    _run("direct, inline", tasks, _direct_page(glyph_forms=False), reader_pdf)
+    _run("direct, glyph forms", tasks, _direct_page(glyph_forms=True), reader_pdf)
+
+
+def _blank_pdf() -> bytes:
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+if __name__ == "__main__":
+    main()
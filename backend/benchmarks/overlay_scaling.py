@@ -0,0 +1,70 @@
+"""
+Export scaling benchmark: PDF export time as projects grow.
+
+    python -m benchmarks.overlay_scaling [--pages N] [--markers N] [--links N] [--steps N]
+
+Exports a blank plat through write_overlaid_pdf (one worker, overlay cache
+off) for projects of 1/2^k of the full size up to the full --markers and
+--links, and reports time per drawn item. Near-constant time per item
+means the export scales linearly.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from pypdf import PdfWriter
+
+from app.config import settings
+from app.services.pdf_overlay import write_overlaid_pdf
+from benchmarks.data import synthetic_project
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--markers", type=int, default=5000, help="markers in the whole project")
+    parser.add_argument("--links", type=int, default=10000, help="marker links in the whole project")
+    parser.add_argument("--routes", type=int, default=200, help="routes in the whole project")
+    parser.add_argument("--steps", type=int, default=4, help="project sizes, halving each time")
+    args = parser.parse_args()
+    settings.OVERLAY_CACHE_MAX_BYTES = 0
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plat = os.path.join(tmpdir, "plat.pdf")
+        writer = PdfWriter()
+        for _ in range(args.pages):
+            writer.add_blank_page(1728, 2592)
+        with open(plat, "wb") as f:
+            writer.write(f)
+
+        # Warm up fonts and imports so the first size is not charged for them
+        with contextlib.redirect_stdout(io.StringIO()):
+            write_overlaid_pdf(plat, io.BytesIO(), all_data=synthetic_project(pages=1, markers_per_page=10), workers=1)
+
+        print(f"{args.pages} pages")
+        for step in reversed(range(args.steps)):
+            scale = 2 ** step
+            data = synthetic_project(
+                pages=args.pages,
+                markers_per_page=args.markers // scale // args.pages,
+                routes_per_page=max(args.routes // scale // args.pages, 1),
+                links_per_page=args.links // scale // args.pages,
+                points_per_route=10,
+            )
+            items = sum(len(v) for v in data.values())
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                write_overlaid_pdf(plat, io.BytesIO(), all_data=data, workers=1)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{len(data['markers']):6d} markers, {len(data['marker_links']):6d} links, "
+                f"{len(data['conduits']):5d} conduits: {elapsed:6.2f} s, "
+                f"{elapsed * 1e6 / items:6.1f} us/item"
+            )
+
+
+if __name__ == "__main__":
+    main()
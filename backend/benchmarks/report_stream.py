@@ -0,0 +1,111 @@
+"""
+Report export benchmark: whole-report strings vs streamed report chunks.
+
+    python -m benchmarks.report_stream [--routes N ...] [--points N]
+
+For projects of each size in a scratch SQLite database, builds the CSV and
+JSON reports the way the export routes did before (every polyline loaded,
+the report built as one string) and the way they stream now (polylines
+read with yield_per, text yielded in chunks), and reports time to the
+first chunk, total time and peak Python memory of each.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+import app.models.cable_config  # noqa: F401 - registers the models Project relates to
+from app.models.database import Polyline, Project
+from app.services.export_service import (
+    collect_report_data,
+    generate_csv_report,
+    generate_json_report,
+    iter_csv_report,
+    iter_json_report,
+    iter_report_polylines,
+    report_scale_calibrations,
+)
+from app.services.polyline_storage import store_points
+
+
+def _project(db, routes: int, points: int) -> Project:
+    project = Project(name=f"Bench {routes}", pdf_filename=f"bench-{routes}.pdf", total_length_ft=routes * 10.0)
+    db.add(project)
+    db.flush()
+    for n in range(routes):
+        polyline = Polyline(project_id=project.id, name=f"Route {n}", page_number=n % 20 + 1, length_ft=n * 1.5)
+        store_points(polyline, [{"x": float(i), "y": float(n)} for i in range(points)])
+        db.add(polyline)
+    db.commit()
+    return project
+
+
+def _measure(build) -> tuple:
+    """(seconds to first chunk, total seconds, peak MiB) of iterating build()."""
+    start = time.perf_counter()
+    first = None
+    for _ in build():
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    # Memory is traced in a second run; tracing slows allocation-heavy code down
+    tracemalloc.start()
+    for _ in build():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, total, peak / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--routes", type=int, nargs="+", default=[1000, 10000, 40000])
+    parser.add_argument("--points", type=int, default=20, help="points per route")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.sqlite')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        for routes in args.routes:
+            db = Session()
+            project = _project(db, routes, args.points)
+            project_id, name, total = project.id, project.name, project.total_length_ft
+            db.close()
+
+            for label, generate, iter_report in (
+                ("csv", generate_csv_report, iter_csv_report),
+                ("json", generate_json_report, iter_json_report),
+            ):
+                def whole():
+                    db = Session()
+                    try:
+                        yield generate(**collect_report_data(db, db.get(Project, project_id)))
+                    finally:
+                        db.close()
+
+                def streamed():
+                    db = Session()
+                    try:
+                        yield from iter_report(
+                            name, total, iter_report_polylines(db, project_id), report_scale_calibrations(db, project_id)
+                        )
+                    finally:
+                        db.close()
+
+                for mode, build in (("whole", whole), ("streamed", streamed)):
+                    first, elapsed, peak = _measure(build)
+                    print(
+                        f"{routes:6d} routes {label:>4} {mode:>8}: first chunk {first * 1000:7.1f} ms, "
+                        f"total {elapsed:6.2f} s, peak {peak:7.1f} MiB"
+                    )
+
+
+if __name__ == "__main__":
+    main()
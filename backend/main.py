@@ -3,10 +3,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.config import settings
 from app.db.database import Base, engine
-from app.routes import projects, exports, assignments, cable_config
+from app.db.migrations import add_missing_columns
+from app.middleware import UploadSizeLimitMiddleware
+from app.routes import projects, exports, assignments, cable_config, uploads
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -15,6 +18,10 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Refuse oversized uploads while they stream in. Added before CORS so that
+# CORSMiddleware wraps it and its 413 responses carry CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +36,7 @@ app.include_router(projects.router)
 app.include_router(exports.router)
 app.include_router(assignments.router)
 app.include_router(cable_config.router)
+app.include_router(uploads.router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,449 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import pypdf
+
+from app.db.database import Base, get_db
+from main import app
+from app.config import settings
+
+
+@pytest.fixture()
+def temp_upload_dir():
+    tmpdir = tempfile.mkdtemp()
+    original_upload = settings.UPLOAD_DIR
+    settings.UPLOAD_DIR = tmpdir
+    yield tmpdir
+    settings.UPLOAD_DIR = original_upload
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@pytest.fixture()
+def test_client(temp_upload_dir):
+    db_path = os.path.join(temp_upload_dir, "test_exports.sqlite")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def create_drawn_project(test_client, pages: int = 3, name: str = "Export Plat") -> int:
+    path = os.path.join(settings.UPLOAD_DIR, "plat.pdf")
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    with open(path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("plat.pdf", f, "application/pdf")},
+            data={"name": name},
+        )
+    os.remove(path)
+    project_id = resp.json()["id"]
+    for page in range(1, pages + 1):
+        test_client.post(
+            f"/api/projects/{project_id}/polylines",
+            json={"name": "Fiber Route", "page_number": page, "points": [{"x": 10, "y": 10}, {"x": 200, "y": 300}]},
+        )
+        test_client.post(
+            f"/api/projects/{project_id}/markers",
+            json={"page_number": page, "marker_type": "terminal", "x": 50, "y": 60},
+        )
+    return project_id
+
+
+def upload_dir_files():
+    return sorted(
+        os.path.relpath(os.path.join(root, name), settings.UPLOAD_DIR)
+        for root, _, names in os.walk(settings.UPLOAD_DIR)
+        for name in names
+        if "_cache" not in root
+    )
+
+
+@pytest.mark.parametrize("spool_memory", [8 * 1024 * 1024, 1024])
+def test_pdf_export_streams_spooled_file(test_client, monkeypatch, spool_memory):
+    monkeypatch.setattr(settings, "EXPORT_SPOOL_MAX_MEMORY", spool_memory)
+    project_id = create_drawn_project(test_client)
+    before = upload_dir_files()
+
+    resp = test_client.get(f"/api/exports/{project_id}/pdf")
+
+    assert resp.status_code == 200
+    assert int(resp.headers["content-length"]) == len(resp.content)
+    assert resp.headers["content-disposition"] == "attachment; filename=Export_Plat_annotated.pdf"
+    reader = pypdf.PdfReader(io.BytesIO(resp.content))
+    assert len(reader.pages) == 3
+    assert reader.pages[0].get_contents() is not None  # blank source page now carries the overlay
+    # The spool file is gone once the body has been sent
+    assert upload_dir_files() == before
+
+
+def test_pdf_export_falls_back_to_original_on_failure(test_client, monkeypatch):
+    project_id = create_drawn_project(test_client, pages=1)
+    original = test_client.get(f"/api/projects/{project_id}/pdf").content
+
+    import app.services.pdf_overlay as pdf_overlay
+
+    def broken_writer(*args, **kwargs):
+        raise RuntimeError("writer exploded")
+
+    monkeypatch.setattr(pdf_overlay, "PdfWriter", broken_writer)
+    resp = test_client.get(f"/api/exports/{project_id}/pdf")
+    assert resp.status_code == 200
+    assert resp.content == original
+    assert int(resp.headers["content-length"]) == len(original)
+
+
+def test_incremental_pdf_export_appends_to_original(test_client):
+    project_id = create_drawn_project(test_client, pages=2)
+    original = test_client.get(f"/api/projects/{project_id}/pdf").content
+
+    resp = test_client.get(f"/api/exports/{project_id}/pdf", params={"mode": "incremental"})
+
+    assert resp.status_code == 200
+    assert int(resp.headers["content-length"]) == len(resp.content)
+    assert resp.content.startswith(original)
+    assert resp.content.rstrip().endswith(b"%%EOF")
+    reader = pypdf.PdfReader(io.BytesIO(resp.content), strict=True)
+    assert len(reader.pages) == 2
+    for page in reader.pages:
+        assert b"Do Q" in page.get_contents().get_data()
+        overlay = next(iter(page["/Resources"]["/XObject"].values())).get_object()
+        assert overlay["/Subtype"] == "/Form"
+    # Untouched pages keep their original objects
+    resp = test_client.get(f"/api/exports/{project_id}/pdf", params={"mode": "incremental", "page_number": 2})
+    reader = pypdf.PdfReader(io.BytesIO(resp.content), strict=True)
+    assert reader.pages[0].get_contents() is None
+    assert reader.pages[1].get_contents() is not None
+
+    resp = test_client.get(f"/api/exports/{project_id}/pdf", params={"mode": "bogus"})
+    assert resp.status_code == 400
+
+
+def test_appended_file_response_uses_zero_copy_send(temp_upload_dir):
+    import anyio
+    from app.services.file_delivery import AppendedFileResponse
+
+    path = os.path.join(temp_upload_dir, "original.pdf")
+    with open(path, "wb") as f:
+        f.write(b"original bytes")
+    tail = tempfile.SpooledTemporaryFile()
+    tail.write(b" + update")
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": {"http.response.zerocopysend": {}}}
+    anyio.run(AppendedFileResponse(path, tail, "out.pdf"), scope, None, send)
+
+    assert dict(messages[0]["headers"])[b"content-length"] == b"23"
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert messages[1]["count"] == 14
+    assert b"".join(m.get("body", b"") for m in messages[2:]) == b" + update"
+    assert messages[-1]["more_body"] is False
+    assert tail.closed
+
+
+def wait_for_job(test_client, project_id: int, job_id: str, timeout: float = 30):
+    import time
+
+    deadline = time.monotonic() + timeout
+    while True:
+        job = test_client.get(f"/api/exports/{project_id}/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_export_jobs_build_artifacts_in_background(test_client):
+    project_id = create_drawn_project(test_client, pages=2)
+
+    resp = test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "pdf"})
+    assert resp.status_code == 200
+    job = wait_for_job(test_client, project_id, resp.json()["id"])
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert job["download_url"] == f"/api/exports/{project_id}/jobs/{job['id']}/download"
+
+    resp = test_client.get(job["download_url"])
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/pdf"
+    assert len(resp.content) == job["size_bytes"]
+    reader = pypdf.PdfReader(io.BytesIO(resp.content))
+    assert all(b"Do Q" in page.get_contents().get_data() for page in reader.pages)
+    assert os.path.exists(os.path.join(settings.UPLOAD_DIR, "exports", job["id"], job["filename"]))
+
+    resp = test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "csv", "slack_factor": 0.1})
+    job = wait_for_job(test_client, project_id, resp.json()["id"])
+    assert job["filename"] == "Export_Plat_report.csv"
+    report = test_client.get(job["download_url"]).text
+    assert "Export Plat" in report
+    assert "Slack Factor" in report
+
+    assert test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "xlsx"}).status_code == 400
+    assert test_client.get(f"/api/exports/{project_id}/jobs/missing").status_code == 404
+
+
+def test_identical_export_jobs_share_one_job_until_project_changes(test_client):
+    project_id = create_drawn_project(test_client, pages=1)
+    request = {"format": "pdf", "page_number": 1}
+
+    first = test_client.post(f"/api/exports/{project_id}/jobs", json=request).json()
+    # Options another format would take do not make a different job
+    second = test_client.post(f"/api/exports/{project_id}/jobs", json=dict(request, slack_factor=0.05)).json()
+    assert second["id"] == first["id"]
+    assert wait_for_job(test_client, project_id, first["id"])["status"] == "done"
+    assert test_client.post(f"/api/exports/{project_id}/jobs", json=request).json()["id"] == first["id"]
+
+    test_client.post(
+        f"/api/projects/{project_id}/markers",
+        json={"page_number": 1, "marker_type": "handhole", "x": 300, "y": 300},
+    )
+    changed = test_client.post(f"/api/exports/{project_id}/jobs", json=request).json()
+    assert changed["id"] != first["id"]
+    other_page = test_client.post(f"/api/exports/{project_id}/jobs", json=dict(request, page_number=None)).json()
+    assert other_page["id"] not in (first["id"], changed["id"])
+
+
+def test_expired_export_jobs_are_removed(test_client):
+    from datetime import datetime, timedelta, timezone
+    from app.db.database import get_db
+    from app.models.database import ExportJob
+
+    project_id = create_drawn_project(test_client, pages=1)
+    job = test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "json"}).json()
+    job = wait_for_job(test_client, project_id, job["id"])
+    assert test_client.get(job["download_url"]).json()["project_name"] == "Export Plat"
+
+    db = next(app.dependency_overrides[get_db]())
+    db.get(ExportJob, job["id"]).expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+    assert test_client.get(f"/api/exports/{project_id}/jobs/{job['id']}").status_code == 404
+    assert test_client.get(job["download_url"]).status_code == 404
+    assert not os.path.exists(os.path.join(settings.UPLOAD_DIR, "exports", job["id"]))
+
+
+def test_abandoned_export_jobs_are_queued_again(test_client):
+    import shutil
+    from datetime import datetime, timedelta, timezone
+    from app.db.database import get_db
+    from app.models.database import ExportJob
+
+    project_id = create_drawn_project(test_client, pages=1)
+    job = test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "csv"}).json()
+    job = wait_for_job(test_client, project_id, job["id"])
+    assert job["status"] == "done"
+
+    # The artifact went missing: the download rebuilds it instead of failing for good
+    shutil.rmtree(os.path.join(settings.UPLOAD_DIR, "exports", job["id"]))
+    assert test_client.get(job["download_url"]).status_code == 409
+    assert wait_for_job(test_client, project_id, job["id"])["status"] == "done"
+    assert "Export Plat" in test_client.get(job["download_url"]).text
+
+    # A worker that stopped mid-job leaves it running with an old heartbeat
+    db = next(app.dependency_overrides[get_db]())
+    row = db.get(ExportJob, job["id"])
+    row.status = "running"
+    row.heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS + 1)
+    db.commit()
+    db.close()
+    assert wait_for_job(test_client, project_id, job["id"])["status"] == "done"
+    again = test_client.post(f"/api/exports/{project_id}/jobs", json={"format": "csv"}).json()
+    assert again["id"] == job["id"]
+
+
+def test_batch_export_streams_zip_of_projects(test_client, monkeypatch):
+    import zipfile
+
+    monkeypatch.setattr(settings, "EXPORT_BATCH_WORKERS", 2)
+    first = create_drawn_project(test_client, pages=2)
+    second = create_drawn_project(test_client, pages=1, name="Second Plat")
+
+    resp = test_client.post(
+        "/api/exports/batch",
+        json={"project_ids": [first, second, first], "formats": ["csv", "pdf"], "slack_factor": 0.05},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(resp.content))
+    assert sorted(archive.namelist()) == [
+        f"Export_Plat_{first}/Export_Plat_annotated.pdf",
+        f"Export_Plat_{first}/Export_Plat_report.csv",
+        f"Second_Plat_{second}/Second_Plat_annotated.pdf",
+        f"Second_Plat_{second}/Second_Plat_report.csv",
+    ]
+    assert "Slack Factor" in archive.read(f"Second_Plat_{second}/Second_Plat_report.csv").decode()
+    reader = pypdf.PdfReader(io.BytesIO(archive.read(f"Export_Plat_{first}/Export_Plat_annotated.pdf")))
+    assert len(reader.pages) == 2
+    assert all(b"Do Q" in page.get_contents().get_data() for page in reader.pages)
+    assert not os.listdir(os.path.join(settings.UPLOAD_DIR, "batch"))
+
+    assert test_client.post("/api/exports/batch", json={"project_ids": [first, 999]}).status_code == 404
+    assert test_client.post("/api/exports/batch", json={"project_ids": [first], "formats": ["xlsx"]}).status_code == 400
+
+
+def test_batch_zip_streams_members_as_they_are_built(temp_upload_dir):
+    import zipfile
+    from app.services.batch_export import stream_batch_zip
+
+    consumed = []
+
+    def members():
+        for n in range(3):
+            consumed.append(n)
+            yield {
+                "format": "json",
+                "options": {"slack_factor": None},
+                "inputs": {"project_name": f"P{n}", "total_length_ft": n, "polylines": [], "scale_calibrations": []},
+                "arcname": f"P{n}/report.json",
+            }
+        yield {"arcname": "P3/pdf", "error": "Project PDF not found"}
+
+    stream = stream_batch_zip(members(), workers=1)
+    assert next(stream)
+    # The first member is sent before later projects are read
+    assert consumed == [0]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream)))
+    assert archive.namelist() == ["P0/report.json", "P1/report.json", "P2/report.json", "errors.txt"]
+    assert archive.read("errors.txt") == b"P3/pdf: Project PDF not found\n"
+
+
+def test_batches_share_one_build_pool(temp_upload_dir, monkeypatch):
+    from app.services import batch_export
+
+    monkeypatch.setattr(settings, "EXPORT_BATCH_WORKERS", 2)
+
+    def members(count):
+        for n in range(count):
+            yield {
+                "format": "json",
+                "options": {"slack_factor": None},
+                "inputs": {"project_name": f"P{n}", "total_length_ft": n, "polylines": [], "scale_calibrations": []},
+                "arcname": f"P{n}/report.json",
+            }
+
+    assert b"".join(batch_export.stream_batch_zip(members(2), workers=2))
+    pool = batch_export._batch_pool
+    # An abandoned download drops its queued members without stopping the shared pool
+    stream = batch_export.stream_batch_zip(members(20), workers=2)
+    assert next(stream)
+    stream.close()
+    assert batch_export._batch_pool is pool
+    assert b"".join(batch_export.stream_batch_zip(members(2), workers=2))
+    assert batch_export._batch_pool is pool
+
+
+@pytest.mark.parametrize("format", ["csv", "json"])
+def test_report_exports_stream_polylines_in_chunks(test_client, monkeypatch, format):
+    from datetime import datetime
+    from app.db.database import get_db
+    from app.models.database import Project
+    from app.routes import exports
+    from app.services import export_service
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 5, 6, 7, 8, 9)
+
+    monkeypatch.setattr(export_service, "datetime", FrozenDatetime)
+    monkeypatch.setattr(export_service, "REPORT_CHUNK_SIZE", 256)
+    monkeypatch.setattr(export_service, "REPORT_POLYLINE_BATCH", 7)
+    project_id = create_drawn_project(test_client, pages=1)
+    test_client.post(
+        f"/api/projects/{project_id}/scale-calibrations",
+        json={"method": "manual", "scale_factor": 0.5, "page_number": 1, "manual_scale_str": '1" = 50\''},
+    )
+    for n in range(30):
+        test_client.post(
+            f"/api/projects/{project_id}/polylines",
+            json={"name": f'Route "{n}", east', "page_number": 1, "points": [{"x": 0, "y": 0}, {"x": n, "y": 1}]},
+        )
+
+    resp = test_client.get(f"/api/exports/{project_id}/{format}", params={"slack_factor": 0.05})
+
+    db = next(app.dependency_overrides[get_db]())
+    project = db.get(Project, project_id)
+    generate = export_service.generate_csv_report if format == "csv" else export_service.generate_json_report
+    expected = generate(**export_service.collect_report_data(db, project), slack_factor=0.05)
+    iter_report = export_service.iter_csv_report if format == "csv" else export_service.iter_json_report
+    chunks = list(exports._stream_report(db, project, iter_report, 0.05))
+    db.close()
+    assert resp.content == expected.encode()
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected
+    if format == "json":
+        assert json.loads(expected)["summary"]["polyline_count"] == 30
+
+
+def test_exports_are_cached_per_project_revision(test_client, monkeypatch):
+    from app.services import export_service
+    from app.services.export_cache import export_cache
+
+    project_id = create_drawn_project(test_client, pages=1)
+    calls = []
+    original_collect = export_service.iter_report_polylines
+
+    def counting_collect(*args, **kwargs):
+        calls.append(1)
+        return original_collect(*args, **kwargs)
+
+    from app.routes import exports
+    monkeypatch.setattr(exports, "iter_report_polylines", counting_collect)
+
+    first = test_client.get(f"/api/exports/{project_id}/csv", params={"slack_factor": 0.05})
+    etag = first.headers["etag"]
+    again = test_client.get(f"/api/exports/{project_id}/csv", params={"slack_factor": 0.05})
+    assert again.content == first.content
+    assert again.headers["etag"] == etag
+    assert len(calls) == 1
+    assert test_client.get(
+        f"/api/exports/{project_id}/csv", params={"slack_factor": 0.05}, headers={"If-None-Match": etag}
+    ).status_code == 304
+    # Other options are another export
+    assert test_client.get(f"/api/exports/{project_id}/csv").headers["etag"] != etag
+
+    pdf = test_client.get(f"/api/exports/{project_id}/pdf")
+    hits = export_cache.hits
+    cached_pdf = test_client.get(f"/api/exports/{project_id}/pdf")
+    assert export_cache.hits == hits + 1
+    assert cached_pdf.content == pdf.content
+    assert cached_pdf.headers["etag"] == pdf.headers["etag"]
+    incremental = test_client.get(f"/api/exports/{project_id}/pdf", params={"mode": "incremental"})
+    cached_incremental = test_client.get(f"/api/exports/{project_id}/pdf", params={"mode": "incremental"})
+    assert cached_incremental.content == incremental.content
+    assert cached_incremental.headers["etag"] == incremental.headers["etag"]
+
+    # Any write to the project is a new revision
+    test_client.post(
+        f"/api/projects/{project_id}/markers",
+        json={"page_number": 1, "marker_type": "handhole", "x": 300, "y": 300},
+    )
+    changed = test_client.get(
+        f"/api/exports/{project_id}/csv", params={"slack_factor": 0.05}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(calls) == 3
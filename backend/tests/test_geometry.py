@@ -1,7 +1,20 @@
+import math
+import random
+
+import pytest
+
+from app.services import geometry
 from app.services.geometry import (
+    ArcLengthIndex,
+    batch_polyline_lengths_pdf_units,
     calculate_polyline_length_pdf_units,
     calculate_polyline_length_ft,
+    calculate_polyline_lengths_ft,
     calculate_two_point_scale,
+    coords_to_points,
+    decode_points_blob,
+    encode_points_blob,
+    pack_polylines,
 )
 
 
@@ -30,3 +43,115 @@ def test_calculate_two_point_scale():
         known_distance_ft=100,
     )
     assert scale == 0.5
+
+
+def _reference_length(points):
+    # Original per-segment implementation the batch engine must match exactly
+    total = 0.0
+    for i in range(len(points) - 1):
+        total += math.sqrt((points[i]["x"] - points[i + 1]["x"]) ** 2 + (points[i]["y"] - points[i + 1]["y"]) ** 2)
+    return total
+
+
+def _random_polylines():
+    rng = random.Random(42)
+    polylines = []
+    for count in [0, 1, 2, 5, 300, 2000]:
+        polylines.append([
+            {"x": rng.uniform(0, 2592), "y": rng.uniform(0, 1728)}
+            for _ in range(count)
+        ])
+    return polylines
+
+
+def test_pack_polylines_offsets():
+    coords, offsets = pack_polylines([[{"x": 1, "y": 2}, {"x": 3, "y": 4}], [], [{"x": 5, "y": 6}]])
+    assert list(coords) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert offsets == [0, 2, 2, 3]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_batch_lengths_identical_to_reference(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    polylines = _random_polylines()
+    coords, offsets = pack_polylines(polylines)
+    lengths = batch_polyline_lengths_pdf_units(coords, offsets, use_numpy=use_numpy)
+    assert lengths == [_reference_length(points) for points in polylines]
+
+
+def test_batch_of_short_polylines_matches_python_path():
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    # Many short routes, as recalibrating a page remeasures them, plus a few long ones.
+    # Coordinates on a 1/64 grid square exactly, so only the summation order is compared.
+    polylines = [
+        [{"x": rng.randint(0, 2592 * 64) / 64, "y": rng.randint(0, 1728 * 64) / 64} for _ in range(count)]
+        for count in [rng.choice([0, 1, 2, 3, 4, 10]) for _ in range(5000)] + [65, 66, 400]
+    ]
+    coords, offsets = pack_polylines(polylines)
+    lengths = batch_polyline_lengths_pdf_units(coords, offsets, use_numpy=True)
+    assert lengths == batch_polyline_lengths_pdf_units(coords, offsets, use_numpy=False)
+    assert lengths == [_reference_length(points) for points in polylines]
+
+
+def test_calculate_polyline_length_without_numpy(monkeypatch):
+    polylines = _random_polylines()
+    expected = calculate_polyline_lengths_ft(polylines, scale_factor=0.25)
+    monkeypatch.setattr(geometry, "np", None)
+    assert calculate_polyline_lengths_ft(polylines, scale_factor=0.25) == expected
+    assert calculate_polyline_length_ft(polylines[-1], scale_factor=0.25) == expected[-1]
+
+
+def test_points_blob_round_trip():
+    points = _random_polylines()[4]
+    blob = encode_points_blob(points)
+    assert len(blob) == 16 * len(points)
+    assert coords_to_points(decode_points_blob(blob)) == points
+    coords, offsets = pack_polylines([points])
+    assert batch_polyline_lengths_pdf_units(decode_points_blob(blob), offsets) == batch_polyline_lengths_pdf_units(coords, offsets)
+
+
+def test_decode_points_blob_without_numpy(monkeypatch):
+    points = [{"x": 1.5, "y": -2.0}, {"x": 3.0, "y": 4.25}]
+    monkeypatch.setattr(geometry, "np", None)
+    assert coords_to_points(decode_points_blob(encode_points_blob(points))) == points
+
+
+def _linear_scan_point(points, target):
+    # Label placement from the original overlay code: scan segments from the start
+    accumulated, segment_idx, local_t = 0.0, 0, 0.0
+    for i in range(len(points) - 1):
+        seg = ((points[i + 1]["x"] - points[i]["x"]) ** 2 + (points[i + 1]["y"] - points[i]["y"]) ** 2) ** 0.5
+        if accumulated + seg >= target:
+            segment_idx, local_t = i, (target - accumulated) / seg if seg > 0 else 0
+            break
+        accumulated += seg
+    p, q = points[segment_idx], points[segment_idx + 1]
+    return p["x"] + (q["x"] - p["x"]) * local_t, p["y"] + (q["y"] - p["y"]) * local_t
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_arc_length_index_matches_linear_scan(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(geometry, "np", None)
+    for points in _random_polylines()[2:]:
+        index = ArcLengthIndex.from_points(points)
+        assert index.total_length == _reference_length(points)
+        assert index.segment_count == len(points) - 1
+        for fraction in (0.0, 0.25, 0.5, 0.75, 1.0):
+            assert index.point_at_fraction(fraction) == pytest.approx(_linear_scan_point(points, index.total_length * fraction))
+
+
+def test_arc_length_index_lookups():
+    index = ArcLengthIndex.from_points([{"x": 0, "y": 0}, {"x": 3, "y": 4}, {"x": 3, "y": 4}, {"x": 3, "y": 14}])
+    assert [index.distance_at_vertex(i) for i in range(4)] == [0.0, 5.0, 5.0, 15.0]
+    assert index.point_at_distance(2.5) == (1.5, 2.0)
+    assert index.point_at_distance(10) == (3.0, 9.0)
+    assert index.point_at_distance(-1) == (0.0, 0.0)
+    assert index.point_at_distance(99) == (3.0, 14.0)
+
+    restored = ArcLengthIndex.from_blob(index.coords, index.to_blob())
+    assert list(restored.cumulative) == list(index.cumulative)
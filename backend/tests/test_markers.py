@@ -219,3 +219,146 @@ def test_create_marker_for_nonexistent_project(test_client):
     
     # Assert
     assert resp.status_code != 200  # Should fail
+
+
+def test_markers_in_bbox_and_nearest(test_client):
+    """Test viewport and nearest-marker queries stay in sync with marker writes."""
+    # Arrange
+    project_id = create_test_project(test_client)
+    ids = {}
+    for name, x, y, marker_type in [("t1", 100, 100, "terminal"), ("d1", 120, 100, "dropPed"), ("t2", 900, 700, "terminal")]:
+        resp = test_client.post(
+            f"/api/projects/{project_id}/markers/",
+            json={"x": x, "y": y, "marker_type": marker_type, "page_number": 1},
+        )
+        ids[name] = resp.json()["id"]
+
+    # Act / Assert: viewport query
+    resp = test_client.get(
+        f"/api/projects/{project_id}/markers/in-bbox",
+        params={"page_number": 1, "min_x": 0, "min_y": 0, "max_x": 500, "max_y": 500},
+    )
+    assert resp.status_code == 200
+    assert [m["id"] for m in resp.json()] == [ids["t1"], ids["d1"]]
+
+    # Nearest terminal to a point next to the drop ped
+    resp = test_client.get(
+        f"/api/projects/{project_id}/markers/nearest",
+        params={"page_number": 1, "x": 125, "y": 100, "marker_type": "terminal"},
+    )
+    assert resp.status_code == 200
+    assert [(m["id"], m["distance"]) for m in resp.json()] == [(ids["t1"], 25.0)]
+
+    # Moving and deleting markers updates the index
+    test_client.put(
+        f"/api/projects/{project_id}/markers/{ids['t2']}",
+        json={"x": 130, "y": 100, "marker_type": "terminal", "page_number": 1},
+    )
+    test_client.delete(f"/api/projects/{project_id}/markers/{ids['d1']}")
+    resp = test_client.get(
+        f"/api/projects/{project_id}/markers/nearest",
+        params={"page_number": 1, "x": 125, "y": 100, "k": 5},
+    )
+    assert [m["id"] for m in resp.json()] == [ids["t2"], ids["t1"]]
+    resp = test_client.get(
+        f"/api/projects/{project_id}/markers/in-bbox",
+        params={"page_number": 1, "min_x": 500, "min_y": 500, "max_x": 1000, "max_y": 1000},
+    )
+    assert resp.json() == []
+
+
+def test_marker_index_sees_writes_from_other_workers(test_client):
+    """Test the cached index is rebuilt after another process changes the page's markers."""
+    from app.models.database import Marker
+    from app.services.project_revision import bump_revision
+
+    # Arrange: build this process's index
+    project_id = create_test_project(test_client)
+    resp = test_client.post(
+        f"/api/projects/{project_id}/markers/",
+        json={"x": 100, "y": 100, "marker_type": "terminal", "page_number": 1},
+    )
+    first_id = resp.json()["id"]
+    params = {"page_number": 1, "x": 0, "y": 0, "k": 5}
+    assert [m["id"] for m in test_client.get(f"/api/projects/{project_id}/markers/nearest", params=params).json()] == [first_id]
+
+    # Act: another worker deletes it and adds a marker, bypassing this process's routes
+    db = next(app.dependency_overrides[get_db]())
+    db.query(Marker).filter(Marker.id == first_id).delete()
+    other = Marker(project_id=project_id, page_number=1, marker_type="terminal", x=10, y=10)
+    db.add(other)
+    bump_revision(db, project_id)
+    db.commit()
+    other_id = other.id
+    db.close()
+
+    # Assert
+    resp = test_client.get(f"/api/projects/{project_id}/markers/nearest", params=params)
+    assert [m["id"] for m in resp.json()] == [other_id]
+
+
+def test_bulk_assign_lots_to_nearest_marker(test_client):
+    """Test bulk assignment links each lot to its nearest terminal or drop ped."""
+    # Arrange
+    project_id = create_test_project(test_client)
+    ids = {}
+    for name, x, y, marker_type in [("t1", 100, 100, "terminal"), ("d1", 400, 100, "dropPed"), ("h1", 250, 100, "handhole")]:
+        resp = test_client.post(
+            f"/api/projects/{project_id}/markers/",
+            json={"x": x, "y": y, "marker_type": marker_type, "page_number": 1},
+        )
+        ids[name] = resp.json()["id"]
+    lots = [{"x": 110, "y": 100}, {"x": 240, "y": 100}, {"x": 390, "y": 100}, {"x": 900, "y": 900}]
+
+    # Act
+    resp = test_client.post(
+        f"/api/projects/{project_id}/assignments/bulk",
+        json={"page_number": 1, "lots": lots, "max_distance": 200},
+    )
+
+    # Assert: the handhole is never a candidate and the far lot is left out
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert [(link["marker_id"], link["to_x"]) for link in data["created"]] == [
+        (ids["t1"], 110), (ids["t1"], 240), (ids["d1"], 390)
+    ]
+    assert data["unassigned"] == [{"x": 900, "y": 900}]
+    assert data["marker_counts"] == {str(ids["t1"]): 2, str(ids["d1"]): 1}
+    assert data["duplicate_count"] == 0
+
+    # Re-running the same batch creates nothing new
+    resp = test_client.post(
+        f"/api/projects/{project_id}/assignments/bulk",
+        json={"page_number": 1, "lots": lots, "max_distance": 200},
+    )
+    assert resp.json()["created"] == []
+    assert resp.json()["duplicate_count"] == 3
+    assert len(test_client.get(f"/api/projects/{project_id}/assignments").json()) == 3
+
+
+def test_bulk_assign_skips_markers_missing_from_the_database(test_client, monkeypatch):
+    """Test bulk assignment never links a marker the index still holds after it was deleted."""
+    from app.routes import assignments
+
+    project_id = create_test_project(test_client)
+    resp = test_client.post(
+        f"/api/projects/{project_id}/markers/",
+        json={"x": 100, "y": 100, "marker_type": "terminal", "page_number": 1},
+    )
+    live_id = resp.json()["id"]
+    deleted_id = live_id + 1000
+    monkeypatch.setattr(
+        assignments.marker_index,
+        "nearest_many",
+        lambda *args, **kwargs: [[(5.0, deleted_id)], [(5.0, live_id)]],
+    )
+
+    resp = test_client.post(
+        f"/api/projects/{project_id}/assignments/bulk",
+        json={"page_number": 1, "lots": [{"x": 1, "y": 1}, {"x": 2, "y": 2}]},
+    )
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [link["marker_id"] for link in data["created"]] == [live_id]
+    assert data["unassigned"] == [{"x": 1, "y": 1}]
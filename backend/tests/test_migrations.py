@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.db.migrations import add_missing_columns, pack_polyline_points
+from app.models.database import Polyline
+from app.services.polyline_storage import load_arc_index, load_points
+
+
+@pytest.fixture()
+def engine():
+    tmpdir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'legacy.sqlite')}")
+    yield engine
+    engine.dispose()
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def test_add_missing_columns_upgrades_legacy_polylines(engine):
+    # Arrange: a polylines table from before packed point storage existed
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE polylines (id INTEGER PRIMARY KEY, project_id INTEGER, name VARCHAR, "
+            "description TEXT, page_number INTEGER, points JSON, length_ft FLOAT, "
+            "created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO polylines (id, project_id, name, page_number, points, length_ft) "
+            "VALUES (1, 1, 'Route', 1, '[{\"x\": 0, \"y\": 0}, {\"x\": 3, \"y\": 4}]', 5.0)"
+        ))
+    Base.metadata.create_all(bind=engine)
+
+    # Act
+    added = add_missing_columns(engine)
+
+    # Assert
+    assert "polylines.points_packed" in added
+    assert "polylines.point_count" in added
+    columns = {c["name"] for c in inspect(engine).get_columns("polylines")}
+    assert {"points_packed", "point_count"} <= columns
+    assert add_missing_columns(engine) == []
+
+    db = sessionmaker(bind=engine)()
+    try:
+        assert pack_polyline_points(db) == 1
+        polyline = db.query(Polyline).one()
+        assert polyline.points is None
+        assert polyline.point_count == 2
+        assert load_points(polyline) == [{"x": 0.0, "y": 0.0}, {"x": 3.0, "y": 4.0}]
+        assert polyline.arc_lengths_packed is not None
+        assert load_arc_index(polyline).total_length == 5.0
+    finally:
+        db.close()
+
+
+def test_adopt_legacy_pdfs_moves_files_to_content_store(engine, monkeypatch):
+    from app.config import settings
+    from app.db.migrations import adopt_legacy_pdfs
+    from app.models.database import PdfBlob, Project
+    from app.services.pdf_storage import blob_path, project_pdf_path
+
+    upload_dir = os.path.dirname(engine.url.database)
+    monkeypatch.setattr(settings, "UPLOAD_DIR", upload_dir)
+    Base.metadata.create_all(bind=engine)
+    for name in ["a.pdf", "b.pdf"]:
+        with open(os.path.join(upload_dir, name), "wb") as f:
+            f.write(b"%PDF-1.4 same plat")
+
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add_all([Project(name="A", pdf_filename="a.pdf"), Project(name="B", pdf_filename="b.pdf")])
+        db.commit()
+
+        assert adopt_legacy_pdfs(db) == 2
+
+        projects = db.query(Project).all()
+        assert projects[0].pdf_sha256 == projects[1].pdf_sha256
+        assert project_pdf_path(projects[0]) == blob_path(projects[0].pdf_sha256)
+        assert os.path.exists(blob_path(projects[0].pdf_sha256))
+        assert not os.path.exists(os.path.join(upload_dir, "a.pdf"))
+        assert db.query(PdfBlob).one().ref_count == 2
+    finally:
+        db.close()
+
+
+def test_legacy_pdf_is_hashed_once(engine, monkeypatch):
+    from app.config import settings
+    from app.models.database import Project
+    from app.services import pdf_storage
+
+    upload_dir = os.path.dirname(engine.url.database)
+    monkeypatch.setattr(settings, "UPLOAD_DIR", upload_dir)
+    Base.metadata.create_all(bind=engine)
+    with open(os.path.join(upload_dir, "a.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 legacy plat")
+
+    hashed = []
+    hash_file = pdf_storage.hash_file
+    monkeypatch.setattr(pdf_storage, "hash_file", lambda path: hashed.append(path) or hash_file(path))
+
+    db = sessionmaker(bind=engine)()
+    try:
+        project = Project(name="A", pdf_filename="a.pdf", page_count=1)
+        db.add(project)
+        db.commit()
+
+        sha256 = pdf_storage.adopt_legacy_pdf(db, project)
+        assert sha256 is not None
+        assert pdf_storage.adopt_legacy_pdf(db, project) == sha256
+        assert len(hashed) == 1
+        assert db.query(Project).one().pdf_sha256 == sha256
+        assert os.path.exists(pdf_storage.blob_path(sha256))
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+import pypdf
+
+from app.config import settings
+from app.services.page_cache import PageCache, extract_pages, format_page_spec, parse_page_spec
+
+
+@pytest.fixture()
+def temp_upload_dir():
+    tmpdir = tempfile.mkdtemp()
+    original_upload = settings.UPLOAD_DIR
+    settings.UPLOAD_DIR = tmpdir
+    yield tmpdir
+    settings.UPLOAD_DIR = original_upload
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def make_pdf(tmpdir: str, pages: int) -> str:
+    path = os.path.join(tmpdir, "source.pdf")
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def test_parse_and_format_page_spec():
+    assert parse_page_spec("3", 5) == [3]
+    assert parse_page_spec("5, 1-2,2", 5) == [1, 2, 5]
+    assert format_page_spec([1, 2, 3, 5]) == "1-3_5"
+    for bad in ["0", "6", "3-2", "", "1,,2", "x"]:
+        with pytest.raises(ValueError):
+            parse_page_spec(bad, 5)
+
+
+def extract_size(source: str, sha256: str, pages, cache: PageCache) -> int:
+    with extract_pages(source, sha256, pages, cache=cache) as f:
+        return os.fstat(f.fileno()).st_size
+
+
+def test_page_cache_evicts_least_recently_used(temp_upload_dir):
+    source = make_pdf(temp_upload_dir, 4)
+    one_page = extract_size(source, "ab" * 32, [1], PageCache())
+    cache = PageCache(max_bytes=int(one_page * 2.5))
+    first = cache.path_for(cache.key_for("cd" * 32, [1]))
+    second = cache.path_for(cache.key_for("cd" * 32, [2]))
+
+    extract_size(source, "cd" * 32, [1], cache)
+    extract_size(source, "cd" * 32, [2], cache)
+    hits = cache.hits
+    extract_size(source, "cd" * 32, [1], cache)  # hit refreshes page 1
+    assert cache.hits == hits + 1
+    extract_size(source, "cd" * 32, [3], cache)
+
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    # A fresh instance picks the surviving files up from disk
+    assert PageCache().get(PageCache.key_for("cd" * 32, [1])) == first
+
+
+def test_page_cache_is_shared_between_processes(temp_upload_dir):
+    source = make_pdf(temp_upload_dir, 4)
+    one_page = extract_size(source, "ab" * 32, [1], PageCache())
+    # Two instances stand in for two worker processes sharing the directory
+    worker_a = PageCache(max_bytes=int(one_page * 2.5))
+    worker_b = PageCache(max_bytes=int(one_page * 2.5))
+
+    extract_size(source, "cd" * 32, [1], worker_a)
+    misses = worker_b.misses
+    extract_size(source, "cd" * 32, [1], worker_b)
+    assert worker_b.misses == misses  # b finds the entry a wrote
+
+    # The bound holds for the directory, not for each worker's own writes
+    extract_size(source, "cd" * 32, [2], worker_a)
+    extract_size(source, "cd" * 32, [3], worker_b)
+    extract_size(source, "cd" * 32, [4], worker_a)
+    assert worker_a.stats()["bytes"] <= worker_a.max_bytes
+
+
+def test_evicted_entry_stays_readable_while_open(temp_upload_dir):
+    source = make_pdf(temp_upload_dir, 4)
+    one_page = extract_size(source, "ab" * 32, [1], PageCache())
+    cache = PageCache(max_bytes=one_page)
+
+    extract_size(source, "cd" * 32, [1], cache)
+    with extract_pages(source, "cd" * 32, [1], cache=cache) as f:
+        extract_size(source, "cd" * 32, [2], cache)
+        assert not os.path.exists(cache.path_for(cache.key_for("cd" * 32, [1])))
+        assert pypdf.PdfReader(f).pages[0] is not None
@@ -0,0 +1,233 @@
+import io
+import os
+import shutil
+import tempfile
+
+import pytest
+import pypdf
+
+from app.config import settings
+from app.services import overlay_stream
+from app.services.geometry import ArcLengthIndex, decode_points_blob, encode_points_blob
+from app.services import pdf_overlay
+from app.services.pdf_overlay import (
+    _create_overlay_content,
+    _create_overlay_stream,
+    bucket_by_page,
+    overlay_cache,
+    overlay_drawings_on_pdf,
+)
+
+
+@pytest.fixture()
+def plat_pdf(monkeypatch):
+    tmpdir = tempfile.mkdtemp()
+    monkeypatch.setattr(settings, "UPLOAD_DIR", tmpdir)
+    path = os.path.join(tmpdir, "plat.pdf")
+    writer = pypdf.PdfWriter()
+    for i in range(4):
+        writer.add_blank_page(width=612 if i % 2 else 1728, height=792 if i % 2 else 2592)
+    with open(path, "wb") as f:
+        writer.write(f)
+    yield path
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def make_overlay_data():
+    polylines, markers = [], []
+    for page in [1, 2, 4]:
+        points = [{"x": 10.0 * page + i * 7.5, "y": 20.0 + (i % 3) * 11.0} for i in range(12)]
+        coords = decode_points_blob(encode_points_blob(points))
+        arc_index = ArcLengthIndex(coords)
+        polylines.append({
+            "points": points,
+            "type": "fiber",
+            "page_number": page,
+            "global_index": len(polylines) + 1,
+            "arc_index": ArcLengthIndex.from_blob(coords, arc_index.to_blob()),
+        })
+        markers.append({"id": page, "x": 50.0, "y": 60.0, "type": "terminal", "page_number": page})
+    return {"polylines": polylines, "markers": markers, "marker_links": [], "conduits": []}
+
+
+def test_parallel_overlay_matches_serial_output(plat_pdf, monkeypatch):
+    monkeypatch.setattr(settings, "OVERLAY_CACHE_MAX_BYTES", 0)
+    data = make_overlay_data()
+    serial = overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=1)
+    parallel = overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=3)
+
+    assert len(pypdf.PdfReader(plat_pdf).pages) == len(pypdf.PdfReader(io.BytesIO(serial)).pages)
+    assert parallel == serial
+
+    # The shared pool is sized by the setting, not by one export's page count
+    pool = pdf_overlay._render_pool
+    assert pool is not None
+    assert overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=2) == serial
+    assert pdf_overlay._render_pool is pool
+
+
+def test_reexport_only_renders_changed_pages(plat_pdf):
+    data = make_overlay_data()
+    first = overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=1)
+    hits, misses = overlay_cache.hits, overlay_cache.misses
+
+    # Unchanged content: every page overlay comes from the cache
+    assert overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=1) == first
+    assert (overlay_cache.hits - hits, overlay_cache.misses - misses) == (3, 0)
+
+    # Moving one marker re-renders only its page
+    data["markers"][1]["x"] = 75.0
+    edited = overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=1)
+    assert (overlay_cache.hits - hits, overlay_cache.misses - misses) == (5, 1)
+    assert edited != first
+
+    overlay_cache_dir = os.path.join(settings.UPLOAD_DIR, "overlay_cache")
+    assert sum(len(names) for _, _, names in os.walk(overlay_cache_dir)) == 4
+
+
+def test_bucket_by_page_keeps_item_order():
+    data = make_overlay_data()
+    data["marker_links"] = [
+        {"markerId": 4, "to": {"x": 1, "y": 1}, "page_number": 4},
+        {"markerId": 1, "to": {"x": 2, "y": 2}, "page_number": 1},
+        {"markerId": 4, "to": {"x": 3, "y": 3}, "page_number": 4},
+    ]
+    buckets = bucket_by_page(data)
+
+    assert sorted(buckets) == [1, 2, 4]
+    for page, items in buckets.items():
+        for key, bucket in items.items():
+            assert bucket == [item for item in data[key] if item["page_number"] == page]
+    assert [link["to"]["x"] for link in buckets[4]["marker_links"]] == [1, 3]
+
+
+def test_links_resolve_markers_on_their_own_page():
+    markers = [
+        {"id": 1, "x": 100, "y": 100, "type": "terminal", "page_number": 1},
+        {"id": 2, "x": 200, "y": 200, "type": "dropPed", "page_number": 1},
+        {"id": 3, "x": 300, "y": 300, "type": "dropPed", "page_number": 2},
+    ]
+    data = {
+        "polylines": [],
+        "markers": markers,
+        "marker_links": [{"markerId": 3, "to": {"x": 10, "y": 10}, "page_number": 1}],
+        "conduits": [
+            {"terminalId": 1, "dropPedId": 2, "page_number": 1},
+            {"terminalId": 1, "dropPedId": 3, "page_number": 1},
+        ],
+    }
+    items = bucket_by_page(data)[1]
+    content = _create_overlay_stream(612, 792, items["polylines"], items["markers"], items["marker_links"], items["conduits"])
+
+    # Only the conduit between markers on page 1 is drawn; marker 3 is on page 2
+    assert content.count(b" l S") == 1
+
+
+def painted(content: bytes, pdf, origin=(0.0, 0.0), state=None) -> list:
+    """
+    What a content stream paints, in order: each filled or stroked path and
+    each string, with absolute coordinates and the colour, line width and
+    font size in effect. Glyph forms placed with "cm ... Do" are expanded.
+    """
+    stream = pypdf.generic.ContentStream(None, pdf)
+    stream.set_data(content)
+    state = dict(state or {"rg": None, "RG": None, "w": None, "Tf": None})
+    ox, oy = origin
+    saved, path, events, text_at = [], [], [], None
+    for operands, operator in stream.operations:
+        op = operator.decode()
+        numbers = [float(v) for v in operands if isinstance(v, (int, float))]
+        if op == "q":
+            saved.append((dict(state), ox, oy))
+        elif op == "Q":
+            state, ox, oy = saved.pop()
+        elif op == "cm":
+            ox, oy = ox + numbers[4], oy + numbers[5]
+        elif op in ("rg", "RG", "w", "Tf"):
+            state[op] = tuple(round(v, 4) for v in numbers)
+        elif op in ("m", "l", "c", "re"):
+            coords = [v + (oy if i % 2 else ox) for i, v in enumerate(numbers)]
+            if op == "re":
+                coords[2:] = numbers[2:]
+            path.append((op, coords))
+        elif op == "h":
+            path.append((op, []))
+        elif op == "n":
+            path = []
+        elif op in ("f*", "S", "B*"):
+            fill = state["rg"] if op != "S" else None
+            stroke = (state["RG"], state["w"]) if op != "f*" else None
+            events.append((op, path, fill, stroke))
+            path = []
+        elif op == "Tm":
+            text_at = [numbers[4] + ox, numbers[5] + oy]
+        elif op == "Tj":
+            events.append(("Tj", [("at", text_at)], str(operands[0]), (state["rg"], state["Tf"])))
+        elif op == "Do":
+            form = overlay_stream.glyph_form(operands[0][len("/G_"):])
+            events.extend(painted(form.get_data(), pdf, (ox, oy), state))
+    return events
+
+
+def split_numbers(events: list):
+    """(events with coordinates blanked, flat list of coordinates) for approximate comparison."""
+    shapes, numbers = [], []
+    for op, path, fill, stroke in events:
+        shapes.append((op, [segment for segment, _ in path], fill, stroke))
+        numbers.extend(v for _, coords in path for v in coords)
+    return shapes, numbers
+
+
+@pytest.mark.parametrize("rotation,size,original", [
+    (0, (612, 792), (612, 792)),
+    (90, (792, 612), (612, 792)),
+    (180, (612, 792), (612, 792)),
+    (270, (792, 612), (612, 792)),
+])
+def test_content_stream_draws_what_reportlab_draws(rotation, size, original):
+    markers = [
+        {"id": 1, "x": 100, "y": 100, "type": "terminal"},
+        {"id": 2, "x": 200, "y": 150, "type": "dropPed"},
+        {"id": 3, "x": 300, "y": 300, "type": "handhole"},
+    ]
+    args = (
+        *size,
+        [
+            {"points": [{"x": 10, "y": 10}, {"x": 400, "y": 300}, {"x": 420, "y": 500}], "type": "fiber", "global_index": 7},
+            {"points": [{"x": 30, "y": 40}, {"x": 60, "y": 80}], "type": "conduit"},
+        ],
+        markers,
+        [{"markerId": 1, "to": {"x": 50, "y": 400}}],
+        [{"terminalId": 1, "dropPedId": 2}],
+    )
+    kwargs = {"rotation": rotation, "original_width": original[0], "original_height": original[1]}
+    reader = pypdf.PdfReader(io.BytesIO(_create_overlay_content(*args, **kwargs)))
+    expected_shapes, expected_numbers = split_numbers(painted(reader.pages[0].get_contents().get_data(), reader))
+    content = _create_overlay_stream(*args, **kwargs)
+    shapes, numbers = split_numbers(painted(content, reader))
+
+    assert {shape[0] for shape in expected_shapes} == {"f*", "S", "B*", "Tj"}
+    assert shapes == expected_shapes
+    assert numbers == pytest.approx(expected_numbers, abs=1e-3)
+    # Every marker glyph is a placed form, not repeated paths
+    assert content.count(b" Do Q") == 5
+
+
+def test_stored_page_geometry_matches_inherited_rotation(plat_pdf, monkeypatch):
+    from pypdf.generic import NameObject, NumberObject
+    from app.services.pdf_handler import ingest_pdf
+
+    monkeypatch.setattr(settings, "OVERLAY_CACHE_MAX_BYTES", 0)
+    # /Rotate set only on the page tree root, inherited by every page
+    writer = pypdf.PdfWriter(clone_from=plat_pdf)
+    writer._root_object["/Pages"][NameObject("/Rotate")] = NumberObject(90)
+    with open(plat_pdf, "wb") as f:
+        writer.write(f)
+
+    pages = ingest_pdf(plat_pdf)["pages"]
+    reader = pypdf.PdfReader(plat_pdf)
+    assert [p["rotation"] for p in pages] == [int(page.get("/Rotate", 0)) for page in reader.pages]
+    geometry = {p["page_number"]: {"width": p["width"], "height": p["height"], "rotation": p["rotation"]} for p in pages}
+    data = make_overlay_data()
+    assert overlay_drawings_on_pdf(plat_pdf, all_data=data, page_geometry=geometry, workers=1) == \
+        overlay_drawings_on_pdf(plat_pdf, all_data=data, workers=1)
@@ -1,3 +1,4 @@
+import io
 import os
 import shutil
 import tempfile
@@ -87,3 +88,383 @@ def test_create_project_unique_name(test_client):
     assert len(data) == 1
     assert data[0]["id"] == first_id
     assert data[0]["name"] == "Neighborhood A"
+
+
+def create_test_project(test_client, name: str = "Test Project"):
+    """Helper to create a test project and return its ID."""
+    pdf_path = make_pdf_file(settings.UPLOAD_DIR)
+    with open(pdf_path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("sample.pdf", f, "application/pdf")},
+            data={"name": name},
+        )
+    assert resp.status_code == 200
+    return resp.json()["id"]
+
+
+def test_recalibration_remeasures_page_routes(test_client):
+    project_id = create_test_project(test_client)
+    calib = {"method": "manual", "scale_factor": 0.5, "page_number": 1}
+    assert test_client.post(f"/api/projects/{project_id}/scale-calibrations", json=calib).status_code == 200
+    test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={**calib, "page_number": 2})
+
+    for page, points in [(1, [{"x": 0, "y": 0}, {"x": 100, "y": 0}]), (1, [{"x": 0, "y": 0}, {"x": 0, "y": 40}]), (2, [{"x": 0, "y": 0}, {"x": 10, "y": 0}])]:
+        resp = test_client.post(
+            f"/api/projects/{project_id}/polylines",
+            json={"name": "Fiber Route", "page_number": page, "points": points},
+        )
+        assert resp.status_code == 200
+
+    # Act: recalibrate page 1 only
+    resp = test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={**calib, "scale_factor": 2.0})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["routes_remeasured"] == 2
+    assert data["page_length_ft"] == pytest.approx(280.0)
+    assert data["total_length_ft"] == pytest.approx(285.0)
+
+    polylines = test_client.get(f"/api/projects/{project_id}/polylines").json()
+    assert [p["length_ft"] for p in polylines] == pytest.approx([200.0, 80.0, 5.0])
+    assert test_client.get(f"/api/projects/{project_id}").json()["total_length_ft"] == pytest.approx(285.0)
+
+    # Re-saving the same scale changes nothing
+    resp = test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={**calib, "scale_factor": 2.0})
+    assert resp.json()["routes_remeasured"] == 0
+
+
+def test_packed_point_storage_serves_json_points(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "POLYLINE_POINTS_FORMAT", "packed")
+    project_id = create_test_project(test_client)
+    test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={"method": "manual", "scale_factor": 0.5})
+    points = [{"x": 0.0, "y": 0.0}, {"x": 30.0, "y": 40.0}, {"x": 30.5, "y": 40.0}]
+
+    resp = test_client.post(
+        f"/api/projects/{project_id}/polylines",
+        json={"name": "Fiber Route", "page_number": 1, "points": points},
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["points"] == points
+    assert resp.json()["length_ft"] == pytest.approx(25.25)
+    assert test_client.get(f"/api/projects/{project_id}/polylines").json()[0]["points"] == points
+    assert test_client.get(f"/api/projects/{project_id}").json()["polylines"][0]["points"] == points
+
+    resp = test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={"method": "manual", "scale_factor": 1.0})
+    assert resp.json()["total_length_ft"] == pytest.approx(50.5)
+
+
+def test_project_pages_stored_at_ingest(test_client):
+    path = os.path.join(settings.UPLOAD_DIR, "plat.pdf")
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=612, height=792)
+    writer.add_blank_page(width=2592, height=1728).rotate(270)
+    with open(path, "wb") as f:
+        writer.write(f)
+    with open(path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("plat.pdf", f, "application/pdf")},
+            data={"name": "Plat Set"},
+        )
+    assert resp.status_code == 200
+    project = resp.json()
+    assert project["page_count"] == 2
+
+    resp = test_client.get(f"/api/projects/{project['id']}/pages")
+
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {"page_number": 1, "media_box": [0, 0, 612, 792], "width": 612, "height": 792, "rotation": 0, "user_unit": 1},
+        {"page_number": 2, "media_box": [0, 0, 2592, 1728], "width": 2592, "height": 1728, "rotation": 270, "user_unit": 1},
+    ]
+
+
+def test_create_project_rejects_invalid_pdf(test_client):
+    path = os.path.join(settings.UPLOAD_DIR, "broken.pdf")
+    with open(path, "wb") as f:
+        f.write(b"not a pdf at all")
+    with open(path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("broken.pdf", f, "application/pdf")},
+            data={"name": "Broken"},
+        )
+    assert resp.status_code == 400
+    assert resp.json()["detail"].startswith("Invalid PDF")
+    assert test_client.get("/api/projects/").json() == []
+
+
+def test_duplicate_uploads_share_one_stored_pdf(test_client):
+    pdf_path = make_pdf_file(settings.UPLOAD_DIR, "phase.pdf")
+    project_ids = []
+    for name in ["Phase 1", "Phase 2"]:
+        with open(pdf_path, "rb") as f:
+            resp = test_client.post(
+                "/api/projects/",
+                files={"pdf_file": ("phase.pdf", f, "application/pdf")},
+                data={"name": name},
+            )
+        assert resp.status_code == 200
+        project_ids.append(resp.json()["id"])
+
+    stored = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(os.path.join(settings.UPLOAD_DIR, "objects"))
+        for name in names
+    ]
+    assert len(stored) == 1
+    assert len(test_client.get(f"/api/projects/{project_ids[1]}/pages").json()) == 1
+
+    # The file survives until the last project referencing it is deleted
+    test_client.delete(f"/api/projects/{project_ids[0]}")
+    assert os.path.exists(stored[0])
+    assert test_client.get(f"/api/projects/{project_ids[1]}/pdf").status_code == 200
+    test_client.delete(f"/api/projects/{project_ids[1]}")
+    assert not os.path.exists(stored[0])
+
+
+def test_failed_project_insert_removes_newly_stored_pdf(test_client, monkeypatch):
+    from app.db.database import get_db
+    from app.models.database import PdfBlob
+    from app.routes import projects
+
+    def broken_pages(*args, **kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(projects, "build_project_pages", broken_pages)
+    pdf_path = make_pdf_file(settings.UPLOAD_DIR, "doomed.pdf")
+    with open(pdf_path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("doomed.pdf", f, "application/pdf")},
+            data={"name": "Doomed"},
+        )
+
+    assert resp.status_code == 500
+    assert not any(names for _, _, names in os.walk(os.path.join(settings.UPLOAD_DIR, "objects")))
+    db = next(app.dependency_overrides[get_db]())
+    assert db.query(PdfBlob).count() == 0
+    db.close()
+
+
+def test_create_project_rejects_oversized_upload(test_client, monkeypatch):
+    pdf_path = make_pdf_file(settings.UPLOAD_DIR, "big.pdf")
+    size = os.path.getsize(pdf_path)
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", size - 1)
+    before = set(os.listdir(settings.UPLOAD_DIR))
+    with open(pdf_path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("big.pdf", f, "application/pdf")},
+            data={"name": "Too Big"},
+        )
+    assert resp.status_code == 413
+    assert set(os.listdir(settings.UPLOAD_DIR)) == before
+    assert test_client.get("/api/projects/").json() == []
+
+
+def test_upload_size_middleware_refuses_large_declared_body(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1024)
+    resp = test_client.post(
+        "/api/projects/",
+        content=b"x" * (256 * 1024),
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Origin": "http://localhost:3000"},
+    )
+    assert resp.status_code == 413
+    # CORS wraps the size limit, so browsers can read the rejection
+    assert resp.headers["access-control-allow-origin"] == "http://localhost:3000"
+
+
+def test_create_project_rejects_truncated_pdf(test_client):
+    pdf_path = make_pdf_file(settings.UPLOAD_DIR, "whole.pdf")
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    with open(pdf_path, "wb") as f:
+        f.write(data[: data.rindex(b"%%EOF")])
+    with open(pdf_path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("whole.pdf", f, "application/pdf")},
+            data={"name": "Truncated"},
+        )
+    assert resp.status_code == 400
+    assert "%%EOF" in resp.json()["detail"]
+
+
+def test_extract_pages_from_project_pdf(test_client):
+    path = os.path.join(settings.UPLOAD_DIR, "set.pdf")
+    writer = pypdf.PdfWriter()
+    for width in [600, 700, 800, 900]:
+        writer.add_blank_page(width=width, height=500)
+    with open(path, "wb") as f:
+        writer.write(f)
+    with open(path, "rb") as f:
+        project_id = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("set.pdf", f, "application/pdf")},
+            data={"name": "Plat Set"},
+        ).json()["id"]
+
+    def widths(content):
+        reader = pypdf.PdfReader(io.BytesIO(content))
+        return [float(page.mediabox.width) for page in reader.pages]
+
+    resp = test_client.get(f"/api/projects/{project_id}/pdf", params={"pages": "3"})
+    assert resp.status_code == 200
+    assert widths(resp.content) == [800]
+    assert widths(test_client.get(f"/api/projects/{project_id}/pdf", params={"pages": "4,1-2"}).content) == [600, 700, 900]
+    assert widths(test_client.get(f"/api/projects/{project_id}/pages/2.pdf").content) == [700]
+
+    # Extractions are cached by content hash and page selection
+    cached = [name for _, _, names in os.walk(os.path.join(settings.UPLOAD_DIR, "page_cache")) for name in names]
+    assert sorted(name.split("-p", 1)[1] for name in cached) == ["1-2_4.pdf", "2.pdf", "3.pdf"]
+
+    assert test_client.get(f"/api/projects/{project_id}/pdf", params={"pages": "5"}).status_code == 400
+    assert test_client.get(f"/api/projects/{project_id}/pdf", params={"pages": "a"}).status_code == 400
+
+
+def test_project_pdf_conditional_and_range_requests(test_client):
+    project_id = create_test_project(test_client)
+    url = f"/api/projects/{project_id}/pdf"
+
+    full = test_client.get(url)
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+    size = len(full.content)
+
+    assert test_client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert test_client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert test_client.get(url, headers={"If-Modified-Since": full.headers["last-modified"]}).status_code == 304
+    assert test_client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    part = test_client.get(url, headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.content == full.content[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{size}"
+
+    tail = test_client.get(url, headers={"Range": "bytes=-16"})
+    assert tail.content == full.content[-16:]
+
+    # A stale If-Range validator gets the whole file
+    assert test_client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"old"'}).status_code == 200
+    assert test_client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+
+    unsatisfiable = test_client.get(url, headers={"Range": f"bytes={size}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+
+    # Extracted pages get their own validator
+    page = test_client.get(f"/api/projects/{project_id}/pages/1.pdf")
+    assert page.headers["etag"] != etag
+    assert test_client.get(
+        f"/api/projects/{project_id}/pages/1.pdf", headers={"If-None-Match": page.headers["etag"]}
+    ).status_code == 304
+
+
+def test_compaction_at_ingest_keeps_original_as_fallback(test_client, monkeypatch):
+    from pypdf.generic import DecodedStreamObject, NameObject
+
+    monkeypatch.setattr(settings, "PDF_COMPACT_ON_INGEST", True)
+    path = os.path.join(settings.UPLOAD_DIR, "bloated.pdf")
+    writer = pypdf.PdfWriter()
+    for _ in range(3):
+        page = writer.add_blank_page(width=612, height=792)
+        content = DecodedStreamObject()
+        content.set_data(b"0 0 m 612 792 l S\n" * 500)
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    original_size = os.path.getsize(path)
+
+    with open(path, "rb") as f:
+        resp = test_client.post(
+            "/api/projects/",
+            files={"pdf_file": ("bloated.pdf", f, "application/pdf")},
+            data={"name": "Bloated"},
+        )
+    assert resp.status_code == 200
+    project = resp.json()
+    assert project["pdf_size_bytes"] == original_size
+    assert project["pdf_compacted_size_bytes"] < original_size
+    assert test_client.get(f"/api/projects/{project['id']}").json()["pdf_compacted_size_bytes"] == project["pdf_compacted_size_bytes"]
+
+    served = test_client.get(f"/api/projects/{project['id']}/pdf")
+    assert len(served.content) == project["pdf_compacted_size_bytes"]
+    assert served.headers["etag"].endswith('-compact"')
+    assert len(pypdf.PdfReader(io.BytesIO(served.content)).pages) == 3
+
+    stored = sorted(
+        name for _, _, names in os.walk(os.path.join(settings.UPLOAD_DIR, "objects")) for name in names
+    )
+    assert len(stored) == 2 and stored[0].endswith(".compact.pdf")
+
+    test_client.delete(f"/api/projects/{project['id']}")
+    assert not any(names for _, _, names in os.walk(os.path.join(settings.UPLOAD_DIR, "objects")))
+
+
+def test_project_snapshot_loads_editor_state_in_fixed_queries(test_client):
+    from sqlalchemy import event
+
+    project_id = create_test_project(test_client)
+    test_client.post(f"/api/projects/{project_id}/scale-calibrations", json={"method": "manual", "scale_factor": 0.5})
+    for n in range(5):
+        test_client.post(
+            f"/api/projects/{project_id}/polylines",
+            json={"name": "Fiber Route", "page_number": 1, "points": [{"x": 0, "y": 0}, {"x": 10 * n, "y": 0}]},
+        )
+    terminal = test_client.post(
+        f"/api/projects/{project_id}/markers",
+        json={"page_number": 1, "marker_type": "terminal", "x": 50, "y": 60},
+    ).json()
+    drop = test_client.post(
+        f"/api/projects/{project_id}/markers",
+        json={"page_number": 1, "marker_type": "dropPed", "x": 80, "y": 90},
+    ).json()
+    test_client.post(
+        f"/api/projects/{project_id}/assignments",
+        json={"marker_id": terminal["id"], "page_number": 1, "to_x": 10, "to_y": 20},
+    )
+    test_client.post(
+        f"/api/projects/{project_id}/conduits",
+        json={"page_number": 1, "terminal_id": terminal["id"], "drop_ped_id": drop["id"], "footage": 12.5},
+    )
+
+    engine = next(app.dependency_overrides[get_db]()).get_bind()
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        resp = test_client.get(f"/api/projects/{project_id}/snapshot", headers={"Accept-Encoding": "gzip"})
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    snapshot = resp.json()
+    assert snapshot["project"]["id"] == project_id
+    assert len(snapshot["polylines"]) == 5
+    assert [m["id"] for m in snapshot["markers"]] == [terminal["id"], drop["id"]]
+    assert snapshot["marker_links"] == test_client.get(f"/api/projects/{project_id}/assignments").json()
+    assert snapshot["conduits"][0]["footage"] == 12.5
+    assert snapshot["scale_calibrations"][0]["scale_factor"] == 0.5
+    assert snapshot["pages"][0]["width"] == 612
+    assert snapshot["cable_configuration"] is None
+    assert len(statements) <= 12
+
+    etag = resp.headers["etag"]
+    assert test_client.get(f"/api/projects/{project_id}/snapshot", headers={"If-None-Match": etag}).status_code == 304
+    test_client.put(
+        f"/api/projects/{project_id}/markers/{drop['id']}",
+        json={"page_number": 1, "marker_type": "dropPed", "x": 85, "y": 95},
+    )
+    changed = test_client.get(f"/api/projects/{project_id}/snapshot", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["revision"] > snapshot["revision"]
+    assert test_client.get("/api/projects/999999/snapshot").status_code == 404
@@ -0,0 +1,58 @@
+import math
+import random
+
+import pytest
+
+from app.services.spatial_index import GridIndex
+
+
+def _brute_force_nearest(points, x, y, k, tag=None):
+    return sorted(
+        (math.hypot(px - x, py - y), item_id)
+        for item_id, (px, py, item_tag) in points.items()
+        if tag is None or item_tag == tag
+    )[:k]
+
+
+@pytest.fixture()
+def populated():
+    rng = random.Random(7)
+    index = GridIndex(cell_size=50)
+    points = {}
+    for item_id in range(1, 2001):
+        x, y = rng.uniform(0, 2592), rng.uniform(0, 1728)
+        tag = "terminal" if item_id % 10 == 0 else "dropPed"
+        index.insert(item_id, x, y, tag)
+        points[item_id] = (x, y, tag)
+    return index, points
+
+
+def test_query_bbox_matches_brute_force(populated):
+    index, points = populated
+    for box in [(0, 0, 100, 100), (500.5, 200, 1500, 900), (-10, -10, 5000, 5000), (3000, 3000, 3100, 3100)]:
+        expected = sorted(
+            item_id for item_id, (x, y, _) in points.items()
+            if box[0] <= x <= box[2] and box[1] <= y <= box[3]
+        )
+        assert index.query_bbox(*box) == expected
+
+
+def test_nearest_matches_brute_force(populated):
+    index, points = populated
+    for x, y in [(0, 0), (1296, 864), (2600, 1700), (10000, -500)]:
+        for k in (1, 5, 25):
+            assert index.nearest(x, y, k=k) == _brute_force_nearest(points, x, y, k)
+        assert index.nearest(x, y, k=3, tag="terminal") == _brute_force_nearest(points, x, y, 3, "terminal")
+
+
+def test_nearest_respects_max_distance_and_moves():
+    index = GridIndex(cell_size=10)
+    index.insert(1, 0, 0)
+    index.insert(2, 100, 0)
+    assert index.nearest(90, 0, k=2, max_distance=20) == [(10.0, 2)]
+
+    index.insert(2, 5, 0)
+    index.remove(1)
+    assert len(index) == 1
+    assert index.nearest(90, 0, k=2) == [(85.0, 2)]
+    assert index.query_bbox(0, -1, 10, 1) == [2]
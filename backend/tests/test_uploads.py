@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import pypdf
+
+from app.db.database import Base, get_db
+from app.models.database import UploadSession
+from app.services.upload_sessions import collect_stale_sessions, session_dir
+from main import app
+from app.config import settings
+
+
+@pytest.fixture()
+def temp_upload_dir():
+    tmpdir = tempfile.mkdtemp()
+    original_upload = settings.UPLOAD_DIR
+    settings.UPLOAD_DIR = tmpdir
+    yield tmpdir
+    settings.UPLOAD_DIR = original_upload
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@pytest.fixture()
+def session_factory(temp_upload_dir):
+    db_path = os.path.join(temp_upload_dir, "test_uploads.sqlite")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def test_client(session_factory):
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def make_pdf_bytes(pages: int = 3) -> bytes:
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    path = os.path.join(settings.UPLOAD_DIR, "source.pdf")
+    with open(path, "wb") as f:
+        writer.write(f)
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def start_session(client, data: bytes, name: str = "Resumable"):
+    resp = client.post(
+        "/api/uploads/",
+        json={"name": name, "filename": "plat.pdf", "total_size": len(data)},
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def put_chunk(client, session_id: str, number: int, offset: int, body: bytes):
+    return client.put(
+        f"/api/uploads/{session_id}/chunks/{number}",
+        params={"offset": offset},
+        content=body,
+    )
+
+
+def test_chunked_upload_out_of_order_creates_project(test_client):
+    data = make_pdf_bytes()
+    session = start_session(test_client, data)
+    assert session["missing_ranges"] == [[0, len(data)]]
+
+    size = 400
+    chunks = [(i, data[i * size:(i + 1) * size]) for i in range((len(data) + size - 1) // size)]
+    for number, body in reversed(chunks[1:]):
+        assert put_chunk(test_client, session["id"], number, number * size, body).status_code == 200
+
+    status = test_client.get(f"/api/uploads/{session['id']}").json()
+    assert status["received_ranges"] == [[size, len(data)]]
+    assert status["missing_ranges"] == [[0, size]]
+    assert test_client.post(f"/api/uploads/{session['id']}/finalize").status_code == 409
+
+    put_chunk(test_client, session["id"], 0, 0, chunks[0][1])
+    resp = test_client.post(f"/api/uploads/{session['id']}/finalize")
+    assert resp.status_code == 200
+    project = resp.json()
+    assert project["name"] == "Resumable"
+    assert project["page_count"] == 3
+
+    pdf = test_client.get(f"/api/projects/{project['id']}/pdf")
+    assert pdf.content == data
+    assert test_client.get(f"/api/uploads/{session['id']}").status_code == 404
+    assert not os.path.exists(session_dir(session["id"]))
+
+
+def test_resent_chunk_replaces_earlier_copy(test_client):
+    data = make_pdf_bytes(1)
+    session = start_session(test_client, data)
+    half = len(data) // 2
+
+    # A chunk cut short by a dropped connection is simply sent again
+    put_chunk(test_client, session["id"], 0, 0, data[:10])
+    put_chunk(test_client, session["id"], 0, 0, data[:half])
+    resp = put_chunk(test_client, session["id"], 1, half, data[half:])
+    assert resp.json()["received_bytes"] == len(data)
+    assert test_client.post(f"/api/uploads/{session['id']}/finalize").status_code == 200
+
+
+def test_rejected_resend_keeps_earlier_copy(test_client):
+    data = make_pdf_bytes(1)
+    session = start_session(test_client, data)
+    half = len(data) // 2
+
+    put_chunk(test_client, session["id"], 0, 0, data[:half])
+    put_chunk(test_client, session["id"], 1, half, data[half:])
+    # A resend of chunk 1 that would overlap chunk 0 is refused without touching chunk 1's file
+    assert put_chunk(test_client, session["id"], 1, half - 10, b"X" * (len(data) - half + 10)).status_code == 409
+    assert test_client.post(f"/api/uploads/{session['id']}/finalize").status_code == 200
+
+
+def test_chunk_rejections(test_client, monkeypatch):
+    data = make_pdf_bytes(1)
+    session = start_session(test_client, data)
+
+    assert put_chunk(test_client, session["id"], 0, 0, data + b"extra").status_code == 413
+    assert put_chunk(test_client, session["id"], 0, 0, data[:100]).status_code == 200
+    assert put_chunk(test_client, session["id"], 1, 50, data[50:200]).status_code == 409
+    assert put_chunk(test_client, "missing", 0, 0, data).status_code == 404
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", len(data) - 1)
+    resp = test_client.post("/api/uploads/", json={"name": "Big", "filename": "big.pdf", "total_size": len(data)})
+    assert resp.status_code == 413
+
+
+def test_invalid_upload_keeps_session_for_retry(test_client):
+    data = make_pdf_bytes(1)
+    session = start_session(test_client, data)
+    put_chunk(test_client, session["id"], 0, 0, b"X" * len(data))
+    resp = test_client.post(f"/api/uploads/{session['id']}/finalize")
+    assert resp.status_code == 400
+    assert test_client.get("/api/projects/").json() == []
+
+    put_chunk(test_client, session["id"], 0, 0, data)
+    assert test_client.post(f"/api/uploads/{session['id']}/finalize").status_code == 200
+
+
+def test_stale_sessions_are_collected(test_client, session_factory):
+    data = make_pdf_bytes(1)
+    stale = start_session(test_client, data, "Stale")
+    fresh = start_session(test_client, data, "Fresh")
+    put_chunk(test_client, stale["id"], 0, 0, data[:100])
+
+    db = session_factory()
+    try:
+        row = db.query(UploadSession).filter(UploadSession.id == stale["id"]).first()
+        row.updated_at = datetime.now(timezone.utc) - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS + 1)
+        db.commit()
+        assert collect_stale_sessions(db) == 1
+    finally:
+        db.close()
+
+    assert test_client.get(f"/api/uploads/{stale['id']}").status_code == 404
+    assert not os.path.exists(session_dir(stale["id"]))
+    assert test_client.get(f"/api/uploads/{fresh['id']}").status_code == 200
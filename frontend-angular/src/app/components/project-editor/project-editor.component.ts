@@ -305,7 +305,6 @@ export class ProjectEditorComponent implements OnInit, OnDestroy {
   private originalPolylines: Polyline[] = [];
   private originalConduits: Conduit[] = [];
   private isLoadingProject: boolean = false;
-  private pendingProjectLoads: number = 0;
   private isSaving: boolean = false;
   private pendingExport: boolean = false;
   private autoSave$ = new Subject<void>();
@@ -444,8 +443,10 @@ export class ProjectEditorComponent implements OnInit, OnDestroy {
 
   loadProject() {
     if (!this.projectId) return;
-    this.apiService.getProject(this.projectId).subscribe(
-      (project) => {
+    this.isLoadingProject = true;
+    this.apiService.getProjectSnapshot(this.projectId).subscribe(
+      (snapshot) => {
+        const project = snapshot.project;
         this.stateService.setProject(project);
         this.projectName = project.name || '';
         this.projectNumber = project.project_number || '';
@@ -457,110 +458,65 @@ export class ProjectEditorComponent implements OnInit, OnDestroy {
         } else {
           this.pdfUrl = `/api/projects/${this.projectId}/pdf`;
         }
-        this.loadProjectData();
+        this.loadProjectData(snapshot);
+        this.isLoadingProject = false;
       },
-      (error) => console.error('Failed to load project', error)
+      (error) => {
+        console.error('Failed to load project', error);
+        this.isLoadingProject = false;
+      }
     );
   }
 
-  loadProjectData() {
-    if (!this.projectId) return;
+  loadProjectData(snapshot: any) {
+    const markers = snapshot.markers;
+    this.markers = markers;
+    this.originalMarkers = JSON.parse(JSON.stringify(markers)); // Deep copy for dirty checking
+    this.stateService.setMarkers(markers);
 
-    this.isLoadingProject = true;
-    this.pendingProjectLoads = 3;
-    const markLoadComplete = () => {
-      this.pendingProjectLoads = Math.max(0, this.pendingProjectLoads - 1);
-      if (this.pendingProjectLoads === 0) {
-        this.isLoadingProject = false;
-      }
-    };
-    
-    const projectId = this.projectId; // Capture for type safety
-    
-    // Load markers first, then load conduits (to ensure marker coordinates are available)
-    this.apiService.getMarkers(projectId).subscribe({
-      next: (markers) => {
-        this.markers = markers;
-        this.originalMarkers = JSON.parse(JSON.stringify(markers)); // Deep copy for dirty checking
-        this.stateService.setMarkers(markers);
-        
-        // Now that markers are loaded, load conduits which need marker coordinates
-        this.apiService.getConduits(projectId).subscribe({
-          next: (conduits) => {
-            this.conduits = conduits;
-            this.originalConduits = JSON.parse(JSON.stringify(conduits)); // Deep copy for dirty checking
-            this.stateService.setConduits(conduits);
-            
-            // Transform database conduits to metadata format for relationship building
-            this.conduitMetadata = conduits.map((c: any) => {
-              // Find the terminal and drop markers to get their coordinates
-              const terminalMarker = this.markers.find(m => m.id === c.terminal_id);
-              const dropMarker = this.markers.find(m => m.id === c.drop_ped_id);
-              
-              return {
-                id: c.id,  // Track database ID to avoid re-saving
-                fromId: c.terminal_id,
-                fromType: 'terminal' as 'terminal' | 'drop',
-                fromX: terminalMarker?.x,
-                fromY: terminalMarker?.y,
-                toId: c.drop_ped_id,
-                toType: 'drop' as 'terminal' | 'drop',
-                toX: dropMarker?.x,
-                toY: dropMarker?.y,
-                lengthFt: c.footage,
-                pageNumber: c.page_number
-              };
-            });
-            
-            // Rebuild drop conduits display list
-            this.onConduitsChanged(this.conduitMetadata);
-            
-            // Build relationships from loaded conduits
-            this.buildRelationshipMap();
-            markLoadComplete();
-          },
-          error: (error) => {
-            console.error('Failed to load conduits', error);
-            markLoadComplete();
-          }
-        });
-      },
-      error: (error) => {
-        console.error('Failed to load markers', error);
-        markLoadComplete();
-      }
-    });
-    
-    // Load polylines independently (doesn't depend on markers)
-    this.apiService.getPolylines(this.projectId).subscribe({
-      next: (polylines) => {
-        // Add type field based on name for proper rendering
-        this.polylines = polylines.map((p: any) => ({
-          ...p,
-          type: p.name?.includes('Conduit') ? 'conduit' : 'fiber'
-        }));
-        this.originalPolylines = JSON.parse(JSON.stringify(this.polylines)); // Deep copy for dirty checking
-        this.stateService.setPolylines(this.polylines);
-        markLoadComplete();
-      },
-      error: (error) => {
-        console.error('Failed to load polylines', error);
-        markLoadComplete();
-      }
-    });
-    
-    // Load marker links independently
-    this.apiService.getMarkerLinks(this.projectId).subscribe({
-      next: (links) => {
-        this.markerLinks = links;
-        this.stateService.setMarkerLinks(links);
-        markLoadComplete();
-      },
-      error: (error) => {
-        console.error('Failed to load marker links', error);
-        markLoadComplete();
-      }
+    // Conduits need the marker coordinates loaded above
+    const conduits = snapshot.conduits;
+    this.conduits = conduits;
+    this.originalConduits = JSON.parse(JSON.stringify(conduits)); // Deep copy for dirty checking
+    this.stateService.setConduits(conduits);
+
+    // Transform database conduits to metadata format for relationship building
+    this.conduitMetadata = conduits.map((c: any) => {
+      // Find the terminal and drop markers to get their coordinates
+      const terminalMarker = this.markers.find(m => m.id === c.terminal_id);
+      const dropMarker = this.markers.find(m => m.id === c.drop_ped_id);
+
+      return {
+        id: c.id,  // Track database ID to avoid re-saving
+        fromId: c.terminal_id,
+        fromType: 'terminal' as 'terminal' | 'drop',
+        fromX: terminalMarker?.x,
+        fromY: terminalMarker?.y,
+        toId: c.drop_ped_id,
+        toType: 'drop' as 'terminal' | 'drop',
+        toX: dropMarker?.x,
+        toY: dropMarker?.y,
+        lengthFt: c.footage,
+        pageNumber: c.page_number
+      };
     });
+
+    // Rebuild drop conduits display list
+    this.onConduitsChanged(this.conduitMetadata);
+
+    // Build relationships from loaded conduits
+    this.buildRelationshipMap();
+
+    // Add type field based on name for proper rendering
+    this.polylines = snapshot.polylines.map((p: any) => ({
+      ...p,
+      type: p.name?.includes('Conduit') ? 'conduit' : 'fiber'
+    }));
+    this.originalPolylines = JSON.parse(JSON.stringify(this.polylines)); // Deep copy for dirty checking
+    this.stateService.setPolylines(this.polylines);
+
+    this.markerLinks = snapshot.marker_links;
+    this.stateService.setMarkerLinks(snapshot.marker_links);
   }
 
   onCanvasReady(event: any) {
@@ -29,6 +29,11 @@ export class ApiService {
     return this.http.get<any>(`${this.apiUrl}/projects/${id}/`);
   }
 
+  // Project, pages, calibrations, drawn content and cable configuration in one response
+  getProjectSnapshot(id: number): Observable<any> {
+    return this.http.get<any>(`${this.apiUrl}/projects/${id}/snapshot`);
+  }
+
   updateProject(id: number, updates: any): Observable<any> {
     return this.http.patch<any>(`${this.apiUrl}/projects/${id}/`, updates);
   }